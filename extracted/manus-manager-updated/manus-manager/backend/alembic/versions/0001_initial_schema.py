@@ -0,0 +1,99 @@
+"""Initial schema
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-19 00:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "users",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("username", sa.String()),
+        sa.Column("email", sa.String()),
+        sa.Column("hashed_password", sa.String()),
+        sa.Column("is_active", sa.Boolean()),
+        sa.Column("is_superuser", sa.Boolean()),
+        sa.Column("created_at", sa.DateTime()),
+        sa.Column("updated_at", sa.DateTime(), nullable=True),
+        sa.Column("google_id", sa.String(), nullable=True, unique=True),
+        sa.Column("full_name", sa.String(), nullable=True),
+        sa.Column("profile_picture", sa.String(), nullable=True),
+    )
+    op.create_index("ix_users_id", "users", ["id"])
+    op.create_index("ix_users_username", "users", ["username"], unique=True)
+    op.create_index("ix_users_email", "users", ["email"], unique=True)
+
+    op.create_table(
+        "agents",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("name", sa.String()),
+        sa.Column("description", sa.Text(), nullable=True),
+        sa.Column("status", sa.String()),
+        sa.Column("owner_id", sa.Integer(), sa.ForeignKey("users.id")),
+        sa.Column("instance_url", sa.String(), nullable=True),
+        sa.Column("api_key", sa.String(), nullable=True),
+        sa.Column("max_tasks", sa.Integer()),
+        sa.Column("created_at", sa.DateTime()),
+        sa.Column("updated_at", sa.DateTime(), nullable=True),
+        sa.Column("last_active", sa.DateTime(), nullable=True),
+    )
+    op.create_index("ix_agents_id", "agents", ["id"])
+    op.create_index("ix_agents_name", "agents", ["name"])
+
+    op.create_table(
+        "tasks",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("title", sa.String()),
+        sa.Column("description", sa.Text(), nullable=True),
+        sa.Column("status", sa.String()),
+        sa.Column("owner_id", sa.Integer(), sa.ForeignKey("users.id")),
+        sa.Column("agent_id", sa.Integer(), sa.ForeignKey("agents.id"), nullable=True),
+        sa.Column("created_at", sa.DateTime()),
+        sa.Column("updated_at", sa.DateTime(), nullable=True),
+        sa.Column("started_at", sa.DateTime(), nullable=True),
+        sa.Column("completed_at", sa.DateTime(), nullable=True),
+        sa.Column("priority", sa.Integer()),
+        sa.Column("progress", sa.Float()),
+    )
+    op.create_index("ix_tasks_id", "tasks", ["id"])
+    op.create_index("ix_tasks_title", "tasks", ["title"])
+
+    op.create_table(
+        "agent_logs",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("agent_id", sa.Integer(), sa.ForeignKey("agents.id")),
+        sa.Column("timestamp", sa.DateTime()),
+        sa.Column("level", sa.String()),
+        sa.Column("message", sa.Text()),
+    )
+    op.create_index("ix_agent_logs_id", "agent_logs", ["id"])
+
+    op.create_table(
+        "task_logs",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("task_id", sa.Integer(), sa.ForeignKey("tasks.id")),
+        sa.Column("timestamp", sa.DateTime()),
+        sa.Column("level", sa.String()),
+        sa.Column("message", sa.Text()),
+    )
+    op.create_index("ix_task_logs_id", "task_logs", ["id"])
+
+
+def downgrade() -> None:
+    op.drop_table("task_logs")
+    op.drop_table("agent_logs")
+    op.drop_table("tasks")
+    op.drop_table("agents")
+    op.drop_table("users")
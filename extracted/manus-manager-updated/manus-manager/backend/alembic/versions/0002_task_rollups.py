@@ -0,0 +1,64 @@
+"""Task rollups, completion time sketches and timeseries indexes
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19 00:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "task_rollups",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("scope", sa.String(), nullable=False),
+        sa.Column("scope_id", sa.Integer(), nullable=False),
+        sa.Column("total_count", sa.Integer(), nullable=False),
+        sa.Column("pending_count", sa.Integer(), nullable=False),
+        sa.Column("in_progress_count", sa.Integer(), nullable=False),
+        sa.Column("completed_count", sa.Integer(), nullable=False),
+        sa.Column("failed_count", sa.Integer(), nullable=False),
+        sa.Column("cancelled_count", sa.Integer(), nullable=False),
+        sa.Column("completion_time_sum", sa.Float(), nullable=False),
+        sa.Column("completion_time_count", sa.Integer(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=True),
+        sa.UniqueConstraint("scope", "scope_id", name="uq_task_rollups_scope"),
+    )
+    op.create_index("ix_task_rollups_id", "task_rollups", ["id"])
+
+    op.create_table(
+        "task_duration_sketches",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("scope", sa.String(), nullable=False),
+        sa.Column("scope_id", sa.Integer(), nullable=False),
+        sa.Column("priority", sa.Integer(), nullable=False),
+        sa.Column("day", sa.Date(), nullable=False),
+        sa.Column("count", sa.Integer(), nullable=False),
+        sa.Column("sum", sa.Float(), nullable=False),
+        sa.Column("zero_count", sa.Integer(), nullable=False),
+        sa.Column("bins", sa.Text(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=True),
+        sa.UniqueConstraint("scope", "scope_id", "priority", "day", name="uq_task_duration_sketches_key"),
+    )
+    op.create_index("ix_task_duration_sketches_id", "task_duration_sketches", ["id"])
+
+    op.create_index("ix_tasks_owner_id_started_at", "tasks", ["owner_id", "started_at"])
+    op.create_index("ix_tasks_owner_id_completed_at", "tasks", ["owner_id", "completed_at"])
+    op.create_index("ix_tasks_agent_id_completed_at", "tasks", ["agent_id", "completed_at"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_tasks_agent_id_completed_at", table_name="tasks")
+    op.drop_index("ix_tasks_owner_id_completed_at", table_name="tasks")
+    op.drop_index("ix_tasks_owner_id_started_at", table_name="tasks")
+    op.drop_table("task_duration_sketches")
+    op.drop_table("task_rollups")
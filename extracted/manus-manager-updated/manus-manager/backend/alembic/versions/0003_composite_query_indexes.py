@@ -0,0 +1,36 @@
+"""Composite indexes for the hot list and log query shapes
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19 00:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index("ix_tasks_owner_id_status", "tasks", ["owner_id", "status"])
+    op.create_index("ix_tasks_agent_id_status", "tasks", ["agent_id", "status"])
+    op.create_index("ix_agents_owner_id_status", "agents", ["owner_id", "status"])
+    op.create_index(
+        "ix_agent_logs_agent_id_timestamp", "agent_logs", ["agent_id", sa.text("timestamp DESC")]
+    )
+    op.create_index(
+        "ix_task_logs_task_id_timestamp", "task_logs", ["task_id", sa.text("timestamp DESC")]
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_task_logs_task_id_timestamp", table_name="task_logs")
+    op.drop_index("ix_agent_logs_agent_id_timestamp", table_name="agent_logs")
+    op.drop_index("ix_agents_owner_id_status", table_name="agents")
+    op.drop_index("ix_tasks_agent_id_status", table_name="tasks")
+    op.drop_index("ix_tasks_owner_id_status", table_name="tasks")
@@ -0,0 +1,42 @@
+"""Add id to the newest-first log indexes for keyset pagination
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-19 00:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.drop_index("ix_agent_logs_agent_id_timestamp", table_name="agent_logs")
+    op.drop_index("ix_task_logs_task_id_timestamp", table_name="task_logs")
+    op.create_index(
+        "ix_agent_logs_agent_id_timestamp",
+        "agent_logs",
+        ["agent_id", sa.text("timestamp DESC"), sa.text("id DESC")],
+    )
+    op.create_index(
+        "ix_task_logs_task_id_timestamp",
+        "task_logs",
+        ["task_id", sa.text("timestamp DESC"), sa.text("id DESC")],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_task_logs_task_id_timestamp", table_name="task_logs")
+    op.drop_index("ix_agent_logs_agent_id_timestamp", table_name="agent_logs")
+    op.create_index(
+        "ix_agent_logs_agent_id_timestamp", "agent_logs", ["agent_id", sa.text("timestamp DESC")]
+    )
+    op.create_index(
+        "ix_task_logs_task_id_timestamp", "task_logs", ["task_id", sa.text("timestamp DESC")]
+    )
@@ -0,0 +1,26 @@
+"""Add details to agent and task logs
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-19 00:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("agent_logs", sa.Column("details", sa.Text(), nullable=True))
+    op.add_column("task_logs", sa.Column("details", sa.Text(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("task_logs", "details")
+    op.drop_column("agent_logs", "details")
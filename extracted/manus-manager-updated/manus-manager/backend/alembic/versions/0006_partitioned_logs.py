@@ -0,0 +1,172 @@
+"""Partition logs by day, cascade log deletes and add log level rollups
+
+On Postgres agent_logs and task_logs are rebuilt as tables range-partitioned
+by day on timestamp, with a default partition for anything outside the daily
+partitions. Daily partitions are created for the retention window and the
+next few days; LogRetentionService.ensure_partitions keeps creating them.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-19 00:00:00
+
+"""
+import os
+from datetime import datetime, timedelta
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+LOG_TABLES = (
+    ("agent_logs", "agent_id", "agents"),
+    ("task_logs", "task_id", "tasks"),
+)
+LOG_RETENTION_DAYS = int(os.getenv("LOG_RETENTION_DAYS", "30"))
+LOG_PARTITION_PREMAKE_DAYS = int(os.getenv("LOG_PARTITION_PREMAKE_DAYS", "7"))
+
+# Unnamed SQLite foreign keys get these names inside batch operations
+SQLITE_NAMING_CONVENTION = {"fk": "fk_%(table_name)s_%(column_0_name)s_%(referred_table_name)s"}
+
+
+def upgrade() -> None:
+    op.create_table(
+        "log_level_rollups",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("source", sa.String(), nullable=False),
+        sa.Column("source_id", sa.Integer(), nullable=False),
+        sa.Column("day", sa.Date(), nullable=False),
+        sa.Column("level", sa.String(), nullable=False),
+        sa.Column("count", sa.Integer(), nullable=False),
+        sa.UniqueConstraint("source", "source_id", "day", "level", name="uq_log_level_rollups_key"),
+    )
+    op.create_index("ix_log_level_rollups_id", "log_level_rollups", ["id"])
+
+    for table, fk_column, referred_table in LOG_TABLES:
+        op.execute(f"UPDATE {table} SET timestamp = CURRENT_TIMESTAMP WHERE timestamp IS NULL")
+        if op.get_bind().dialect.name == "postgresql":
+            _partition_table(table, fk_column, referred_table)
+        else:
+            with op.batch_alter_table(table, naming_convention=SQLITE_NAMING_CONVENTION) as batch_op:
+                batch_op.alter_column("timestamp", existing_type=sa.DateTime(), nullable=False)
+                batch_op.drop_constraint(f"fk_{table}_{fk_column}_{referred_table}", type_="foreignkey")
+                batch_op.create_foreign_key(
+                    f"fk_{table}_{fk_column}_{referred_table}", referred_table, [fk_column], ["id"], ondelete="CASCADE"
+                )
+            _recreate_keyset_index(table, fk_column)
+
+
+def downgrade() -> None:
+    for table, fk_column, referred_table in LOG_TABLES:
+        if op.get_bind().dialect.name == "postgresql":
+            _unpartition_table(table, fk_column, referred_table)
+        else:
+            with op.batch_alter_table(table, naming_convention=SQLITE_NAMING_CONVENTION) as batch_op:
+                batch_op.drop_constraint(f"fk_{table}_{fk_column}_{referred_table}", type_="foreignkey")
+                batch_op.create_foreign_key(
+                    f"fk_{table}_{fk_column}_{referred_table}", referred_table, [fk_column], ["id"]
+                )
+                batch_op.alter_column("timestamp", existing_type=sa.DateTime(), nullable=True)
+            _recreate_keyset_index(table, fk_column)
+
+    op.drop_index("ix_log_level_rollups_id", table_name="log_level_rollups")
+    op.drop_table("log_level_rollups")
+
+
+def _move_aside(table: str, fk_column: str) -> str:
+    """
+    Rename table out of the way, keeping its id sequence alive for the replacement
+    """
+    old = f"{table}_old"
+    op.drop_index(f"ix_{table}_id", table_name=table)
+    op.drop_index(f"ix_{table}_{fk_column}_timestamp", table_name=table)
+    op.execute(f"ALTER TABLE {table} RENAME TO {old}")
+    op.execute(f"ALTER TABLE {old} RENAME CONSTRAINT {table}_pkey TO {old}_pkey")
+    op.execute(f"ALTER SEQUENCE {table}_id_seq OWNED BY NONE")
+    return old
+
+
+def _create_indexes(table: str, fk_column: str) -> None:
+    op.create_index(f"ix_{table}_id", table, ["id"])
+    op.create_index(
+        f"ix_{table}_{fk_column}_timestamp",
+        table,
+        [fk_column, sa.text("timestamp DESC"), sa.text("id DESC")],
+    )
+
+
+def _recreate_keyset_index(table: str, fk_column: str) -> None:
+    """
+    SQLite batch mode copies indexes without their DESC ordering; put it back
+    """
+    op.drop_index(f"ix_{table}_{fk_column}_timestamp", table_name=table)
+    op.create_index(
+        f"ix_{table}_{fk_column}_timestamp",
+        table,
+        [fk_column, sa.text("timestamp DESC"), sa.text("id DESC")],
+    )
+
+
+def _partition_table(table: str, fk_column: str, referred_table: str) -> None:
+    old = _move_aside(table, fk_column)
+    op.execute(f"""
+        CREATE TABLE {table} (
+            id INTEGER NOT NULL DEFAULT nextval('{table}_id_seq'),
+            {fk_column} INTEGER REFERENCES {referred_table} (id) ON DELETE CASCADE,
+            timestamp TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+            level VARCHAR,
+            message TEXT,
+            details TEXT,
+            PRIMARY KEY (id, timestamp)
+        ) PARTITION BY RANGE (timestamp)
+    """)
+    op.execute(f"ALTER SEQUENCE {table}_id_seq OWNED BY {table}.id")
+    op.execute(f"CREATE TABLE {table}_default PARTITION OF {table} DEFAULT")
+
+    # Daily partitions for the retention window; older rows land in the default
+    # partition and are pruned from there
+    today = datetime.utcnow().date()
+    oldest = op.get_bind().execute(sa.text(f"SELECT min(timestamp) FROM {old}")).scalar()
+    first = max(oldest.date() if oldest else today, today - timedelta(days=LOG_RETENTION_DAYS))
+    day = first
+    while day <= today + timedelta(days=LOG_PARTITION_PREMAKE_DAYS):
+        op.execute(
+            f"CREATE TABLE {table}_p{day:%Y%m%d} PARTITION OF {table} "
+            f"FOR VALUES FROM ('{day}') TO ('{day + timedelta(days=1)}')"
+        )
+        day += timedelta(days=1)
+
+    op.execute(
+        f"INSERT INTO {table} (id, {fk_column}, timestamp, level, message, details) "
+        f"SELECT id, {fk_column}, timestamp, level, message, details FROM {old}"
+    )
+    op.execute(f"DROP TABLE {old}")
+    _create_indexes(table, fk_column)
+
+
+def _unpartition_table(table: str, fk_column: str, referred_table: str) -> None:
+    old = _move_aside(table, fk_column)
+    op.execute(f"""
+        CREATE TABLE {table} (
+            id INTEGER NOT NULL DEFAULT nextval('{table}_id_seq'),
+            {fk_column} INTEGER REFERENCES {referred_table} (id),
+            timestamp TIMESTAMP WITHOUT TIME ZONE,
+            level VARCHAR,
+            message TEXT,
+            details TEXT,
+            CONSTRAINT {table}_pkey PRIMARY KEY (id)
+        )
+    """)
+    op.execute(f"ALTER SEQUENCE {table}_id_seq OWNED BY {table}.id")
+    op.execute(
+        f"INSERT INTO {table} (id, {fk_column}, timestamp, level, message, details) "
+        f"SELECT id, {fk_column}, timestamp, level, message, details FROM {old}"
+    )
+    # Dropping the partitioned table drops all of its partitions
+    op.execute(f"DROP TABLE {old}")
+    _create_indexes(table, fk_column)
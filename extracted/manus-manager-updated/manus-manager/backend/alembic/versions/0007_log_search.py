@@ -0,0 +1,64 @@
+"""Full-text search over log messages
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-19 00:00:00
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+LOG_TABLES = ("agent_logs", "task_logs")
+
+
+def search_ddl(table: str):
+    """
+    DDL creating the full-text search objects for a log table, per dialect,
+    as of this revision (app.models.models.log_search_ddl may change later)
+    """
+    fts = f"{table}_fts"
+    return {
+        "postgresql": [
+            f"ALTER TABLE {table} ADD COLUMN search_vector tsvector GENERATED ALWAYS AS "
+            f"(to_tsvector('english', coalesce(message, ''))) STORED",
+            f"CREATE INDEX ix_{table}_search_vector ON {table} USING gin (search_vector)",
+        ],
+        "sqlite": [
+            f"CREATE VIRTUAL TABLE {fts} USING fts5(message, content='{table}', content_rowid='id')",
+            f"CREATE TRIGGER {fts}_insert AFTER INSERT ON {table} BEGIN "
+            f"INSERT INTO {fts} (rowid, message) VALUES (new.id, new.message); END",
+            f"CREATE TRIGGER {fts}_delete AFTER DELETE ON {table} BEGIN "
+            f"INSERT INTO {fts} ({fts}, rowid, message) VALUES ('delete', old.id, old.message); END",
+            f"CREATE TRIGGER {fts}_update AFTER UPDATE OF message ON {table} BEGIN "
+            f"INSERT INTO {fts} ({fts}, rowid, message) VALUES ('delete', old.id, old.message); "
+            f"INSERT INTO {fts} (rowid, message) VALUES (new.id, new.message); END",
+        ],
+    }
+
+
+def upgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    for table in LOG_TABLES:
+        for statement in search_ddl(table).get(dialect, []):
+            op.execute(statement)
+        if dialect == "sqlite":
+            # Index the rows that already exist
+            op.execute(f"INSERT INTO {table}_fts ({table}_fts) VALUES ('rebuild')")
+
+
+def downgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    for table in LOG_TABLES:
+        if dialect == "postgresql":
+            op.execute(f"DROP INDEX ix_{table}_search_vector")
+            op.execute(f"ALTER TABLE {table} DROP COLUMN search_vector")
+        elif dialect == "sqlite":
+            for trigger in ("insert", "delete", "update"):
+                op.execute(f"DROP TRIGGER {table}_fts_{trigger}")
+            op.execute(f"DROP TABLE {table}_fts")
@@ -0,0 +1,38 @@
+"""Add task lease columns and claim indexes
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-19 00:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0008"
+down_revision = "0007"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("tasks", sa.Column("lease_token", sa.String(), nullable=True))
+    op.add_column("tasks", sa.Column("lease_expires_at", sa.DateTime(), nullable=True))
+    op.add_column(
+        "tasks", sa.Column("lease_attempts", sa.Integer(), server_default="0", nullable=False)
+    )
+    op.create_index(
+        "ix_tasks_owner_id_status_priority",
+        "tasks",
+        ["owner_id", "status", sa.text("priority DESC"), "created_at"],
+    )
+    op.create_index("ix_tasks_status_lease_expires_at", "tasks", ["status", "lease_expires_at"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_tasks_status_lease_expires_at", table_name="tasks")
+    op.drop_index("ix_tasks_owner_id_status_priority", table_name="tasks")
+    op.drop_column("tasks", "lease_attempts")
+    op.drop_column("tasks", "lease_expires_at")
+    op.drop_column("tasks", "lease_token")
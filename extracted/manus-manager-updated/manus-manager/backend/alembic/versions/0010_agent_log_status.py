@@ -0,0 +1,33 @@
+"""Add agent_logs.status
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-19 00:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0010"
+down_revision = "0009"
+branch_labels = None
+depends_on = None
+
+AGENT_STATUSES = ("idle", "running", "paused", "error", "terminated")
+
+
+def upgrade() -> None:
+    op.add_column("agent_logs", sa.Column("status", sa.String(), nullable=True))
+    # Existing status changes are only recorded in the message, as
+    # "Agent status changed to <status>" (or "... to AgentStatus.<STATUS>")
+    for status in AGENT_STATUSES:
+        op.execute(
+            f"UPDATE agent_logs SET status = '{status}' "
+            f"WHERE lower(message) LIKE 'agent status changed to %{status}'"
+        )
+
+
+def downgrade() -> None:
+    op.drop_column("agent_logs", "status")
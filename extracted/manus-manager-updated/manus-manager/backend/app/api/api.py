@@ -1,6 +1,6 @@
 from fastapi import APIRouter
 
-from app.api.endpoints import auth, users, agents, tasks, tracking, analytics
+from app.api.endpoints import auth, users, agents, tasks, tracking, analytics, exports, metrics
 
 api_router = APIRouter()
 api_router.include_router(auth.router, prefix="/auth", tags=["Authentication"])
@@ -9,3 +9,5 @@ api_router.include_router(agents.router, prefix="/agents", tags=["Agents"])
 api_router.include_router(tasks.router, prefix="/tasks", tags=["Tasks"])
 api_router.include_router(tracking.router, prefix="/tracking", tags=["Tracking"])
 api_router.include_router(analytics.router, prefix="/analytics", tags=["Analytics"])
+api_router.include_router(exports.router, prefix="/exports", tags=["Exports"])
+api_router.include_router(metrics.router, prefix="/metrics", tags=["Metrics"])
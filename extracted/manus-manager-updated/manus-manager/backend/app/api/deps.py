@@ -0,0 +1,33 @@
+from fastapi import Depends
+
+from app.db.session import async_read_session_factory, read_session_factory
+from app.services.analytics_cache import analytics_cache
+from app.services.user_service import get_current_active_user
+from app.schemas.schemas import User
+
+# Read-only endpoints take their session from these dependencies instead of
+# get_db/get_async_db. Reads go to the replica when it is configured and
+# caught up, except for a user who wrote in the last REPLICA_MAX_LAG_SECONDS:
+# their reads stay on the primary so they see their own writes (and so
+# analytics recomputed after a write isn't cached from a stale replica).
+#
+# Writes are tracked per worker, so the guarantee is per worker too: a read
+# handled by a different worker than the write may go to the replica and
+# miss it, for at most REPLICA_MAX_LAG_SECONDS. Deployments that need
+# read-your-writes across workers should route each user to one worker
+# (sticky sessions) or not configure a replica.
+
+def _use_primary(user: User) -> bool:
+    return analytics_cache.recently_written(user.id)
+
+def get_read_db(current_user: User = Depends(get_current_active_user)):
+    db = read_session_factory(use_primary=_use_primary(current_user))()
+    try:
+        yield db
+    finally:
+        db.close()
+
+async def get_async_read_db(current_user: User = Depends(get_current_active_user)):
+    session_factory = await async_read_session_factory(use_primary=_use_primary(current_user))
+    async with session_factory() as db:
+        yield db
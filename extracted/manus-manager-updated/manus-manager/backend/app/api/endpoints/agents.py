@@ -1,14 +1,19 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Any, List, Optional
 from datetime import datetime
 
-from app.db.session import get_db
-from app.schemas.schemas import Agent, AgentCreate, AgentUpdate
+from app.core.fast_json import page_response, response_columns, select_fields
+from app.core.pagination import Page, check_cursor
+from app.api.deps import get_async_read_db
+from app.api.etags import conditional_get
+from app.db.session import get_async_db
+from app.schemas.schemas import Agent, AgentCreate, AgentResponse, AgentUpdate
 from app.services.agent_service import (
     create_agent,
     get_agent,
     get_agents,
+    get_agents_page,
     update_agent,
     delete_agent,
     start_agent,
@@ -20,10 +25,13 @@ from app.schemas.schemas import User
 
 router = APIRouter()
 
+# Columns selected for agent list pages
+AGENT_COLUMNS = response_columns(AgentResponse)
+
 @router.post("/", response_model=Agent)
 async def create_new_agent(
     agent_in: AgentCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ) -> Any:
     """
@@ -35,36 +43,53 @@ async def create_new_agent(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not enough permissions to create agent for another user"
         )
-    return create_agent(db=db, obj_in=agent_in)
+    return await db.run_sync(create_agent, obj_in=agent_in)
 
-@router.get("/", response_model=List[Agent])
+@router.get("/", response_model=List[Agent], dependencies=[Depends(conditional_get)])
 async def read_agents(
-    db: Session = Depends(get_db),
+    response: Response,
+    db: AsyncSession = Depends(get_async_read_db),
     skip: int = 0,
     limit: int = 100,
     status: Optional[str] = None,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
     current_user: User = Depends(get_current_user)
 ) -> Any:
     """
     Retrieve agents
+
+    Pages are returned in id order; pass the X-Next-Cursor or X-Prev-Cursor
+    response header back as `cursor` to move between pages. `skip` is still
+    accepted for older clients but gets slower the deeper it goes.
+
+    `fields` is a comma-separated list of the fields to return (id is always
+    included); only those columns are read from the database.
     """
     # If superuser, can see all agents, otherwise only own agents
-    if current_user.is_superuser:
-        return get_agents(db, skip=skip, limit=limit, status=status)
-    return get_agents(
-        db, skip=skip, limit=limit, status=status, owner_id=current_user.id
+    owner_id = None if current_user.is_superuser else current_user.id
+    columns = select_fields(fields, AGENT_COLUMNS)
+    if skip and not cursor:
+        items = await db.run_sync(
+            get_agents, skip=skip, limit=limit, status=status, owner_id=owner_id, columns=columns
+        )
+        return page_response(response, Page(items, None, None), columns, sparse=bool(fields))
+    check_cursor(cursor)
+    page = await db.run_sync(
+        get_agents_page, cursor=cursor, limit=limit, status=status, owner_id=owner_id, columns=columns
     )
+    return page_response(response, page, columns, sparse=bool(fields))
 
-@router.get("/{agent_id}", response_model=Agent)
+@router.get("/{agent_id}", response_model=Agent, dependencies=[Depends(conditional_get)])
 async def read_agent(
     agent_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ) -> Any:
     """
     Get agent by ID
     """
-    agent = get_agent(db, id=agent_id)
+    agent = await db.run_sync(get_agent, id=agent_id)
     if not agent:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -82,13 +107,13 @@ async def read_agent(
 async def update_agent_details(
     agent_id: int,
     agent_in: AgentUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ) -> Any:
     """
     Update agent
     """
-    agent = get_agent(db, id=agent_id)
+    agent = await db.run_sync(get_agent, id=agent_id)
     if not agent:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -100,18 +125,18 @@ async def update_agent_details(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not enough permissions to update this agent"
         )
-    return update_agent(db=db, db_obj=agent, obj_in=agent_in)
+    return await db.run_sync(update_agent, db_obj=agent, obj_in=agent_in)
 
 @router.delete("/{agent_id}", response_model=Agent)
 async def delete_agent_by_id(
     agent_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ) -> Any:
     """
     Delete agent
     """
-    agent = get_agent(db, id=agent_id)
+    agent = await db.run_sync(get_agent, id=agent_id)
     if not agent:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -123,18 +148,18 @@ async def delete_agent_by_id(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not enough permissions to delete this agent"
         )
-    return delete_agent(db=db, id=agent_id)
+    return await db.run_sync(delete_agent, id=agent_id)
 
 @router.post("/{agent_id}/start", response_model=Agent)
 async def start_agent_by_id(
     agent_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ) -> Any:
     """
     Start agent
     """
-    agent = get_agent(db, id=agent_id)
+    agent = await db.run_sync(get_agent, id=agent_id)
     if not agent:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -146,18 +171,18 @@ async def start_agent_by_id(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not enough permissions to start this agent"
         )
-    return start_agent(db=db, agent=agent)
+    return await db.run_sync(start_agent, agent=agent)
 
 @router.post("/{agent_id}/stop", response_model=Agent)
 async def stop_agent_by_id(
     agent_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ) -> Any:
     """
     Stop agent
     """
-    agent = get_agent(db, id=agent_id)
+    agent = await db.run_sync(get_agent, id=agent_id)
     if not agent:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -169,18 +194,18 @@ async def stop_agent_by_id(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not enough permissions to stop this agent"
         )
-    return stop_agent(db=db, agent=agent)
+    return await db.run_sync(stop_agent, agent=agent)
 
 @router.post("/{agent_id}/pause", response_model=Agent)
 async def pause_agent_by_id(
     agent_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ) -> Any:
     """
     Pause agent
     """
-    agent = get_agent(db, id=agent_id)
+    agent = await db.run_sync(get_agent, id=agent_id)
     if not agent:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -192,4 +217,4 @@ async def pause_agent_by_id(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not enough permissions to pause this agent"
         )
-    return pause_agent(db=db, agent=agent)
+    return await db.run_sync(pause_agent, agent=agent)
@@ -1,88 +1,96 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status, Query
+from sqlalchemy import and_, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from typing import Any, List, Dict
+from typing import Any, List, Dict, Optional
+from datetime import date, datetime, timedelta
 import json
 
-from app.db.session import get_db
-from app.models.models import Agent, Task
+from app.api.deps import get_async_read_db
+from app.api.etags import check_etag, conditional_get
+from app.core.quantiles import DurationSketch
+from app.db.session import get_async_db
+from app.models.models import Agent, AgentLog, Task, TaskRollup
 from app.schemas.schemas import AgentStatus, TaskStatus
 from app.services.agent_tracker import agent_tracker
-from app.services.user_service import get_current_active_user
+from app.services.analytics_cache import analytics_cache
+from app.services.rollup_service import rollup_service, ROLLUP_SCOPE_OWNER, ROLLUP_SCOPE_AGENT
+from app.services.timeseries_service import timeseries_service, TIMESERIES_METRICS, MAX_BUCKETS
+from app.services.user_service import get_current_active_user, get_current_user
 from app.schemas.schemas import User
 
 router = APIRouter()
 
-@router.get("/dashboard")
-async def get_dashboard_data(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
-) -> Any:
+def _dashboard_data(db: Session, user_id: int) -> Dict[str, Any]:
     """
-    Get dashboard data for the current user
+    Compute dashboard data for a user
     """
-    # Get agents owned by the current user
-    agents_query = db.query(Agent).filter(Agent.owner_id == current_user.id)
-    agents = agents_query.all()
-    
-    # Get tasks owned by the current user
-    tasks_query = db.query(Task).filter(Task.owner_id == current_user.id)
-    tasks = tasks_query.all()
-    
     # Count agents by status
     agent_status_counts = {status.value: 0 for status in AgentStatus}
-    for agent in agents:
-        agent_status_counts[agent.status] += 1
+    agent_counts = db.query(Agent.status, func.count(Agent.id)).filter(
+        Agent.owner_id == user_id
+    ).group_by(Agent.status).all()
+    for agent_status, count in agent_counts:
+        agent_status_counts[agent_status] = count
     
-    # Count tasks by status
-    task_status_counts = {status.value: 0 for status in TaskStatus}
-    for task in tasks:
-        task_status_counts[task.status] += 1
+    # Task counters are maintained incrementally by the rollup service
+    rollup = rollup_service.get_rollup(db, ROLLUP_SCOPE_OWNER, user_id)
+    task_status_counts = {
+        status.value: getattr(rollup, f"{status.value}_count") if rollup else 0
+        for status in TaskStatus
+    }
     
     # Calculate overall task progress
-    total_tasks = len(tasks)
-    completed_tasks = sum(1 for task in tasks if task.status == TaskStatus.COMPLETED)
-    failed_tasks = sum(1 for task in tasks if task.status == TaskStatus.FAILED)
-    in_progress_tasks = sum(1 for task in tasks if task.status == TaskStatus.IN_PROGRESS)
-    pending_tasks = sum(1 for task in tasks if task.status == TaskStatus.PENDING)
+    total_tasks = rollup.total_count if rollup else 0
+    completed_tasks = task_status_counts[TaskStatus.COMPLETED.value]
     
     overall_progress = 0
     if total_tasks > 0:
         overall_progress = int((completed_tasks / total_tasks) * 100)
     
     return {
-        "agent_count": len(agents),
+        "agent_count": sum(count for _, count in agent_counts),
         "task_count": total_tasks,
         "agent_status_counts": agent_status_counts,
         "task_status_counts": task_status_counts,
         "overall_progress": overall_progress,
         "completed_tasks": completed_tasks,
-        "failed_tasks": failed_tasks,
-        "in_progress_tasks": in_progress_tasks,
-        "pending_tasks": pending_tasks
+        "failed_tasks": task_status_counts[TaskStatus.FAILED.value],
+        "in_progress_tasks": task_status_counts[TaskStatus.IN_PROGRESS.value],
+        "pending_tasks": task_status_counts[TaskStatus.PENDING.value]
     }
 
-@router.get("/agents/stats")
-async def get_agent_stats(
-    db: Session = Depends(get_db),
+@router.get("/dashboard", dependencies=[Depends(conditional_get)])
+async def get_dashboard_data(
+    db: AsyncSession = Depends(get_async_read_db),
     current_user: User = Depends(get_current_active_user)
 ) -> Any:
     """
-    Get statistics for all agents owned by the current user
+    Get dashboard data for the current user
     """
-    # Get agents owned by the current user
-    agents_query = db.query(Agent).filter(Agent.owner_id == current_user.id)
-    agents = agents_query.all()
+    return await analytics_cache.get_or_compute(
+        current_user.id, "dashboard", (), lambda: db.run_sync(_dashboard_data, current_user.id)
+    )
+
+def _agent_stats(db: Session, user_id: int) -> List[Dict[str, Any]]:
+    """
+    Compute statistics for all agents owned by a user
+    """
+    # Get agents owned by the current user together with their task rollups
+    rows = db.query(Agent, TaskRollup).outerjoin(
+        TaskRollup,
+        and_(TaskRollup.scope == ROLLUP_SCOPE_AGENT, TaskRollup.scope_id == Agent.id)
+    ).filter(Agent.owner_id == user_id).all()
+    sketches = rollup_service.get_completion_sketches(
+        db, ROLLUP_SCOPE_AGENT, [agent.id for agent, _ in rows]
+    )
     
     agent_stats = []
-    for agent in agents:
-        # Get tasks assigned to this agent
-        tasks = db.query(Task).filter(Task.agent_id == agent.id).all()
-        
-        # Calculate task statistics
-        total_tasks = len(tasks)
-        completed_tasks = sum(1 for task in tasks if task.status == TaskStatus.COMPLETED)
-        failed_tasks = sum(1 for task in tasks if task.status == TaskStatus.FAILED)
-        in_progress_tasks = sum(1 for task in tasks if task.status == TaskStatus.IN_PROGRESS)
+    for agent, rollup in rows:
+        total_tasks = rollup.total_count if rollup else 0
+        completed_tasks = rollup.completed_count if rollup else 0
+        failed_tasks = rollup.failed_count if rollup else 0
+        in_progress_tasks = rollup.in_progress_count if rollup else 0
         
         # Calculate success rate
         success_rate = 0
@@ -98,59 +106,106 @@ async def get_agent_stats(
             "failed_tasks": failed_tasks,
             "in_progress_tasks": in_progress_tasks,
             "success_rate": success_rate,
+            "completion_time_percentiles": sketches.get(agent.id, DurationSketch()).percentiles(),
             "last_active": agent.last_active.isoformat() if agent.last_active else None
         })
     
     return agent_stats
 
-@router.get("/tasks/stats")
-async def get_task_stats(
-    db: Session = Depends(get_db),
+@router.get("/agents/stats", dependencies=[Depends(conditional_get)])
+async def get_agent_stats(
+    db: AsyncSession = Depends(get_async_read_db),
     current_user: User = Depends(get_current_active_user)
 ) -> Any:
     """
-    Get statistics for all tasks owned by the current user
+    Get statistics for all agents owned by the current user
     """
-    # Get tasks owned by the current user
-    tasks_query = db.query(Task).filter(Task.owner_id == current_user.id)
-    tasks = tasks_query.all()
+    return await analytics_cache.get_or_compute(
+        current_user.id, "agents/stats", (), lambda: db.run_sync(_agent_stats, current_user.id)
+    )
+
+def _task_stats(db: Session, user_id: int, days: Optional[int]) -> Dict[str, Any]:
+    """
+    Compute statistics for all tasks owned by a user
+    """
+    rollup = rollup_service.get_rollup(db, ROLLUP_SCOPE_OWNER, user_id)
     
-    # Calculate average completion time for completed tasks
-    completed_tasks = [task for task in tasks if task.status == TaskStatus.COMPLETED and task.started_at and task.completed_at]
-    avg_completion_time_seconds = 0
-    if completed_tasks:
-        completion_times = [(task.completed_at - task.started_at).total_seconds() for task in completed_tasks]
-        avg_completion_time_seconds = sum(completion_times) / len(completion_times)
+    # Completion times come from the per-day sketches, merged over the requested range
+    since = date.today() - timedelta(days=days - 1) if days else None
+    sketches_by_priority = rollup_service.get_completion_sketches(
+        db, ROLLUP_SCOPE_OWNER, [user_id], since=since, by_priority=True
+    )
+    overall_sketch = DurationSketch()
+    completion_time_percentiles_by_priority = {}
+    for (_, priority), sketch in sorted(sketches_by_priority.items()):
+        overall_sketch.merge(sketch)
+        completion_time_percentiles_by_priority[priority] = sketch.percentiles()
     
     # Group tasks by priority
-    tasks_by_priority = {}
-    for task in tasks:
-        priority = task.priority
-        if priority not in tasks_by_priority:
-            tasks_by_priority[priority] = 0
-        tasks_by_priority[priority] += 1
+    tasks_by_priority = dict(
+        db.query(Task.priority, func.count(Task.id)).filter(
+            Task.owner_id == user_id
+        ).group_by(Task.priority).all()
+    )
     
     return {
-        "total_tasks": len(tasks),
-        "completed_tasks": sum(1 for task in tasks if task.status == TaskStatus.COMPLETED),
-        "failed_tasks": sum(1 for task in tasks if task.status == TaskStatus.FAILED),
-        "in_progress_tasks": sum(1 for task in tasks if task.status == TaskStatus.IN_PROGRESS),
-        "pending_tasks": sum(1 for task in tasks if task.status == TaskStatus.PENDING),
-        "avg_completion_time_seconds": avg_completion_time_seconds,
+        "total_tasks": rollup.total_count if rollup else 0,
+        "completed_tasks": rollup.completed_count if rollup else 0,
+        "failed_tasks": rollup.failed_count if rollup else 0,
+        "in_progress_tasks": rollup.in_progress_count if rollup else 0,
+        "pending_tasks": rollup.pending_count if rollup else 0,
+        "avg_completion_time_seconds": overall_sketch.mean,
+        "completion_time_percentiles": overall_sketch.percentiles(),
+        "completion_time_percentiles_by_priority": completion_time_percentiles_by_priority,
         "tasks_by_priority": tasks_by_priority
     }
 
-@router.get("/agents/{agent_id}/performance")
+@router.get("/tasks/stats", dependencies=[Depends(conditional_get)])
+async def get_task_stats(
+    days: Optional[int] = Query(None, ge=1, description="Only include tasks completed in the last N days"),
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: User = Depends(get_current_active_user)
+) -> Any:
+    """
+    Get statistics for all tasks owned by the current user
+    """
+    return await analytics_cache.get_or_compute(
+        current_user.id, "tasks/stats", (days,), lambda: db.run_sync(_task_stats, current_user.id, days)
+    )
+
+async def _latest_agent_log_id(db: AsyncSession, agent_id: Optional[int] = None) -> Optional[int]:
+    """
+    Id of the newest agent log row, or of the agent's newest. Log writes
+    don't bump change versions, so ETags of content built from logs carry it.
+    """
+    query = select(func.max(AgentLog.id))
+    if agent_id is not None:
+        query = query.where(AgentLog.agent_id == agent_id)
+    return await db.scalar(query)
+
+async def conditional_performance_get(
+    agent_id: int,
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user)
+) -> None:
+    """
+    conditional_get for an agent's performance, which includes its latest logs
+    """
+    await check_etag(request, response, db, current_user, await _latest_agent_log_id(db, agent_id))
+
+@router.get("/agents/{agent_id}/performance", dependencies=[Depends(conditional_performance_get)])
 async def get_agent_performance(
     agent_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_read_db),
     current_user: User = Depends(get_current_active_user)
 ) -> Any:
     """
     Get detailed performance metrics for a specific agent
     """
     # Check if the agent belongs to the current user
-    agent = db.query(Agent).filter(Agent.id == agent_id).first()
+    agent = await db.get(Agent, agent_id)
     if not agent:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -164,7 +219,7 @@ async def get_agent_performance(
         )
     
     # Get tasks assigned to this agent
-    tasks = db.query(Task).filter(Task.agent_id == agent_id).all()
+    tasks = (await db.execute(select(Task).where(Task.agent_id == agent_id))).scalars().all()
     
     # Calculate task completion times
     task_completion_times = []
@@ -177,8 +232,11 @@ async def get_agent_performance(
                 "completion_time_seconds": completion_time
             })
     
+    sketches = await db.run_sync(rollup_service.get_completion_sketches, ROLLUP_SCOPE_AGENT, [agent_id])
+    sketch = sketches.get(agent_id, DurationSketch())
+    
     # Get agent logs
-    logs = agent_tracker.get_agent_logs(db, agent_id, limit=100)
+    logs = await db.run_sync(agent_tracker.get_agent_logs, agent_id, limit=100)
     log_data = [
         {
             "id": log.id,
@@ -198,6 +256,99 @@ async def get_agent_performance(
         "failed_tasks": sum(1 for task in tasks if task.status == TaskStatus.FAILED),
         "in_progress_tasks": sum(1 for task in tasks if task.status == TaskStatus.IN_PROGRESS),
         "task_completion_times": task_completion_times,
+        "completion_time_percentiles": sketch.percentiles(),
         "recent_logs": log_data,
         "last_active": agent.last_active.isoformat() if agent.last_active else None
     }
+
+async def conditional_timeseries_get(
+    request: Request,
+    response: Response,
+    metric: str,
+    bucket_seconds: int = Query(3600, ge=1),
+    end: Optional[datetime] = None,
+    agent_id: Optional[int] = None,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user)
+) -> None:
+    """
+    conditional_get for the timeseries. A range without an end runs to the
+    end of the current bucket, so its ETag changes when the next one starts;
+    log metrics also change with every new log row.
+    """
+    if metric not in TIMESERIES_METRICS:
+        return
+    extra = []
+    if end is None:
+        extra.append(timeseries_service.bucket_end(metric, bucket_seconds).isoformat())
+    column, _ = TIMESERIES_METRICS[metric]
+    if column.class_ is AgentLog:
+        extra.append(await _latest_agent_log_id(db, agent_id))
+    await check_etag(request, response, db, current_user, *extra)
+
+@router.get("/timeseries", dependencies=[Depends(conditional_timeseries_get)])
+async def get_timeseries(
+    metric: str,
+    bucket_seconds: int = Query(3600, ge=1),
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    agent_id: Optional[int] = None,
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: User = Depends(get_current_active_user)
+) -> Any:
+    """
+    Get event counts per time bucket as columnar arrays
+    """
+    if metric not in TIMESERIES_METRICS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid metric: {metric}. Expected one of {', '.join(TIMESERIES_METRICS)}"
+        )
+    
+    # Defaults are on the clock the metric's timestamps are written with,
+    # and end with the current bucket, so repeated reads see the same range
+    end = end or timeseries_service.bucket_end(metric, bucket_seconds)
+    start = start or end - timedelta(days=1)
+    if start >= end:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="start must be before end"
+        )
+    if (end - start).total_seconds() / bucket_seconds > MAX_BUCKETS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Too many buckets; use a range of at most {MAX_BUCKETS} buckets"
+        )
+    
+    # Check if the agent belongs to the current user
+    if agent_id is not None:
+        agent = await db.get(Agent, agent_id)
+        if not agent:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Agent not found"
+            )
+        if agent.owner_id != current_user.id and not current_user.is_superuser:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Not enough permissions to access this agent's analytics"
+            )
+    
+    timestamps, counts = await db.run_sync(
+        timeseries_service.bucket_counts,
+        metric=metric,
+        bucket_seconds=bucket_seconds,
+        start=start,
+        end=end,
+        owner_id=None if agent_id is not None else current_user.id,
+        agent_id=agent_id
+    )
+    
+    return {
+        "metric": metric,
+        "bucket_seconds": bucket_seconds,
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "timestamps": timestamps,
+        "counts": counts
+    }
@@ -1,20 +1,22 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Request, Response
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import timedelta
 from typing import Any, Dict
 
-from app.db.session import get_db
+from app.db.session import get_async_db
 from app.models.models import User
 from app.schemas.schemas import Token, UserCreate, UserResponse
 from app.core.security import (
     create_access_token, 
-    verify_password, 
     ACCESS_TOKEN_EXPIRE_MINUTES,
     verify_google_token,
     GOOGLE_CLIENT_ID,
     GOOGLE_REDIRECT_URI
 )
+from app.core.password_hasher import password_hasher
+from app.services.user_cache import user_cache
 from app.services.user_service import get_user_by_email, create_user, get_current_active_user
 
 router = APIRouter()
@@ -22,13 +24,13 @@ router = APIRouter()
 @router.post("/login", response_model=Token)
 async def login_for_access_token(
     form_data: OAuth2PasswordRequestForm = Depends(),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ) -> Any:
     """
     OAuth2 compatible token login, get an access token for future requests
     """
-    user = get_user_by_email(db, email=form_data.username)
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    user = await db.run_sync(get_user_by_email, email=form_data.username)
+    if not user or not await password_hasher.verify(form_data.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
@@ -37,7 +39,7 @@ async def login_for_access_token(
     
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": str(user.id)}, expires_delta=access_token_expires
+        data={"sub": str(user.id), "ver": user.token_version}, expires_delta=access_token_expires
     )
     
     return {
@@ -49,7 +51,7 @@ async def login_for_access_token(
 @router.post("/google", response_model=Token)
 async def login_with_google(
     request: Dict[str, str],
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ) -> Any:
     """
     Login with Google OAuth2
@@ -62,11 +64,11 @@ async def login_with_google(
             detail="Google token is required",
         )
     
-    # Verify the token and get user info
-    google_user = verify_google_token(token)
+    # Verify the token and get user info; a cold key cache fetches Google's certificates
+    google_user = await run_in_threadpool(verify_google_token, token)
     
     # Check if user exists
-    user = get_user_by_email(db, email=google_user["email"])
+    user = await db.run_sync(get_user_by_email, email=google_user["email"])
     
     # If user doesn't exist, create a new one
     if not user:
@@ -80,19 +82,20 @@ async def login_with_google(
             full_name=google_user.get("name", ""),
             profile_picture=google_user.get("picture", "")
         )
-        user = create_user(db, user_in, is_google_user=True)
+        user = await db.run_sync(create_user, obj_in=user_in)
     elif not user.google_id:
         # Update existing user with Google ID if they didn't have one
         user.google_id = google_user["sub"]
         user.profile_picture = google_user.get("picture", user.profile_picture)
         user.full_name = google_user.get("name", user.full_name)
-        db.commit()
-        db.refresh(user)
+        await db.commit()
+        await db.refresh(user)
+        user_cache.invalidate(user.id)
     
     # Create access token
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": str(user.id)}, expires_delta=access_token_expires
+        data={"sub": str(user.id), "ver": user.token_version}, expires_delta=access_token_expires
     )
     
     return {
@@ -0,0 +1,61 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+from typing import Any, Optional
+from datetime import datetime
+
+from app.api.deps import get_read_db
+from app.services.export_service import export_service, EXPORTS, EXPORT_FORMATS
+from app.services.user_service import get_current_active_user
+from app.schemas.schemas import User
+
+router = APIRouter()
+
+@router.get("/{name}")
+async def export(
+    name: str,
+    format: str = "ndjson",
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    agent_id: Optional[int] = None,
+    db: Session = Depends(get_read_db),
+    current_user: User = Depends(get_current_active_user)
+) -> Any:
+    """
+    Stream agent_logs, task_logs or tasks as NDJSON or CSV, ordered by id
+
+    start/end filter on the log timestamp, or on created_at for tasks.
+    """
+    if name not in EXPORTS:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Unknown export: {name}. Expected one of {', '.join(EXPORTS)}"
+        )
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid format: {format}. Expected one of {', '.join(EXPORT_FORMATS)}"
+        )
+    if start and end and start >= end:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="start must be before end"
+        )
+    
+    # The export reads through the sync session: StreamingResponse iterates a
+    # sync generator in the threadpool, so the server-side cursor never blocks
+    # the event loop
+    chunks = export_service.stream(
+        db,
+        name,
+        format,
+        owner_id=None if current_user.is_superuser else current_user.id,
+        agent_id=agent_id,
+        start=start,
+        end=end,
+    )
+    return StreamingResponse(
+        chunks,
+        media_type=EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="{name}.{format}"'},
+    )
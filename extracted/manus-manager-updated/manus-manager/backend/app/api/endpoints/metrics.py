@@ -0,0 +1,53 @@
+from fastapi import APIRouter, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Any
+import os
+import secrets
+
+from app.core.password_hasher import password_hasher
+from app.db import session
+from app.db.pool import pool_stats
+from app.db.session import get_async_db
+from app.services.log_writer import log_writer
+from app.services.progress_coalescer import progress_coalescer
+from app.services.scheduler_service import task_scheduler
+from app.services.user_cache import user_cache
+from app.services.user_service import oauth2_scheme, user_service
+
+router = APIRouter()
+
+# Metrics settings
+# Bearer token a metrics scraper may send instead of a superuser's token
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+async def check_metrics_access(
+    token: str = Depends(oauth2_scheme),
+    db: AsyncSession = Depends(get_async_db)
+) -> None:
+    """
+    Allow METRICS_TOKEN, when one is set, or a superuser's token
+    """
+    if METRICS_TOKEN and secrets.compare_digest(token.encode(), METRICS_TOKEN.encode()):
+        return
+    current_user = await user_service.get_current_user(db=db, token=token)
+    await user_service.get_current_active_superuser(current_user=current_user)
+
+@router.get("/", dependencies=[Depends(check_metrics_access)])
+async def read_metrics() -> Any:
+    """
+    Get runtime metrics: database connection pools, replica lag, the log writer, buffered task progress, the
+    task scheduler, the authenticated-user cache and password hashing
+
+    Served without touching the database when the caller sends METRICS_TOKEN
+    or is in the user cache, so it keeps answering while the pools are
+    exhausted.
+    """
+    return {
+        "db_pools": pool_stats(),
+        "db_replica": session.replica_monitor.stats() if session.replica_monitor else None,
+        "log_writer": log_writer.stats(),
+        "progress": progress_coalescer.stats(),
+        "scheduler": task_scheduler.stats(),
+        "user_cache": user_cache.stats(),
+        "password_hashing": password_hasher.stats(),
+    }
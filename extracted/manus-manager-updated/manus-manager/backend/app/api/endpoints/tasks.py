@@ -1,27 +1,46 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
-from typing import Any, List, Optional
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Any, List, Optional, Set
 from datetime import datetime
 
-from app.db.session import get_db
-from app.schemas.schemas import Task, TaskCreate, TaskUpdate
+from app.core.fast_json import page_response, response_columns, select_fields
+from app.core.pagination import Page, check_cursor
+from app.api.deps import get_async_read_db
+from app.api.etags import conditional_get
+from app.db.session import get_async_db
+from app.models.models import Agent as AgentModel
+from app.schemas.schemas import (
+    Task, TaskCreate, TaskUpdate, TaskBulkCreate, TaskBulkAssign, TaskBulkResult,
+    TaskLease, TaskLeaseRequest, TaskLeaseRenew, TaskResponse
+)
+from app.services.agent_service import get_agent_owners
+from app.services.lease_service import lease_service, TASK_LEASE_SECONDS, TASK_LEASE_MAX_SECONDS
 from app.services.task_service import (
+    TASK_BULK_MAX_ITEMS,
     create_task,
+    create_tasks,
     get_task,
+    get_task_owners,
     get_tasks,
+    get_tasks_page,
     update_task,
     delete_task,
-    assign_task_to_agent
+    assign_task_to_agent,
+    assign_tasks_to_agents
 )
+from app.services.scheduler_service import SCHEDULABLE_AGENT_STATUSES
 from app.services.user_service import get_current_user
 from app.schemas.schemas import User
 
 router = APIRouter()
 
+# Columns selected for task list pages
+TASK_COLUMNS = response_columns(TaskResponse)
+
 @router.post("/", response_model=Task)
 async def create_new_task(
     task_in: TaskCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ) -> Any:
     """
@@ -33,37 +52,207 @@ async def create_new_task(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not enough permissions to create task for another user"
         )
-    return create_task(db=db, obj_in=task_in)
+    return await db.run_sync(create_task, obj_in=task_in)
+
+def _check_bulk_size(count: int) -> None:
+    if count > TASK_BULK_MAX_ITEMS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"At most {TASK_BULK_MAX_ITEMS} items per request"
+        )
+
+async def _check_agents(db: AsyncSession, agent_ids: Set[int], current_user: User) -> None:
+    owners = await db.run_sync(get_agent_owners, agent_ids)
+    missing = sorted(agent_ids - owners.keys())
+    if missing:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Agents not found: {missing[:20]}"
+        )
+    if not current_user.is_superuser and any(owner_id != current_user.id for owner_id in owners.values()):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not enough permissions to assign tasks to another user's agent"
+        )
+
+@router.post("/bulk", response_model=TaskBulkResult)
+async def create_tasks_bulk(
+    tasks_in: TaskBulkCreate,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user)
+) -> Any:
+    """
+    Create many tasks in one transaction
+
+    Either every task is created or none is. Returns the new ids in request
+    order.
+    """
+    _check_bulk_size(len(tasks_in.tasks))
+    if not current_user.is_superuser and any(task.owner_id != current_user.id for task in tasks_in.tasks):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not enough permissions to create task for another user"
+        )
+    agent_ids = {task.agent_id for task in tasks_in.tasks if task.agent_id is not None}
+    if agent_ids:
+        await _check_agents(db, agent_ids, current_user)
+    ids = await db.run_sync(create_tasks, objs_in=tasks_in.tasks)
+    return {"ids": ids, "count": len(ids)}
+
+@router.post("/bulk-assign", response_model=TaskBulkResult)
+async def assign_tasks_bulk(
+    assign_in: TaskBulkAssign,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user)
+) -> Any:
+    """
+    Assign many tasks to agents in one transaction
 
-@router.get("/", response_model=List[Task])
+    Either every assignment is applied or none is. Returns the assigned task
+    ids in request order.
+    """
+    _check_bulk_size(len(assign_in.assignments))
+    assignments = {assignment.task_id: assignment.agent_id for assignment in assign_in.assignments}
+    if len(assignments) != len(assign_in.assignments):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Each task may only be assigned once per request"
+        )
+    owners = await db.run_sync(get_task_owners, assignments.keys())
+    missing = sorted(assignments.keys() - owners.keys())
+    if missing:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Tasks not found: {missing[:20]}"
+        )
+    if not current_user.is_superuser and any(owner_id != current_user.id for owner_id in owners.values()):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not enough permissions to assign this task"
+        )
+    await _check_agents(db, set(assignments.values()), current_user)
+    ids = await db.run_sync(assign_tasks_to_agents, assignments=assignments)
+    return {"ids": ids, "count": len(ids)}
+
+def _lease_seconds(lease_seconds: Optional[int]) -> int:
+    if lease_seconds is None:
+        return TASK_LEASE_SECONDS
+    if not 1 <= lease_seconds <= TASK_LEASE_MAX_SECONDS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"lease_seconds must be between 1 and {TASK_LEASE_MAX_SECONDS}"
+        )
+    return lease_seconds
+
+@router.post("/lease", response_model=TaskLease, responses={204: {"description": "No task to lease"}})
+async def lease_task(
+    lease_in: TaskLeaseRequest,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user)
+) -> Any:
+    """
+    Claim the highest-priority pending task for an agent
+
+    The task moves to in_progress under the returned lease token. Renew the
+    lease through /tasks/{task_id}/lease/heartbeat before lease_expires_at;
+    once it lapses the task goes back to pending for another agent. Returns
+    204 when there is nothing to lease or the agent is at max_tasks.
+    """
+    lease_seconds = _lease_seconds(lease_in.lease_seconds)
+    agent = await db.get(AgentModel, lease_in.agent_id)
+    if not agent:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Agent not found"
+        )
+    if agent.owner_id != current_user.id and not current_user.is_superuser:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not enough permissions to lease tasks for this agent"
+        )
+    if agent.status not in SCHEDULABLE_AGENT_STATUSES:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Agent is {agent.status}"
+        )
+    lease = await db.run_sync(lease_service.claim, agent=agent, lease_seconds=lease_seconds)
+    if lease is None:
+        return Response(status_code=status.HTTP_204_NO_CONTENT)
+    task, lease_token = lease
+    return {"task": task, "lease_token": lease_token, "lease_expires_at": task.lease_expires_at}
+
+@router.post("/{task_id}/lease/heartbeat")
+async def renew_task_lease(
+    task_id: int,
+    renew_in: TaskLeaseRenew,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user)
+) -> Any:
+    """
+    Extend a task lease
+
+    Returns 409 when the lease has already expired or been requeued; the
+    agent should stop working on the task.
+    """
+    lease_seconds = _lease_seconds(renew_in.lease_seconds)
+    expires_at = await db.run_sync(
+        lease_service.renew, task_id=task_id, lease_token=renew_in.lease_token, lease_seconds=lease_seconds
+    )
+    if expires_at is None:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Lease expired or not held"
+        )
+    return {"task_id": task_id, "lease_expires_at": expires_at}
+
+@router.get("/", response_model=List[Task], dependencies=[Depends(conditional_get)])
 async def read_tasks(
-    db: Session = Depends(get_db),
+    response: Response,
+    db: AsyncSession = Depends(get_async_read_db),
     skip: int = 0,
     limit: int = 100,
     status: Optional[str] = None,
     agent_id: Optional[int] = None,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
     current_user: User = Depends(get_current_user)
 ) -> Any:
     """
     Retrieve tasks
+
+    Pages are returned in id order; pass the X-Next-Cursor or X-Prev-Cursor
+    response header back as `cursor` to move between pages. `skip` is still
+    accepted for older clients but gets slower the deeper it goes.
+
+    `fields` is a comma-separated list of the fields to return (id is always
+    included); only those columns are read from the database.
     """
     # If superuser, can see all tasks, otherwise only own tasks
-    if current_user.is_superuser:
-        return get_tasks(db, skip=skip, limit=limit, status=status, agent_id=agent_id)
-    return get_tasks(
-        db, skip=skip, limit=limit, status=status, agent_id=agent_id, owner_id=current_user.id
+    owner_id = None if current_user.is_superuser else current_user.id
+    columns = select_fields(fields, TASK_COLUMNS)
+    if skip and not cursor:
+        items = await db.run_sync(
+            get_tasks, skip=skip, limit=limit, status=status, agent_id=agent_id, owner_id=owner_id,
+            columns=columns
+        )
+        return page_response(response, Page(items, None, None), columns, sparse=bool(fields))
+    check_cursor(cursor)
+    page = await db.run_sync(
+        get_tasks_page, cursor=cursor, limit=limit, status=status, agent_id=agent_id, owner_id=owner_id,
+        columns=columns
     )
+    return page_response(response, page, columns, sparse=bool(fields))
 
-@router.get("/{task_id}", response_model=Task)
+@router.get("/{task_id}", response_model=Task, dependencies=[Depends(conditional_get)])
 async def read_task(
     task_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ) -> Any:
     """
     Get task by ID
     """
-    task = get_task(db, id=task_id)
+    task = await db.run_sync(get_task, id=task_id)
     if not task:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -81,13 +270,13 @@ async def read_task(
 async def update_task_details(
     task_id: int,
     task_in: TaskUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ) -> Any:
     """
     Update task
     """
-    task = get_task(db, id=task_id)
+    task = await db.run_sync(get_task, id=task_id)
     if not task:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -99,18 +288,18 @@ async def update_task_details(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not enough permissions to update this task"
         )
-    return update_task(db=db, db_obj=task, obj_in=task_in)
+    return await db.run_sync(update_task, db_obj=task, obj_in=task_in)
 
 @router.delete("/{task_id}", response_model=Task)
 async def delete_task_by_id(
     task_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ) -> Any:
     """
     Delete task
     """
-    task = get_task(db, id=task_id)
+    task = await db.run_sync(get_task, id=task_id)
     if not task:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -122,19 +311,19 @@ async def delete_task_by_id(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not enough permissions to delete this task"
         )
-    return delete_task(db=db, id=task_id)
+    return await db.run_sync(delete_task, id=task_id)
 
 @router.post("/{task_id}/assign/{agent_id}", response_model=Task)
 async def assign_task(
     task_id: int,
     agent_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ) -> Any:
     """
     Assign task to agent
     """
-    task = get_task(db, id=task_id)
+    task = await db.run_sync(get_task, id=task_id)
     if not task:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -146,4 +335,4 @@ async def assign_task(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not enough permissions to assign this task"
         )
-    return assign_task_to_agent(db=db, task_id=task_id, agent_id=agent_id)
+    return await db.run_sync(assign_task_to_agent, task_id=task_id, agent_id=agent_id)
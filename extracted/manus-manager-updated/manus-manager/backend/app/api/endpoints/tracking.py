@@ -1,20 +1,33 @@
-from fastapi import APIRouter, Depends, HTTPException, WebSocket, WebSocketDisconnect, status, Query
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, WebSocket, WebSocketDisconnect, status, Query, Response
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Any, List, Optional
+from datetime import datetime
 
-from app.db.session import get_db
-from app.schemas.schemas import AgentLog as AgentLogSchema, TaskLog as TaskLogSchema
+from app.api.deps import get_async_read_db
+from app.core.fast_json import page_response, response_columns
+from app.core.pagination import check_cursor
+from app.db.session import get_async_db
+from app.models.models import Agent, Task, User as UserModel
+from app.schemas.schemas import (
+    AgentLog as AgentLogSchema, AgentLogResponse, AgentStatus, TaskLog as TaskLogSchema, TaskLogResponse, TaskStatus,
+    LogSearchResult
+)
 from app.services.agent_tracker import agent_tracker
+from app.services.log_search_service import log_search_service, LOG_SEARCH_SOURCES, LOG_SEARCH_ORDERS
 from app.services.user_service import get_current_user, get_current_active_user
 from app.schemas.schemas import User
 
 router = APIRouter()
 
+# Columns selected for log pages
+AGENT_LOG_COLUMNS = response_columns(AgentLogResponse)
+TASK_LOG_COLUMNS = response_columns(TaskLogResponse)
+
 @router.websocket("/ws/{user_id}")
 async def websocket_endpoint(
     websocket: WebSocket,
     user_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     WebSocket endpoint for real-time agent tracking
@@ -22,7 +35,9 @@ async def websocket_endpoint(
     # Authenticate the WebSocket connection
     # In a real implementation, you would validate a token here
     # For now, we just check if the user exists
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await db.get(UserModel, user_id)
+    # Don't hold a pooled connection for the lifetime of the socket
+    await db.close()
     if not user:
         await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
         return
@@ -39,15 +54,19 @@ async def websocket_endpoint(
 @router.get("/agents/{agent_id}/logs", response_model=List[AgentLogSchema])
 async def read_agent_logs(
     agent_id: int,
+    response: Response,
     limit: int = 100,
-    db: Session = Depends(get_db),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_read_db),
     current_user: User = Depends(get_current_active_user)
 ) -> Any:
     """
-    Get logs for an agent
+    Get logs for an agent, newest first
+
+    X-Next-Cursor pages to older logs and X-Prev-Cursor back to newer ones.
     """
     # Check if the agent belongs to the current user
-    agent = db.query(Agent).filter(Agent.id == agent_id).first()
+    agent = await db.get(Agent, agent_id)
     if not agent:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -60,20 +79,28 @@ async def read_agent_logs(
             detail="Not enough permissions to access this agent's logs"
         )
     
-    return agent_tracker.get_agent_logs(db, agent_id, limit)
+    check_cursor(cursor)
+    page = await db.run_sync(
+        agent_tracker.get_agent_logs_page, agent_id, cursor=cursor, limit=limit, columns=AGENT_LOG_COLUMNS
+    )
+    return page_response(response, page, AGENT_LOG_COLUMNS)
 
 @router.get("/tasks/{task_id}/logs", response_model=List[TaskLogSchema])
 async def read_task_logs(
     task_id: int,
+    response: Response,
     limit: int = 100,
-    db: Session = Depends(get_db),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_read_db),
     current_user: User = Depends(get_current_active_user)
 ) -> Any:
     """
-    Get logs for a task
+    Get logs for a task, newest first
+
+    X-Next-Cursor pages to older logs and X-Prev-Cursor back to newer ones.
     """
     # Check if the task belongs to the current user
-    task = db.query(Task).filter(Task.id == task_id).first()
+    task = await db.get(Task, task_id)
     if not task:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -86,20 +113,75 @@ async def read_task_logs(
             detail="Not enough permissions to access this task's logs"
         )
     
-    return agent_tracker.get_task_logs(db, task_id, limit)
+    check_cursor(cursor)
+    page = await db.run_sync(
+        agent_tracker.get_task_logs_page, task_id, cursor=cursor, limit=limit, columns=TASK_LOG_COLUMNS
+    )
+    return page_response(response, page, TASK_LOG_COLUMNS)
+
+@router.get("/logs/search", response_model=List[LogSearchResult])
+async def search_logs(
+    q: str = Query(..., min_length=1, max_length=256),
+    source: str = "agent",
+    agent_id: Optional[int] = None,
+    task_id: Optional[int] = None,
+    level: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    order: str = "rank",
+    limit: int = Query(50, ge=1, le=200),
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: User = Depends(get_current_active_user)
+) -> Any:
+    """
+    Full-text search over agent or task log messages
+
+    Results are ranked by relevance (order=rank) or sorted by time
+    (order=newest / order=oldest), each with a snippet highlighting the
+    matched words in <mark> tags.
+    """
+    if source not in LOG_SEARCH_SOURCES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid source: {source}. Expected one of {', '.join(LOG_SEARCH_SOURCES)}"
+        )
+    if order not in LOG_SEARCH_ORDERS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid order: {order}. Expected one of {', '.join(LOG_SEARCH_ORDERS)}"
+        )
+    if start and end and start >= end:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="start must be before end"
+        )
+    
+    return await db.run_sync(
+        log_search_service.search,
+        query=q,
+        source=source,
+        owner_id=None if current_user.is_superuser else current_user.id,
+        agent_id=agent_id,
+        task_id=task_id,
+        level=level,
+        start=start,
+        end=end,
+        order=order,
+        limit=limit,
+    )
 
-@router.post("/agents/{agent_id}/status/{status}")
+@router.post("/agents/{agent_id}/status/{new_status}")
 async def update_agent_status(
     agent_id: int,
-    status: str,
-    db: Session = Depends(get_db),
+    new_status: str,
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_active_user)
 ) -> Any:
     """
     Update agent status
     """
     # Check if the agent belongs to the current user
-    agent = db.query(Agent).filter(Agent.id == agent_id).first()
+    agent = await db.get(Agent, agent_id)
     if not agent:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -114,28 +196,28 @@ async def update_agent_status(
     
     # Validate status
     try:
-        agent_status = AgentStatus(status)
+        agent_status = AgentStatus(new_status)
     except ValueError:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Invalid status: {status}"
+            detail=f"Invalid status: {new_status}"
         )
     
-    return agent_tracker.update_agent_status(db, agent_id, agent_status)
+    return await db.run_sync(agent_tracker.update_agent_status, agent_id, agent_status)
 
 @router.post("/tasks/{task_id}/progress/{progress}")
 async def update_task_progress(
     task_id: int,
     progress: int,
     task_status: Optional[str] = None,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_active_user)
 ) -> Any:
     """
     Update task progress
     """
     # Check if the task belongs to the current user
-    task = db.query(Task).filter(Task.id == task_id).first()
+    task = await db.get(Task, task_id)
     if not task:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -166,4 +248,4 @@ async def update_task_progress(
                 detail=f"Invalid status: {task_status}"
             )
     
-    return agent_tracker.update_task_progress(db, task_id, progress, task_status_enum)
+    return await db.run_sync(agent_tracker.update_task_progress, task_id, progress, task_status_enum)
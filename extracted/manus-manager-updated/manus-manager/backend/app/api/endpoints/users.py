@@ -1,13 +1,17 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import Any, List
+from fastapi import APIRouter, Depends, HTTPException, status, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Any, List, Optional
 
-from app.db.session import get_db
+from app.core.password_hasher import password_hasher
+from app.core.pagination import check_cursor, set_page_headers
+from app.api.deps import get_async_read_db
+from app.db.session import get_async_db
 from app.schemas.schemas import User, UserCreate, UserUpdate
 from app.services.user_service import (
     create_user,
     get_user,
     get_users,
+    get_users_page,
     update_user,
     delete_user,
     get_current_active_superuser,
@@ -19,42 +23,53 @@ router = APIRouter()
 @router.post("/", response_model=User)
 async def create_new_user(
     user_in: UserCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_active_superuser)
 ) -> Any:
     """
     Create new user (superuser only)
     """
-    user = get_user(db, email=user_in.email)
+    user = await db.run_sync(get_user, email=user_in.email)
     if user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="User with this email already exists"
         )
-    return create_user(db=db, obj_in=user_in)
+    hashed_password = await password_hasher.hash(user_in.password)
+    return await db.run_sync(create_user, obj_in=user_in, hashed_password=hashed_password)
 
 @router.get("/", response_model=List[User])
 async def read_users(
-    db: Session = Depends(get_db),
+    response: Response,
+    db: AsyncSession = Depends(get_async_read_db),
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
     current_user: User = Depends(get_current_active_superuser)
 ) -> Any:
     """
     Retrieve users (superuser only)
+
+    Pass the X-Next-Cursor or X-Prev-Cursor response header back as
+    `cursor` to move between pages.
     """
-    return get_users(db, skip=skip, limit=limit)
+    if skip and not cursor:
+        return await db.run_sync(get_users, skip=skip, limit=limit)
+    check_cursor(cursor)
+    page = await db.run_sync(get_users_page, cursor=cursor, limit=limit)
+    set_page_headers(response, page)
+    return page.items
 
 @router.get("/{user_id}", response_model=User)
 async def read_user(
     user_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ) -> Any:
     """
     Get user by ID
     """
-    user = get_user(db, id=user_id)
+    user = await db.run_sync(get_user, id=user_id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -72,13 +87,13 @@ async def read_user(
 async def update_user_details(
     user_id: int,
     user_in: UserUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ) -> Any:
     """
     Update user
     """
-    user = get_user(db, id=user_id)
+    user = await db.run_sync(get_user, id=user_id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -90,21 +105,24 @@ async def update_user_details(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not enough permissions to update this user"
         )
-    return update_user(db=db, db_obj=user, obj_in=user_in)
+    update_data = user_in.dict(exclude_unset=True)
+    if update_data.get("password"):
+        update_data["hashed_password"] = await password_hasher.hash(update_data.pop("password"))
+    return await db.run_sync(update_user, db_obj=user, obj_in=update_data)
 
 @router.delete("/{user_id}", response_model=User)
 async def delete_user_by_id(
     user_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_active_superuser)
 ) -> Any:
     """
     Delete user (superuser only)
     """
-    user = get_user(db, id=user_id)
+    user = await db.run_sync(get_user, id=user_id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User not found"
         )
-    return delete_user(db=db, id=user_id)
+    return await db.run_sync(delete_user, id=user_id)
@@ -0,0 +1,78 @@
+import hashlib
+from typing import Any
+
+from fastapi import Depends, HTTPException, Request, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.db.session import get_async_db
+from app.models.models import User
+from app.services.change_versions import change_versions
+from app.services.user_service import get_current_user
+
+
+def change_version(db: Session, user: User) -> int:
+    """
+    The change version covering what a user can read: their own, or every
+    user's for a superuser
+    """
+    if user.is_superuser:
+        return change_versions.global_version(db)
+    return change_versions.version(db, user.id)
+
+
+def make_etag(request: Request, user: User, version: int, *extra: Any) -> str:
+    """
+    Weak ETag for a GET of this URL by this user at a change version. extra
+    holds anything else the content depends on.
+    """
+    resource = f"{user.id}:{int(user.is_superuser)}:{request.url.path}?{sorted(request.query_params.multi_items())}"
+    if extra:
+        resource += f":{extra}"
+    digest = hashlib.blake2b(resource.encode(), digest_size=8).hexdigest()
+    return f'W/"{version}-{digest}"'
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """
+    Weak comparison of an If-None-Match header against etag
+    """
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or (candidate[2:] if candidate.startswith("W/") else candidate) == opaque:
+            return True
+    return False
+
+
+async def check_etag(request: Request, response: Response, db: AsyncSession, user: User, *extra: Any) -> None:
+    """
+    What conditional_get does, for routes whose content also depends on
+    extra values besides the change version
+    """
+    version = await db.run_sync(change_version, user)
+    etag = make_etag(request, user, version, *extra)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if_none_match = request.headers.get("If-None-Match")
+    if if_none_match and etag_matches(if_none_match, etag):
+        raise HTTPException(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    response.headers.update(headers)
+
+
+async def conditional_get(
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user)
+) -> None:
+    """
+    Route dependency for reads whose content only changes with the user's
+    change version (see ChangeVersions)
+
+    Answers 304 Not Modified before the endpoint runs when If-None-Match
+    carries the current ETag, and otherwise sets the ETag on the response.
+    The version is read from the primary before the endpoint queries
+    anything, so a write landing mid-request makes the next ETag differ
+    rather than hiding it.
+    """
+    await check_etag(request, response, db, current_user)
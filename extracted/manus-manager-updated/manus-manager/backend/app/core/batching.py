@@ -0,0 +1,16 @@
+import os
+from typing import Iterator, List, Sequence, TypeVar
+
+T = TypeVar("T")
+
+# Ids per IN (...) list in bulk reads and writes; keeps statements well under
+# SQLite's bound-parameter limit
+BULK_CHUNK_SIZE = int(os.getenv("BULK_CHUNK_SIZE", "1000"))
+
+
+def chunked(items: Sequence[T], size: int = BULK_CHUNK_SIZE) -> Iterator[List[T]]:
+    """
+    Split a sequence into lists of at most `size` items
+    """
+    for start in range(0, len(items), size):
+        yield list(items[start:start + size])
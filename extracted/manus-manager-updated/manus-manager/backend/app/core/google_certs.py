@@ -0,0 +1,170 @@
+import logging
+import os
+import re
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Callable, Dict, Mapping, Optional
+
+if TYPE_CHECKING:
+    import requests
+
+logger = logging.getLogger(__name__)
+
+# Google signing-key settings
+GOOGLE_CERTS_URL = os.getenv("GOOGLE_CERTS_URL", "https://www.googleapis.com/oauth2/v1/certs")
+GOOGLE_CERTS_TIMEOUT_SECONDS = float(os.getenv("GOOGLE_CERTS_TIMEOUT_SECONDS", "5"))
+# Used when the response has no max-age
+GOOGLE_CERTS_DEFAULT_TTL_SECONDS = float(os.getenv("GOOGLE_CERTS_DEFAULT_TTL_SECONDS", "3600"))
+# Keys are refreshed in the background once they are this close to expiring
+GOOGLE_CERTS_REFRESH_MARGIN_SECONDS = float(os.getenv("GOOGLE_CERTS_REFRESH_MARGIN_SECONDS", "300"))
+# Minimum time between refetches for tokens signed with an unknown key
+GOOGLE_CERTS_MIN_REFETCH_SECONDS = float(os.getenv("GOOGLE_CERTS_MIN_REFETCH_SECONDS", "30"))
+
+_MAX_AGE = re.compile(r"(?:^|,)\s*max-age\s*=\s*(\d+)", re.IGNORECASE)
+
+
+def cache_lifetime(headers: Mapping[str, str], default: float = GOOGLE_CERTS_DEFAULT_TTL_SECONDS) -> float:
+    """
+    Seconds a response stays fresh: Cache-Control max-age less the Age
+    header, or default when there is no max-age
+    """
+    cache_control = headers.get("Cache-Control", "")
+    if "no-store" in cache_control.lower() or "no-cache" in cache_control.lower():
+        return 0.0
+    match = _MAX_AGE.search(cache_control)
+    if match is None:
+        return default
+    try:
+        age = float(headers.get("Age", 0))
+    except ValueError:
+        age = 0.0
+    return max(int(match.group(1)) - age, 0.0)
+
+
+class GoogleCertCache:
+    """
+    Google's ID token signing certificates, fetched once and verified against locally
+
+    The certificates are kept for as long as the response's Cache-Control
+    allows. Once they are within refresh_margin of expiring, the next caller
+    starts a background refresh and keeps using the current set, so logins
+    don't wait on Google. Only a cold or expired cache fetches inline. A
+    token signed with a key that isn't in the set triggers a refetch, at most
+    once per min_refetch seconds, to pick up keys Google has rotated in early.
+    Failed refreshes keep the current set and are retried on the same
+    schedule. Fetches share one pooled HTTP session.
+
+    requests and google.auth are imported on first use, so only workers that
+    handle a Google login pay for them.
+    """
+    def __init__(
+        self,
+        url: str = GOOGLE_CERTS_URL,
+        timeout: float = GOOGLE_CERTS_TIMEOUT_SECONDS,
+        refresh_margin: float = GOOGLE_CERTS_REFRESH_MARGIN_SECONDS,
+        min_refetch: float = GOOGLE_CERTS_MIN_REFETCH_SECONDS,
+        timer: Callable[[], float] = time.monotonic
+    ):
+        self.url = url
+        self.timeout = timeout
+        self.refresh_margin = refresh_margin
+        self.min_refetch = min_refetch
+        self._timer = timer
+        self._session: Optional["requests.Session"] = None
+        self._lock = threading.Lock()
+        self._certs: Dict[str, str] = {}
+        self._expires_at = 0.0
+        self._fetched_at: Optional[float] = None
+        self._refresh_thread: Optional[threading.Thread] = None
+        self.fetches = 0
+        self.failures = 0
+
+    def certs(self) -> Dict[str, str]:
+        """
+        The current certificates by key id, fetching them if the cache is cold or expired
+        """
+        now = self._timer()
+        if not self._certs or now >= self._expires_at:
+            with self._lock:
+                if not self._certs or (self._timer() >= self._expires_at and not self._fetched_recently()):
+                    self._fetch_or_keep()
+        elif now >= self._expires_at - self.refresh_margin and not self._fetched_recently():
+            self._refresh_in_background()
+        return self._certs
+
+    def verify(self, token: str, audience: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Verify an ID token's signature, expiry and audience, returning its claims
+        """
+        from google.auth import jwt
+
+        certs = self.certs()
+        key_id = jwt.decode_header(token).get("kid")
+        if key_id not in certs:
+            certs = self._refetch()
+        return jwt.decode(token, certs=certs, audience=audience)
+
+    def close(self) -> None:
+        with self._lock:
+            session, self._session = self._session, None
+        if session is not None:
+            session.close()
+
+    def _get_session(self) -> "requests.Session":
+        if self._session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+
+            session = requests.Session()
+            session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=4))
+            self._session = session
+        return self._session
+
+    def _fetch(self) -> None:
+        # Called with _lock held
+        self._fetched_at = self._timer()
+        try:
+            response = self._get_session().get(self.url, timeout=self.timeout)
+            response.raise_for_status()
+            certs = response.json()
+        except Exception:
+            self.failures += 1
+            raise
+        self.fetches += 1
+        self._certs = certs
+        self._expires_at = self._fetched_at + cache_lifetime(response.headers)
+
+    def _fetch_or_keep(self) -> None:
+        """
+        Fetch, keeping the current certificates if that fails and there are any
+        """
+        try:
+            self._fetch()
+        except Exception:
+            if not self._certs:
+                raise
+            logger.warning("Refreshing Google signing certificates failed; keeping the current set", exc_info=True)
+
+    def _fetched_recently(self) -> bool:
+        return self._fetched_at is not None and self._timer() - self._fetched_at < self.min_refetch
+
+    def _refetch(self) -> Dict[str, str]:
+        with self._lock:
+            if not self._fetched_recently():
+                self._fetch_or_keep()
+            return self._certs
+
+    def _refresh_in_background(self) -> None:
+        with self._lock:
+            if self._refresh_thread is not None and self._refresh_thread.is_alive():
+                return
+            self._refresh_thread = threading.Thread(target=self._refresh, name="google-certs-refresh", daemon=True)
+            self._refresh_thread.start()
+
+    def _refresh(self) -> None:
+        with self._lock:
+            if self._timer() >= self._expires_at - self.refresh_margin:
+                self._fetch_or_keep()
+
+# Create a singleton instance
+google_cert_cache = GoogleCertCache()
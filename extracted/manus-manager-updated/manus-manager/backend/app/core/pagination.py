@@ -0,0 +1,160 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Any, List, NamedTuple, Optional, Tuple
+
+from fastapi import HTTPException, Response, status
+from sqlalchemy import and_, tuple_
+from sqlalchemy.orm import Query
+
+CURSOR_NEXT = "next"
+CURSOR_PREV = "prev"
+
+
+class Page(NamedTuple):
+    items: List[Any]
+    next_cursor: Optional[str]
+    prev_cursor: Optional[str]
+
+
+def encode_cursor(sort_value: Any, id: int, direction: str = CURSOR_NEXT) -> str:
+    """
+    Encode a (sort_key, id) position as an opaque URL-safe cursor
+    """
+    if isinstance(sort_value, datetime):
+        sort_value = {"dt": sort_value.isoformat()}
+    payload = json.dumps([sort_value, id, direction], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[Any, int, str]:
+    """
+    Decode a cursor produced by encode_cursor; raises ValueError if it is malformed
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        sort_value, id, direction = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if isinstance(sort_value, dict):
+            sort_value = datetime.fromisoformat(sort_value["dt"])
+    except (binascii.Error, UnicodeDecodeError, TypeError, KeyError, ValueError):
+        raise ValueError("Invalid cursor")
+    if not isinstance(id, int) or direction not in (CURSOR_NEXT, CURSOR_PREV):
+        raise ValueError("Invalid cursor")
+    return sort_value, id, direction
+
+
+def check_cursor(cursor: Optional[str]) -> None:
+    """
+    Reject a malformed cursor query parameter with a 400
+    """
+    if cursor:
+        try:
+            decode_cursor(cursor)
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid cursor",
+            )
+
+
+def _matches_column_type(value: Any, column) -> bool:
+    """
+    Whether a decoded sort value can be compared with column
+    """
+    try:
+        expected = column.type.python_type
+    except NotImplementedError:
+        return True
+    if expected is float:
+        expected = (int, float)
+    return value is None or (isinstance(value, expected) and not isinstance(value, bool))
+
+
+def cursor_position(cursor: str, sort_column) -> Tuple[Any, int, str]:
+    """
+    Decode a cursor for a query ordered by sort_column, answering 400 when
+    it is malformed or its sort value isn't of sort_column's type (a cursor
+    taken from another list), which the database would reject
+    """
+    try:
+        sort_value, id, direction = decode_cursor(cursor)
+        if not _matches_column_type(sort_value, sort_column):
+            raise ValueError("Cursor is for another sort key")
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor",
+        )
+    return sort_value, id, direction
+
+
+def set_page_headers(response: Response, page: Page) -> None:
+    """
+    Expose the page cursors as X-Next-Cursor / X-Prev-Cursor response headers
+    """
+    if page.next_cursor:
+        response.headers["X-Next-Cursor"] = page.next_cursor
+    if page.prev_cursor:
+        response.headers["X-Prev-Cursor"] = page.prev_cursor
+
+
+def paginate(
+    query: Query,
+    *,
+    sort_column,
+    id_column,
+    cursor: Optional[str] = None,
+    limit: int = 100,
+    descending: bool = False
+) -> Page:
+    """
+    Fetch one page of query ordered by (sort_column, id_column) using keyset
+    pagination, so every page costs the same regardless of depth.
+    When sort_column is id_column the key is just the id.
+    """
+    single_key = sort_column is id_column
+    direction = CURSOR_NEXT
+    if cursor:
+        sort_value, last_id, direction = cursor_position(cursor, sort_column)
+        # Walking backwards means reading the opposite order and flipping the result
+        after = descending == (direction == CURSOR_PREV)
+        if single_key:
+            condition = id_column > last_id if after else id_column < last_id
+        else:
+            # The plain range on sort_column keeps the scan on the index
+            key, position = tuple_(sort_column, id_column), tuple_(sort_value, last_id)
+            if after:
+                condition = and_(sort_column >= sort_value, key > position)
+            else:
+                condition = and_(sort_column <= sort_value, key < position)
+        query = query.filter(condition)
+
+    reverse = descending != (direction == CURSOR_PREV)
+    order = [id_column] if single_key else [sort_column, id_column]
+    query = query.order_by(*[column.desc() if reverse else column.asc() for column in order])
+
+    rows = query.limit(limit + 1).all()
+    has_more = len(rows) > limit
+    items = rows[:limit]
+    if direction == CURSOR_PREV:
+        items.reverse()
+
+    def cursor_for(item, cursor_direction):
+        sort_value = getattr(item, sort_column.key)
+        return encode_cursor(sort_value, getattr(item, id_column.key), cursor_direction)
+
+    # Going forward there is a previous page whenever we started from a cursor;
+    # going backward there is always the page we came from
+    if direction == CURSOR_NEXT:
+        has_next, has_prev = has_more, bool(cursor)
+    else:
+        has_next, has_prev = True, has_more
+
+    next_cursor = prev_cursor = None
+    if items:
+        if has_next:
+            next_cursor = cursor_for(items[-1], CURSOR_NEXT)
+        if has_prev:
+            prev_cursor = cursor_for(items[0], CURSOR_PREV)
+    return Page(items=items, next_cursor=next_cursor, prev_cursor=prev_cursor)
@@ -0,0 +1,98 @@
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from fastapi import HTTPException, status
+
+from app.core.security import get_password_hash, verify_password
+
+# Password hashing settings. PASSWORD_HASH_WORKERS=0 hashes on the default
+# thread pool instead of worker processes.
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(os.cpu_count() or 1, 4))))
+# Hashes allowed to wait for a free worker before new ones are turned away
+PASSWORD_HASH_MAX_QUEUED = int(os.getenv("PASSWORD_HASH_MAX_QUEUED", "64"))
+
+
+class PasswordHasher:
+    """
+    Runs bcrypt hashing and verification off the event loop
+
+    Each bcrypt call takes about 100 ms of CPU, so async endpoints await
+    hash() and verify() here instead of calling security.get_password_hash()
+    and verify_password() directly. The calls run in a process pool of
+    `workers` processes, started on first use, so they neither block the
+    event loop nor hold the GIL. At most `workers` calls run at once and
+    up to `max_queued` more wait for a worker; past that, callers get a 503
+    right away, so a burst of logins can't build an unbounded backlog.
+    """
+    def __init__(self, workers: int = PASSWORD_HASH_WORKERS, max_queued: int = PASSWORD_HASH_MAX_QUEUED):
+        self.workers = workers
+        self.max_queued = max_queued
+        self._executor: Optional[Executor] = None
+        self._lock = threading.Lock()
+        self._outstanding = 0
+        self.completed = 0
+        self.rejected = 0
+        self.max_queued_seen = 0
+
+    async def hash(self, password: str) -> str:
+        return await self._run(get_password_hash, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run(verify_password, plain_password, hashed_password)
+
+    def shutdown(self) -> None:
+        """
+        Stop the worker processes; the next call starts a new pool
+        """
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+    def stats(self) -> Dict[str, Any]:
+        outstanding = self._outstanding
+        return {
+            "workers": self.workers,
+            "running": min(outstanding, max(self.workers, 1)),
+            "queued": max(outstanding - max(self.workers, 1), 0),
+            "max_queued": self.max_queued,
+            "max_queued_seen": self.max_queued_seen,
+            "completed": self.completed,
+            "rejected": self.rejected,
+        }
+
+    def _get_executor(self) -> Optional[Executor]:
+        if self.workers <= 0:
+            return None
+        with self._lock:
+            if self._executor is None:
+                # Spawned, not forked: the API process runs background threads
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+                )
+            return self._executor
+
+    async def _run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        with self._lock:
+            if self._outstanding >= max(self.workers, 1) + self.max_queued:
+                self.rejected += 1
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Too many concurrent sign-ins, try again shortly",
+                    headers={"Retry-After": "1"},
+                )
+            self._outstanding += 1
+            self.max_queued_seen = max(self.max_queued_seen, self._outstanding - max(self.workers, 1))
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._get_executor(), fn, *args)
+        finally:
+            with self._lock:
+                self._outstanding -= 1
+                self.completed += 1
+
+# Create a singleton instance
+password_hasher = PasswordHasher()
@@ -0,0 +1,101 @@
+import json
+import math
+from typing import Dict, Iterable, Optional
+
+# Relative accuracy of reported quantiles (1% of the true value)
+DEFAULT_RELATIVE_ACCURACY = 0.01
+
+# Durations below this many seconds are counted as zero
+MIN_TRACKED_VALUE = 1e-3
+
+
+class DurationSketch:
+    """
+    Mergeable quantile sketch for non-negative durations
+
+    Values are counted in logarithmically sized buckets (the DDSketch
+    scheme), so every reported quantile is within the relative accuracy of
+    the true value. Sketches with the same accuracy merge by adding bucket
+    counts, which lets per-day sketches be combined into any date range
+    without revisiting the underlying rows. Adding a value with a negative
+    weight removes it again.
+    """
+    def __init__(self, relative_accuracy: float = DEFAULT_RELATIVE_ACCURACY):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.bins: Dict[int, int] = {}
+        self.zero_count = 0
+        self.count = 0
+        self.sum = 0.0
+
+    def add(self, value: float, weight: int = 1) -> None:
+        """
+        Add a value (or remove it, with a negative weight)
+        """
+        if value <= MIN_TRACKED_VALUE:
+            self.zero_count += weight
+        else:
+            index = self._index(value)
+            remaining = self.bins.get(index, 0) + weight
+            if remaining:
+                self.bins[index] = remaining
+            else:
+                self.bins.pop(index, None)
+        self.count += weight
+        self.sum += weight * value
+
+    def merge(self, other: "DurationSketch") -> None:
+        """
+        Fold another sketch into this one
+        """
+        if other.gamma != self.gamma:
+            raise ValueError("Cannot merge sketches with different accuracy")
+        for index, count in other.bins.items():
+            remaining = self.bins.get(index, 0) + count
+            if remaining:
+                self.bins[index] = remaining
+            else:
+                self.bins.pop(index, None)
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.sum += other.sum
+
+    def quantile(self, q: float) -> Optional[float]:
+        """
+        Estimate the q-th quantile (0 <= q <= 1), or None if the sketch is empty
+        """
+        if self.count <= 0:
+            return None
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return 0.0
+        for index in sorted(self.bins):
+            seen += self.bins[index]
+            if rank < seen:
+                return self._value(index)
+        return self._value(max(self.bins)) if self.bins else 0.0
+
+    def percentiles(self, percentiles: Iterable[int] = (50, 90, 99)) -> Dict[str, Optional[float]]:
+        """
+        Get a {"p50": ..., "p90": ...} mapping for the given percentiles
+        """
+        return {f"p{p}": self.quantile(p / 100) for p in percentiles}
+
+    @property
+    def mean(self) -> float:
+        return self.sum / self.count if self.count > 0 else 0
+
+    def to_json(self) -> str:
+        return json.dumps({str(index): count for index, count in self.bins.items()})
+
+    def load_bins(self, bins_json: Optional[str]) -> None:
+        self.bins = {int(index): count for index, count in json.loads(bins_json or "{}").items()}
+
+    def _index(self, value: float) -> int:
+        return int(math.ceil(math.log(value) / self._log_gamma))
+
+    def _value(self, index: int) -> float:
+        # Midpoint of the bucket (gamma^(i-1), gamma^i] in relative terms
+        return 2 * self.gamma ** index / (self.gamma + 1)
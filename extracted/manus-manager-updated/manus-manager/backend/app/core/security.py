@@ -7,8 +7,8 @@ from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from pydantic import BaseModel
-from google.oauth2 import id_token
-from google.auth.transport import requests
+
+from app.core.google_certs import google_cert_cache
 
 # Secret key and algorithm for JWT
 SECRET_KEY = os.getenv("SECRET_KEY", "your_secret_key_here")
@@ -46,9 +46,9 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     return encoded_jwt
 
 def verify_google_token(token: str):
-    """Verify a Google ID token."""
+    """Verify a Google ID token against the cached signing certificates."""
     try:
-        idinfo = id_token.verify_oauth2_token(token, requests.Request(), GOOGLE_CLIENT_ID)
+        idinfo = google_cert_cache.verify(token, audience=GOOGLE_CLIENT_ID)
         
         # Check if the token is issued by Google
         if idinfo['iss'] not in ['accounts.google.com', 'https://accounts.google.com']:
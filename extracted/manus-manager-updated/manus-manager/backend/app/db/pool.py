@@ -0,0 +1,137 @@
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict
+
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+from app.core.quantiles import DurationSketch
+
+logger = logging.getLogger(__name__)
+
+# Checkouts waiting longer than this are logged
+DB_POOL_SLOW_CHECKOUT_SECONDS = float(os.getenv("DB_POOL_SLOW_CHECKOUT_SECONDS", "0.5"))
+
+
+class PoolMetrics:
+    """
+    Counters and checkout latency for one connection pool
+    """
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self.waiting = 0
+        self.checkouts = 0
+        self.timeouts = 0
+        self.slow_checkouts = 0
+        self.connections_created = 0
+        # Milliseconds, so sub-millisecond waits still land in a bucket
+        self._checkout_ms = DurationSketch()
+
+    def checkout_started(self) -> None:
+        with self._lock:
+            self.waiting += 1
+
+    def checkout_finished(self, seconds: float, timed_out: bool = False) -> None:
+        with self._lock:
+            self.waiting -= 1
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+                self._checkout_ms.add(seconds * 1000)
+            if seconds >= DB_POOL_SLOW_CHECKOUT_SECONDS:
+                self.slow_checkouts += 1
+
+    def connection_created(self) -> None:
+        with self._lock:
+            self.connections_created += 1
+
+    def snapshot(self, pool: QueuePool) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "size": pool.size(),
+                "checked_out": pool.checkedout(),
+                "checked_in": pool.checkedin(),
+                "overflow": pool.overflow(),
+                "waiting": self.waiting,
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "slow_checkouts": self.slow_checkouts,
+                "connections_created": self.connections_created,
+                "checkout_ms": {
+                    **self._checkout_ms.percentiles(),
+                    "mean": self._checkout_ms.mean,
+                },
+            }
+
+
+# Pool name -> live pool, for the metrics endpoint
+instrumented_pools: Dict[str, "InstrumentedPoolMixin"] = {}
+
+
+class InstrumentedPoolMixin:
+    """
+    Times every checkout from the pool and logs the ones that had to wait
+    longer than DB_POOL_SLOW_CHECKOUT_SECONDS
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metrics = PoolMetrics("unnamed")
+
+    def instrument(self, name: str) -> None:
+        """
+        Name the pool's metrics and publish them through pool_stats()
+        """
+        self.metrics.name = name
+        instrumented_pools[name] = self
+
+    def _do_get(self):
+        metrics = self.metrics
+        metrics.checkout_started()
+        start = time.perf_counter()
+        timed_out = False
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            timed_out = True
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            metrics.checkout_finished(elapsed, timed_out=timed_out)
+            if elapsed >= DB_POOL_SLOW_CHECKOUT_SECONDS:
+                logger.warning(
+                    "Waited %.3fs for a connection from pool %s (%d checked out, %d waiting, overflow %d)%s",
+                    elapsed, metrics.name, self.checkedout(), metrics.waiting, self.overflow(),
+                    " and timed out" if timed_out else "",
+                )
+
+    def _create_connection(self):
+        connection = super()._create_connection()
+        self.metrics.connection_created()
+        return connection
+
+    def recreate(self):
+        # engine.dispose() swaps in a fresh pool; keep reporting under the same name
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        if instrumented_pools.get(self.metrics.name) is self:
+            instrumented_pools[self.metrics.name] = pool
+        return pool
+
+
+class InstrumentedQueuePool(InstrumentedPoolMixin, QueuePool):
+    pass
+
+
+class InstrumentedAsyncAdaptedQueuePool(InstrumentedPoolMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+def pool_stats() -> Dict[str, Dict[str, Any]]:
+    """
+    Current metrics for every instrumented pool
+    """
+    return {name: pool.metrics.snapshot(pool) for name, pool in instrumented_pools.items()}
@@ -0,0 +1,96 @@
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from starlette.concurrency import run_in_threadpool
+
+logger = logging.getLogger(__name__)
+
+# Seconds since the replica last replayed a transaction, or 0 when it has
+# replayed everything it received (an idle primary isn't lag)
+POSTGRES_LAG_QUERY = text(
+    "SELECT CASE "
+    "WHEN NOT pg_is_in_recovery() THEN 0 "
+    "WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+)
+
+
+class ReplicaMonitor:
+    """
+    Tracks whether a read replica is close enough to the primary to serve reads
+
+    The replica's lag is measured at most once per check_interval; in between,
+    usable() answers from the last measurement. A replica that lags more than
+    max_lag seconds, or can't be reached, is reported unusable until a later
+    check succeeds.
+    """
+    def __init__(
+        self,
+        engine: Engine,
+        max_lag: float,
+        check_interval: float,
+        timer: Callable[[], float] = time.monotonic
+    ):
+        self.engine = engine
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self._timer = timer
+        self._lock = threading.Lock()
+        self._checked_at: Optional[float] = None
+        self._usable = False
+        self.lag: Optional[float] = None
+
+    def measure_lag(self) -> float:
+        """
+        Query the replica for its replication lag in seconds
+        """
+        if self.engine.dialect.name != "postgresql":
+            return 0.0
+        with self.engine.connect() as conn:
+            return float(conn.execute(POSTGRES_LAG_QUERY).scalar() or 0)
+
+    def _fresh(self) -> bool:
+        return self._checked_at is not None and self._timer() - self._checked_at < self.check_interval
+
+    def usable(self) -> bool:
+        """
+        Whether reads may go to the replica right now
+        """
+        if self._fresh():
+            return self._usable
+        with self._lock:
+            if self._fresh():
+                return self._usable
+            try:
+                self.lag = self.measure_lag()
+                usable = self.lag <= self.max_lag
+            except Exception:
+                logger.warning("Replica lag check failed; reading from the primary", exc_info=True)
+                self.lag = None
+                usable = False
+            if usable != self._usable:
+                if usable:
+                    logger.info("Replica caught up (lag %.1fs); routing reads to it", self.lag)
+                elif self.lag is not None:
+                    logger.warning("Replica lag %.1fs exceeds %.1fs; reading from the primary", self.lag, self.max_lag)
+            self._usable = usable
+            self._checked_at = self._timer()
+            return usable
+
+    async def async_usable(self) -> bool:
+        """
+        usable() for async callers; only a due lag check leaves the event loop
+        """
+        if self._fresh():
+            return self._usable
+        return await run_in_threadpool(self.usable)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        The last lag measurement, without checking the replica again
+        """
+        return {"lag": self.lag, "max_lag": self.max_lag, "usable": self._usable}
@@ -0,0 +1,77 @@
+import re
+from typing import Optional
+
+from sqlalchemy import inspect
+from sqlalchemy.engine import Connection
+
+from app.models.models import Base
+
+# Database objects managed by migrations and services rather than the models:
+# daily log partitions, the SQLite FTS5 tables and the Postgres search column
+UNMANAGED_TABLES = re.compile(r"^(agent|task)_logs_(p\d{8}|default|fts(_\w+)?)$")
+UNMANAGED_NAMES = {"search_vector", "ix_agent_logs_search_vector", "ix_task_logs_search_vector"}
+
+# The schema the API created with Base.metadata.create_all when it was
+# imported, before there were migrations: revision 0001, which is the current
+# models' tables without the ones and the columns later revisions added
+BASELINE_REVISION = "0001"
+BASELINE_TABLES = {"users", "agents", "tasks", "agent_logs", "task_logs"}
+POST_BASELINE_COLUMNS = {
+    "users": {"token_version"},
+    "tasks": {"lease_token", "lease_expires_at", "lease_attempts"},
+    "agent_logs": {"details", "status"},
+    "task_logs": {"details"},
+}
+
+
+class UnrecognizedSchemaError(Exception):
+    """
+    An unversioned database whose tables match no known revision
+    """
+
+
+def include_object(object, name, type_, reflected, compare_to):
+    """
+    Keep autogenerate from proposing to drop objects the models don't describe
+    """
+    if reflected and compare_to is None:
+        if type_ == "table" and UNMANAGED_TABLES.match(name):
+            return False
+        if name in UNMANAGED_NAMES:
+            return False
+    return True
+
+
+def unversioned_revision(connection: Connection, head: str) -> Optional[str]:
+    """
+    The revision to stamp a database that has no alembic_version at: None
+    when it has no application tables (migrations create them), head when
+    its schema matches the models, BASELINE_REVISION when it holds just the
+    original tables. Raises UnrecognizedSchemaError for anything else, such
+    as a schema created by create_all part way through the migrations.
+    """
+    from alembic.autogenerate import compare_metadata
+    from alembic.migration import MigrationContext
+
+    inspector = inspect(connection)
+    tables = {table for table in inspector.get_table_names() if not UNMANAGED_TABLES.match(table)}
+    tables.discard("alembic_version")
+    if not tables:
+        return None
+
+    context = MigrationContext.configure(connection, opts={"include_object": include_object})
+    if not compare_metadata(context, Base.metadata):
+        return head
+
+    if tables == BASELINE_TABLES and all(
+        {column["name"] for column in inspector.get_columns(table)}
+        == set(Base.metadata.tables[table].columns.keys()) - POST_BASELINE_COLUMNS.get(table, set())
+        for table in BASELINE_TABLES
+    ):
+        return BASELINE_REVISION
+
+    raise UnrecognizedSchemaError(
+        f"The database has tables ({', '.join(sorted(tables))}) but no alembic_version, and they match "
+        f"neither revision {BASELINE_REVISION} (the original schema) nor {head} (the current models). "
+        "Find the revision the schema matches, run `alembic stamp <revision>`, then run init-db again."
+    )
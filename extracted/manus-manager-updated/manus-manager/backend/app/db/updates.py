@@ -0,0 +1,34 @@
+from typing import Any, Dict, TypeVar
+
+from sqlalchemy import inspect, update
+from sqlalchemy.orm import Session
+
+from app.db.base_class import Base
+
+ModelType = TypeVar("ModelType", bound=Base)
+
+
+def changed_values(db_obj: Base, update_data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    The entries of update_data that name a column of db_obj and differ from
+    its current value
+    """
+    columns = inspect(type(db_obj)).columns.keys()
+    return {
+        field: value
+        for field, value in update_data.items()
+        if field in columns and getattr(db_obj, field) != value
+    }
+
+
+def update_returning(db: Session, db_obj: ModelType, values: Dict[str, Any]) -> ModelType:
+    """
+    Write values to db_obj's row with a single UPDATE ... RETURNING, loading
+    the updated row back into db_obj. Only the given columns are written; the
+    caller commits.
+    """
+    if not values:
+        return db_obj
+    model = type(db_obj)
+    statement = update(model).where(model.id == db_obj.id).values(**values).returning(model)
+    return db.execute(statement, execution_options={"populate_existing": True}).scalar_one()
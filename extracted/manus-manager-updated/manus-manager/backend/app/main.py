@@ -6,11 +6,13 @@ from typing import List, Optional
 import uvicorn
 
 from app.api.api import api_router
-from app.db.session import engine
+from app.core.google_certs import google_cert_cache
+from app.core.password_hasher import password_hasher
+from app.db.session import engine, SessionLocal, DB_CREATE_ALL_ON_STARTUP
 from app.models import models
-
-# Create database tables
-models.Base.metadata.create_all(bind=engine)
+from app.services.log_writer import log_writer
+from app.services.progress_coalescer import progress_coalescer
+from app.services.scheduler_service import task_scheduler
 
 # Create FastAPI app
 app = FastAPI(
@@ -26,11 +28,55 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Prev-Cursor"],
 )
 
 # Include API router
 app.include_router(api_router)
 
+# The schema comes from migrations (`python manage.py init-db`); creating it
+# here is opt-in, so workers start without a round trip to the database
+@app.on_event("startup")
+def create_schema():
+    if DB_CREATE_ALL_ON_STARTUP:
+        models.Base.metadata.create_all(bind=engine)
+
+# Start the background log writer, and flush queued logs on shutdown
+@app.on_event("startup")
+def start_log_writer():
+    log_writer.start(SessionLocal)
+
+# Buffer progress-only task updates, writing them out on an interval
+@app.on_event("startup")
+def start_progress_coalescer():
+    progress_coalescer.start(SessionLocal)
+
+# Requeue expired task leases in the background. Pending tasks are assigned
+# to agents by `python manage.py schedule-tasks`, not by the API workers.
+@app.on_event("startup")
+def start_scheduler():
+    task_scheduler.start(SessionLocal)
+
+@app.on_event("shutdown")
+def stop_scheduler():
+    task_scheduler.stop()
+
+@app.on_event("shutdown")
+def stop_progress_coalescer():
+    progress_coalescer.stop()
+
+@app.on_event("shutdown")
+def stop_log_writer():
+    log_writer.stop()
+
+@app.on_event("shutdown")
+def stop_password_hasher():
+    password_hasher.shutdown()
+
+@app.on_event("shutdown")
+def close_google_cert_cache():
+    google_cert_cache.close()
+
 # Root endpoint
 @app.get("/")
 async def root():
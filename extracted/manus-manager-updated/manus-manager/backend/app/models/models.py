@@ -1,4 +1,4 @@
-from sqlalchemy import Boolean, Column, Integer, String, DateTime, ForeignKey, Text, Float
+from sqlalchemy import Boolean, Column, Integer, String, Date, DateTime, ForeignKey, Text, Float, Index, UniqueConstraint, DDL, event
 from sqlalchemy.orm import relationship
 import datetime
 
@@ -15,6 +15,8 @@ class User(Base):
     is_superuser = Column(Boolean, default=False)
     created_at = Column(DateTime, default=datetime.datetime.utcnow)
     updated_at = Column(DateTime, nullable=True)
+    # Bumped when credentials or permissions change; tokens carry the version they were issued at
+    token_version = Column(Integer, default=0, server_default="0", nullable=False)
     
     # Google authentication fields
     google_id = Column(String, nullable=True, unique=True)
@@ -27,6 +29,9 @@ class User(Base):
 
 class Agent(Base):
     __tablename__ = "agents"
+    __table_args__ = (
+        Index("ix_agents_owner_id_status", "owner_id", "status"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, index=True)
@@ -43,10 +48,20 @@ class Agent(Base):
     # Relationships
     owner = relationship("User", back_populates="agents")
     tasks = relationship("Task", back_populates="agent", cascade="all, delete-orphan")
-    logs = relationship("AgentLog", back_populates="agent", cascade="all, delete-orphan")
+    # Log rows are removed by the ON DELETE CASCADE on agent_logs.agent_id (on SQLite
+    # this needs foreign keys on; see enable_sqlite_foreign_keys)
+    logs = relationship("AgentLog", back_populates="agent", cascade="all, delete-orphan", passive_deletes=True)
 
 class Task(Base):
     __tablename__ = "tasks"
+    __table_args__ = (
+        Index("ix_tasks_owner_id_status", "owner_id", "status"),
+        Index("ix_tasks_agent_id_status", "agent_id", "status"),
+        # Time-range scans for /analytics/timeseries
+        Index("ix_tasks_owner_id_started_at", "owner_id", "started_at"),
+        Index("ix_tasks_owner_id_completed_at", "owner_id", "completed_at"),
+        Index("ix_tasks_agent_id_completed_at", "agent_id", "completed_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String, index=True)
@@ -60,20 +75,37 @@ class Task(Base):
     completed_at = Column(DateTime, nullable=True)
     priority = Column(Integer, default=0)  # 0: low, 1: medium, 2: high, 3: critical
     progress = Column(Float, default=0)  # 0-100
+
+    # Set while an agent holds the task through /tasks/lease
+    lease_token = Column(String, nullable=True)
+    lease_expires_at = Column(DateTime, nullable=True)
+    lease_attempts = Column(Integer, default=0, server_default="0", nullable=False)
     
     # Relationships
     owner = relationship("User", back_populates="tasks")
     agent = relationship("Agent", back_populates="tasks")
-    logs = relationship("TaskLog", back_populates="task", cascade="all, delete-orphan")
+    # Log rows are removed by the ON DELETE CASCADE on task_logs.task_id (on SQLite
+    # this needs foreign keys on; see enable_sqlite_foreign_keys)
+    logs = relationship("TaskLog", back_populates="task", cascade="all, delete-orphan", passive_deletes=True)
+
+# Lease claims take an owner's highest-priority, oldest pending task; expired
+# lease sweeps scan in_progress tasks by expiry (see LeaseService)
+Index("ix_tasks_owner_id_status_priority", Task.owner_id, Task.status, Task.priority.desc(), Task.created_at)
+Index("ix_tasks_status_lease_expires_at", Task.status, Task.lease_expires_at)
 
+# On Postgres agent_logs and task_logs are range-partitioned by day on timestamp
+# (see migration 0006 and LogRetentionService), with primary key (id, timestamp)
 class AgentLog(Base):
     __tablename__ = "agent_logs"
 
     id = Column(Integer, primary_key=True, index=True)
-    agent_id = Column(Integer, ForeignKey("agents.id"))
-    timestamp = Column(DateTime, default=datetime.datetime.utcnow)
+    agent_id = Column(Integer, ForeignKey("agents.id", ondelete="CASCADE"))
+    timestamp = Column(DateTime, default=datetime.datetime.utcnow, nullable=False)
     level = Column(String, default="info")  # info, warning, error
     message = Column(Text)
+    details = Column(Text, nullable=True)
+    # The status the agent changed to, on rows logged by update_agent_status
+    status = Column(String, nullable=True)
     
     # Relationships
     agent = relationship("Agent", back_populates="logs")
@@ -82,10 +114,109 @@ class TaskLog(Base):
     __tablename__ = "task_logs"
 
     id = Column(Integer, primary_key=True, index=True)
-    task_id = Column(Integer, ForeignKey("tasks.id"))
-    timestamp = Column(DateTime, default=datetime.datetime.utcnow)
+    task_id = Column(Integer, ForeignKey("tasks.id", ondelete="CASCADE"))
+    timestamp = Column(DateTime, default=datetime.datetime.utcnow, nullable=False)
     level = Column(String, default="info")  # info, warning, error
     message = Column(Text)
+    details = Column(Text, nullable=True)
     
     # Relationships
     task = relationship("Task", back_populates="logs")
+
+# Newest-first log reads per agent/task (get_agent_logs, get_task_logs, timeseries);
+# id breaks timestamp ties for keyset pagination
+Index("ix_agent_logs_agent_id_timestamp", AgentLog.agent_id, AgentLog.timestamp.desc(), AgentLog.id.desc())
+Index("ix_task_logs_task_id_timestamp", TaskLog.task_id, TaskLog.timestamp.desc(), TaskLog.id.desc())
+
+# Full-text search over log messages (see LogSearchService and migration 0007).
+# These objects live outside the mapped columns: on Postgres a generated
+# tsvector column with a GIN index, on SQLite an external-content FTS5 table
+# kept in sync by triggers.
+LOG_SEARCH_CONFIG = "english"
+
+def log_search_ddl(table: str):
+    """
+    DDL creating the full-text search objects for a log table, per dialect
+    """
+    fts = f"{table}_fts"
+    postgresql = [
+        f"ALTER TABLE {table} ADD COLUMN search_vector tsvector GENERATED ALWAYS AS "
+        f"(to_tsvector('{LOG_SEARCH_CONFIG}', coalesce(message, ''))) STORED",
+        f"CREATE INDEX ix_{table}_search_vector ON {table} USING gin (search_vector)",
+    ]
+    sqlite = [
+        f"CREATE VIRTUAL TABLE {fts} USING fts5(message, content='{table}', content_rowid='id')",
+        f"CREATE TRIGGER {fts}_insert AFTER INSERT ON {table} BEGIN "
+        f"INSERT INTO {fts} (rowid, message) VALUES (new.id, new.message); END",
+        f"CREATE TRIGGER {fts}_delete AFTER DELETE ON {table} BEGIN "
+        f"INSERT INTO {fts} ({fts}, rowid, message) VALUES ('delete', old.id, old.message); END",
+        f"CREATE TRIGGER {fts}_update AFTER UPDATE OF message ON {table} BEGIN "
+        f"INSERT INTO {fts} ({fts}, rowid, message) VALUES ('delete', old.id, old.message); "
+        f"INSERT INTO {fts} (rowid, message) VALUES (new.id, new.message); END",
+    ]
+    return {"postgresql": postgresql, "sqlite": sqlite}
+
+for log_table in (AgentLog.__table__, TaskLog.__table__):
+    for dialect, statements in log_search_ddl(log_table.name).items():
+        for statement in statements:
+            event.listen(log_table, "after_create", DDL(statement).execute_if(dialect=dialect))
+    event.listen(
+        log_table, "before_drop",
+        DDL(f"DROP TABLE IF EXISTS {log_table.name}_fts").execute_if(dialect="sqlite")
+    )
+
+class LogLevelRollup(Base):
+    __tablename__ = "log_level_rollups"
+    __table_args__ = (
+        UniqueConstraint("source", "source_id", "day", "level", name="uq_log_level_rollups_key"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    source = Column(String, nullable=False)  # agent, task
+    source_id = Column(Integer, nullable=False)  # agent_id or task_id
+    day = Column(Date, nullable=False)
+    level = Column(String, nullable=False)
+    count = Column(Integer, default=0, nullable=False)
+
+class TaskRollup(Base):
+    __tablename__ = "task_rollups"
+    __table_args__ = (
+        UniqueConstraint("scope", "scope_id", name="uq_task_rollups_scope"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    scope = Column(String, nullable=False)  # owner, agent
+    scope_id = Column(Integer, nullable=False)
+    total_count = Column(Integer, default=0, nullable=False)
+    pending_count = Column(Integer, default=0, nullable=False)
+    in_progress_count = Column(Integer, default=0, nullable=False)
+    completed_count = Column(Integer, default=0, nullable=False)
+    failed_count = Column(Integer, default=0, nullable=False)
+    cancelled_count = Column(Integer, default=0, nullable=False)
+    completion_time_sum = Column(Float, default=0, nullable=False)  # seconds
+    completion_time_count = Column(Integer, default=0, nullable=False)
+    updated_at = Column(DateTime, nullable=True)
+
+class TaskDurationSketch(Base):
+    __tablename__ = "task_duration_sketches"
+    __table_args__ = (
+        UniqueConstraint("scope", "scope_id", "priority", "day", name="uq_task_duration_sketches_key"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    scope = Column(String, nullable=False)  # owner, agent
+    scope_id = Column(Integer, nullable=False)
+    priority = Column(Integer, nullable=False, default=0)
+    day = Column(Date, nullable=False)  # day the tasks completed
+    count = Column(Integer, default=0, nullable=False)
+    sum = Column(Float, default=0, nullable=False)  # seconds
+    zero_count = Column(Integer, default=0, nullable=False)
+    bins = Column(Text, nullable=False, default="{}")  # JSON {bucket index: count}
+    updated_at = Column(DateTime, nullable=True)
+
+class ChangeVersion(Base):
+    __tablename__ = "change_versions"
+
+    # No foreign key: a deleted user's row stays, so versions only ever grow
+    user_id = Column(Integer, primary_key=True, autoincrement=False)
+    version = Column(Integer, default=0, nullable=False)
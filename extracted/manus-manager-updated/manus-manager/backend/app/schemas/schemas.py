@@ -1,6 +1,22 @@
 from pydantic import BaseModel, EmailStr, Field
 from typing import Optional, List, Dict, Any
 from datetime import datetime
+from enum import Enum
+
+# Status enums
+class AgentStatus(str, Enum):
+    IDLE = "idle"
+    RUNNING = "running"
+    PAUSED = "paused"
+    ERROR = "error"
+    TERMINATED = "terminated"
+
+class TaskStatus(str, Enum):
+    PENDING = "pending"
+    IN_PROGRESS = "in_progress"
+    COMPLETED = "completed"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
 
 # Token schemas
 class Token(BaseModel):
@@ -10,6 +26,7 @@ class Token(BaseModel):
 
 class TokenPayload(BaseModel):
     sub: Optional[str] = None
+    ver: int = 0
 
 # User schemas
 class UserBase(BaseModel):
@@ -39,6 +56,9 @@ class UserResponse(UserBase):
     class Config:
         orm_mode = True
 
+# The name the endpoints use for the user response schema
+User = UserResponse
+
 # Agent schemas
 class AgentBase(BaseModel):
     name: str
@@ -69,6 +89,8 @@ class AgentResponse(AgentBase):
     class Config:
         orm_mode = True
 
+Agent = AgentResponse
+
 # Task schemas
 class TaskBase(BaseModel):
     title: str
@@ -101,10 +123,40 @@ class TaskResponse(TaskBase):
     class Config:
         orm_mode = True
 
+Task = TaskResponse
+
+class TaskBulkCreate(BaseModel):
+    tasks: List[TaskCreate]
+
+class TaskAssignment(BaseModel):
+    task_id: int
+    agent_id: int
+
+class TaskBulkAssign(BaseModel):
+    assignments: List[TaskAssignment]
+
+class TaskBulkResult(BaseModel):
+    ids: List[int]
+    count: int
+
+class TaskLeaseRequest(BaseModel):
+    agent_id: int
+    lease_seconds: Optional[int] = None
+
+class TaskLeaseRenew(BaseModel):
+    lease_token: str
+    lease_seconds: Optional[int] = None
+
+class TaskLease(BaseModel):
+    task: TaskResponse
+    lease_token: str
+    lease_expires_at: datetime
+
 # Log schemas
 class LogBase(BaseModel):
     level: str
     message: str
+    details: Optional[str] = None
 
 class AgentLogCreate(LogBase):
     agent_id: int
@@ -131,6 +183,20 @@ class TaskLogResponse(LogResponse):
     class Config:
         orm_mode = True
 
+AgentLog = AgentLogResponse
+TaskLog = TaskLogResponse
+
+class LogSearchResult(BaseModel):
+    id: int
+    source: str  # agent, task
+    agent_id: Optional[int] = None
+    task_id: Optional[int] = None
+    timestamp: datetime
+    level: str
+    message: str
+    snippet: str
+    rank: float
+
 # Google Auth schemas
 class GoogleAuthRequest(BaseModel):
     token: str
@@ -1,10 +1,17 @@
-from typing import Any, Dict, Generic, List, Optional, Type, TypeVar, Union
+from typing import Any, Dict, Generic, Iterable, List, Optional, Sequence, Type, TypeVar, Union
 from fastapi.encoders import jsonable_encoder
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
 
+from app.core.batching import chunked
+from app.core.pagination import Page, paginate
 from app.db.base_class import Base
-from app.models.models import Agent, AgentStatus
+from app.db.updates import changed_values, update_returning
+from app.models.models import Agent
+from app.schemas.schemas import AgentStatus
+from app.services.agent_tracker import agent_tracker
+from app.services.analytics_cache import analytics_cache
+from app.services.rollup_service import rollup_service
 
 ModelType = TypeVar("ModelType", bound=Base)
 CreateSchemaType = TypeVar("CreateSchemaType", bound=BaseModel)
@@ -20,6 +27,7 @@ class AgentService:
         db.add(db_obj)
         db.commit()
         db.refresh(db_obj)
+        analytics_cache.invalidate_user(db_obj.owner_id, db=db)
         return db_obj
 
     def get_agent(self, db: Session, id: int) -> Optional[Agent]:
@@ -35,17 +43,56 @@ class AgentService:
         skip: int = 0, 
         limit: int = 100,
         status: Optional[str] = None,
-        owner_id: Optional[int] = None
+        owner_id: Optional[int] = None,
+        columns: Optional[Sequence[str]] = None
     ) -> List[Agent]:
         """
-        Get multiple agents with optional filtering
+        Get multiple agents with optional filtering. With columns, returns
+        rows of just those columns instead of Agents.
         """
-        query = db.query(Agent)
+        query = self._agents_query(db, status=status, owner_id=owner_id, columns=columns)
+        return query.offset(skip).limit(limit).all()
+
+    def get_agents_page(
+        self,
+        db: Session,
+        *,
+        cursor: Optional[str] = None,
+        limit: int = 100,
+        status: Optional[str] = None,
+        owner_id: Optional[int] = None,
+        columns: Optional[Sequence[str]] = None
+    ) -> Page:
+        """
+        Get a page of agents ordered by id using keyset pagination. With
+        columns, the page holds rows of just those columns instead of Agents.
+        """
+        query = self._agents_query(db, status=status, owner_id=owner_id, columns=columns)
+        return paginate(query, sort_column=Agent.id, id_column=Agent.id, cursor=cursor, limit=limit)
+
+    def get_agent_owners(self, db: Session, agent_ids: Iterable[int]) -> Dict[int, int]:
+        """
+        Map agent ids to their owner ids; missing agents are left out
+        """
+        owners = {}
+        for chunk in chunked(list(agent_ids)):
+            owners.update(db.query(Agent.id, Agent.owner_id).filter(Agent.id.in_(chunk)).all())
+        return owners
+
+    def _agents_query(
+        self,
+        db: Session,
+        *,
+        status: Optional[str] = None,
+        owner_id: Optional[int] = None,
+        columns: Optional[Sequence[str]] = None
+    ):
+        query = db.query(*[getattr(Agent, column) for column in columns]) if columns else db.query(Agent)
         if status:
             query = query.filter(Agent.status == status)
         if owner_id:
             query = query.filter(Agent.owner_id == owner_id)
-        return query.offset(skip).limit(limit).all()
+        return query
 
     def update_agent(
         self, 
@@ -57,17 +104,16 @@ class AgentService:
         """
         Update agent
         """
-        obj_data = jsonable_encoder(db_obj)
         if isinstance(obj_in, dict):
             update_data = obj_in
         else:
             update_data = obj_in.dict(exclude_unset=True)
-        for field in obj_data:
-            if field in update_data:
-                setattr(db_obj, field, update_data[field])
-        db.add(db_obj)
+        values = changed_values(db_obj, update_data)
+        if not values:
+            return db_obj
+        db_obj = update_returning(db, db_obj, values)
         db.commit()
-        db.refresh(db_obj)
+        analytics_cache.invalidate_user(db_obj.owner_id, db=db)
         return db_obj
 
     def delete_agent(self, db: Session, *, id: int) -> Agent:
@@ -75,8 +121,12 @@ class AgentService:
         Delete agent
         """
         obj = db.query(Agent).get(id)
+        owner_id = obj.owner_id
+        # The agent's tasks are removed by cascade, so take them out of the rollups first
+        task_owner_ids = rollup_service.remove_agent(db, agent_id=id)
         db.delete(obj)
         db.commit()
+        analytics_cache.invalidate_user(owner_id, *task_owner_ids, db=db)
         return obj
 
     def start_agent(self, db: Session, *, agent: Agent) -> Agent:
@@ -85,11 +135,7 @@ class AgentService:
         """
         # Here we would implement the actual logic to start a Manus agent
         # For now, we just update the status
-        agent.status = AgentStatus.RUNNING
-        db.add(agent)
-        db.commit()
-        db.refresh(agent)
-        return agent
+        return self._set_status(db, agent, AgentStatus.RUNNING)
 
     def stop_agent(self, db: Session, *, agent: Agent) -> Agent:
         """
@@ -97,11 +143,7 @@ class AgentService:
         """
         # Here we would implement the actual logic to stop a Manus agent
         # For now, we just update the status
-        agent.status = AgentStatus.IDLE
-        db.add(agent)
-        db.commit()
-        db.refresh(agent)
-        return agent
+        return self._set_status(db, agent, AgentStatus.IDLE)
 
     def pause_agent(self, db: Session, *, agent: Agent) -> Agent:
         """
@@ -109,10 +151,18 @@ class AgentService:
         """
         # Here we would implement the actual logic to pause a Manus agent
         # For now, we just update the status
-        agent.status = AgentStatus.PAUSED
-        db.add(agent)
+        return self._set_status(db, agent, AgentStatus.PAUSED)
+
+    def _set_status(self, db: Session, agent: Agent, status: AgentStatus) -> Agent:
+        if agent.status == status:
+            return agent
+        agent = update_returning(db, agent, {"status": status.value})
         db.commit()
-        db.refresh(agent)
+        analytics_cache.invalidate_user(agent.owner_id, db=db)
+        # Logged with its status, so timeseries metrics like agent_starts count it
+        agent_tracker.log_agent_activity(
+            db, agent.id, f"Agent status changed to {status.value}", owner_id=agent.owner_id, status=status.value
+        )
         return agent
 
 # Create a singleton instance
@@ -131,9 +181,28 @@ def get_agents(
     skip: int = 0, 
     limit: int = 100,
     status: Optional[str] = None,
-    owner_id: Optional[int] = None
+    owner_id: Optional[int] = None,
+    columns: Optional[Sequence[str]] = None
 ) -> List[Agent]:
-    return agent_service.get_agents(db=db, skip=skip, limit=limit, status=status, owner_id=owner_id)
+    return agent_service.get_agents(
+        db=db, skip=skip, limit=limit, status=status, owner_id=owner_id, columns=columns
+    )
+
+def get_agents_page(
+    db: Session,
+    *,
+    cursor: Optional[str] = None,
+    limit: int = 100,
+    status: Optional[str] = None,
+    owner_id: Optional[int] = None,
+    columns: Optional[Sequence[str]] = None
+) -> Page:
+    return agent_service.get_agents_page(
+        db=db, cursor=cursor, limit=limit, status=status, owner_id=owner_id, columns=columns
+    )
+
+def get_agent_owners(db: Session, agent_ids: Iterable[int]) -> Dict[int, int]:
+    return agent_service.get_agent_owners(db=db, agent_ids=agent_ids)
 
 def update_agent(
     db: Session, 
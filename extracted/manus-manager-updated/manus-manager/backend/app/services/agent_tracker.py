@@ -1,12 +1,24 @@
-from typing import Dict, List, Optional
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 from datetime import datetime
+from sqlalchemy import insert
 from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import set_committed_value
 from fastapi import WebSocket, WebSocketDisconnect
 import json
 import asyncio
+import os
 
+from app.core.cache import TTLCache
+from app.core.pagination import Page, paginate
 from app.models.models import Agent, Task, AgentLog, TaskLog
 from app.schemas.schemas import AgentStatus, TaskStatus
+from app.services.analytics_cache import analytics_cache
+from app.services.log_writer import log_writer
+from app.services.progress_coalescer import progress_coalescer
+from app.services.rollup_service import rollup_service
+
+# At most one progress broadcast per task per interval
+PROGRESS_BROADCAST_INTERVAL_SECONDS = float(os.getenv("PROGRESS_BROADCAST_INTERVAL_SECONDS", "0.5"))
 
 class AgentTracker:
     """
@@ -14,6 +26,10 @@ class AgentTracker:
     """
     def __init__(self):
         self.active_connections: Dict[int, List[WebSocket]] = {}
+        # Task ids broadcast within the last interval, and the trailing
+        # update waiting to go out for each of them
+        self._progress_sent = TTLCache(maxsize=100000, ttl=PROGRESS_BROADCAST_INTERVAL_SECONDS)
+        self._progress_pending: Dict[int, Tuple[int, Dict[str, Any]]] = {}
         
     async def connect(self, websocket: WebSocket, user_id: int):
         """
@@ -66,69 +82,97 @@ class AgentTracker:
                     "data": log_data
                 })
     
-    def log_agent_activity(self, db: Session, agent_id: int, message: str, level: str = "INFO", details: Optional[str] = None):
+    def log_agent_activity(
+        self,
+        db: Session,
+        agent_id: int,
+        message: str,
+        level: str = "INFO",
+        details: Optional[str] = None,
+        owner_id: Optional[int] = None,
+        wait: bool = False,
+        status: Optional[str] = None
+    ) -> Optional[AgentLog]:
         """
-        Log agent activity
+        Log agent activity. The row is handed to the background log writer
+        and broadcast once it is written; pass owner_id when known to skip
+        looking up the agent's owner. With wait=True the row is written
+        before returning and the new AgentLog is returned; otherwise None.
+        status is the status the agent changed to, on rows logging a change.
         """
-        log = AgentLog(
-            agent_id=agent_id,
-            message=message,
-            level=level,
-            details=details
-        )
-        db.add(log)
-        db.commit()
-        db.refresh(log)
-        
-        # Get the agent to find the owner_id
-        agent = db.query(Agent).filter(Agent.id == agent_id).first()
-        if agent:
-            # Create a task to broadcast the log update
-            asyncio.create_task(self.broadcast_log_update(
-                agent.owner_id,
-                {
-                    "id": log.id,
-                    "agent_id": log.agent_id,
-                    "timestamp": log.timestamp.isoformat(),
-                    "level": log.level,
-                    "message": log.message,
-                    "details": log.details
-                }
-            ))
-        
-        return log
+        if owner_id is None:
+            owner_id = db.query(Agent.owner_id).filter(Agent.id == agent_id).scalar()
+        row = {
+            "agent_id": agent_id,
+            "timestamp": datetime.utcnow(),
+            "level": level,
+            "message": message,
+            "details": details,
+            "status": status,
+        }
+        return self._write_log(db, AgentLog, row, owner_id, wait)
     
-    def log_task_activity(self, db: Session, task_id: int, message: str, level: str = "INFO", details: Optional[str] = None):
+    def log_task_activity(
+        self,
+        db: Session,
+        task_id: int,
+        message: str,
+        level: str = "INFO",
+        details: Optional[str] = None,
+        owner_id: Optional[int] = None,
+        wait: bool = False
+    ) -> Optional[TaskLog]:
         """
-        Log task activity
+        Log task activity. The row is handed to the background log writer
+        and broadcast once it is written; pass owner_id when known to skip
+        looking up the task's owner. With wait=True the row is written
+        before returning and the new TaskLog is returned; otherwise None.
         """
-        log = TaskLog(
-            task_id=task_id,
-            message=message,
-            level=level,
-            details=details
-        )
-        db.add(log)
-        db.commit()
-        db.refresh(log)
-        
-        # Get the task to find the owner_id
-        task = db.query(Task).filter(Task.id == task_id).first()
-        if task:
-            # Create a task to broadcast the log update
-            asyncio.create_task(self.broadcast_log_update(
-                task.owner_id,
-                {
-                    "id": log.id,
-                    "task_id": log.task_id,
-                    "timestamp": log.timestamp.isoformat(),
-                    "level": log.level,
-                    "message": log.message,
-                    "details": log.details
-                }
-            ))
-        
-        return log
+        if owner_id is None:
+            owner_id = db.query(Task.owner_id).filter(Task.id == task_id).scalar()
+        row = {
+            "task_id": task_id,
+            "timestamp": datetime.utcnow(),
+            "level": level,
+            "message": message,
+            "details": details,
+        }
+        return self._write_log(db, TaskLog, row, owner_id, wait)
+    
+    def _write_log(self, db: Session, model, row: Dict, owner_id: Optional[int], wait: bool = False):
+        """
+        Queue a log row, or write it directly when wait is set or the log
+        writer can't take it, and broadcast it with its id once written.
+        Direct writes commit on a connection of their own, so whatever the
+        caller has pending in db is left alone.
+        """
+        on_written = self._log_broadcast(owner_id, row)
+        if not wait and log_writer.enqueue(model, row, on_written):
+            return None
+        with db.get_bind().engine.begin() as connection:
+            log_id = connection.execute(insert(model).returning(model.id), row).scalar_one()
+        if on_written is not None:
+            on_written(log_id)
+        return model(id=log_id, **row)
+    
+    def _log_broadcast(self, owner_id: Optional[int], row: Dict):
+        """
+        Callback broadcasting a log row to its owner given the row's id. It
+        may be called from the log writer's thread. Without a running event
+        loop (scripts, tests) there is nobody connected to broadcast to.
+        """
+        if owner_id is None:
+            return None
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return None
+        log_data = {**row, "timestamp": row["timestamp"].isoformat()}
+
+        def broadcast(log_id: int):
+            asyncio.run_coroutine_threadsafe(self.broadcast_log_update(owner_id, {"id": log_id, **log_data}), loop)
+
+        return broadcast
     
     def update_agent_status(self, db: Session, agent_id: int, status: AgentStatus):
         """
@@ -143,13 +187,16 @@ class AgentTracker:
         db.add(agent)
         db.commit()
         db.refresh(agent)
+        analytics_cache.invalidate_user(agent.owner_id, db=db)
         
         # Log the status change
         self.log_agent_activity(
             db, 
             agent_id, 
             f"Agent status changed to {status}",
-            "INFO"
+            "INFO",
+            owner_id=agent.owner_id,
+            status=AgentStatus(status).value
         )
         
         # Create a task to broadcast the agent update
@@ -168,10 +215,23 @@ class AgentTracker:
     def update_task_progress(self, db: Session, task_id: int, progress: int, status: Optional[TaskStatus] = None):
         """
         Update task progress
+
+        Progress-only reports are buffered by the progress coalescer and
+        written on its next flush, with a throttled broadcast. Status changes
+        are written and broadcast immediately.
         """
-        task = db.query(Task).filter(Task.id == task_id).first()
+        # Usually already in the session's identity map from the permission check
+        task = db.get(Task, task_id)
         if not task:
             return None
+
+        if status is None and progress_coalescer.record(task_id, progress):
+            set_committed_value(task, "progress", progress)
+            self._broadcast_task_progress(task.owner_id, self._task_data(task))
+            return task
+
+        progress_coalescer.discard(task_id)
+        before = rollup_service.snapshot(task)
         
         task.progress = progress
         if status:
@@ -184,31 +244,59 @@ class AgentTracker:
                 task.completed_at = datetime.now()
         
         db.add(task)
+        rollup_service.apply_task_change(db, before, rollup_service.snapshot(task))
         db.commit()
         db.refresh(task)
+        analytics_cache.invalidate_user(task.owner_id, db=db)
         
         # Log the progress update
         self.log_task_activity(
             db, 
             task_id, 
             f"Task progress updated to {progress}%" + (f" with status {status}" if status else ""),
-            "INFO"
+            "INFO",
+            owner_id=task.owner_id
         )
         
-        # Create a task to broadcast the task update
-        asyncio.create_task(self.broadcast_task_update(
-            task.owner_id,
-            {
-                "id": task.id,
-                "title": task.title,
-                "status": task.status,
-                "progress": task.progress,
-                "started_at": task.started_at.isoformat() if task.started_at else None,
-                "completed_at": task.completed_at.isoformat() if task.completed_at else None
-            }
-        ))
+        # Broadcast right away, superseding any throttled progress update
+        self._progress_pending.pop(task_id, None)
+        self._progress_sent.pop(task_id)
+        asyncio.create_task(self.broadcast_task_update(task.owner_id, self._task_data(task)))
         
         return task
+
+    def _task_data(self, task: Task) -> Dict[str, Any]:
+        return {
+            "id": task.id,
+            "title": task.title,
+            "status": task.status,
+            "progress": task.progress,
+            "started_at": task.started_at.isoformat() if task.started_at else None,
+            "completed_at": task.completed_at.isoformat() if task.completed_at else None
+        }
+
+    def _broadcast_task_progress(self, owner_id: int, task_data: Dict[str, Any]):
+        """
+        Broadcast a progress update at most once per
+        PROGRESS_BROADCAST_INTERVAL_SECONDS per task. Reports arriving in
+        between are folded into one trailing update with the latest value.
+        """
+        task_id = task_data["id"]
+        if self._progress_sent.get(task_id) is None:
+            self._progress_sent.set(task_id, True)
+            asyncio.create_task(self.broadcast_task_update(owner_id, task_data))
+            return
+        if task_id not in self._progress_pending:
+            asyncio.get_running_loop().call_later(
+                PROGRESS_BROADCAST_INTERVAL_SECONDS, self._send_pending_progress, task_id
+            )
+        self._progress_pending[task_id] = (owner_id, task_data)
+
+    def _send_pending_progress(self, task_id: int):
+        pending = self._progress_pending.pop(task_id, None)
+        if pending is not None:
+            self._progress_sent.set(task_id, True)
+            asyncio.create_task(self.broadcast_task_update(*pending))
     
     def get_agent_logs(self, db: Session, agent_id: int, limit: int = 100):
         """
@@ -222,5 +310,45 @@ class AgentTracker:
         """
         return db.query(TaskLog).filter(TaskLog.task_id == task_id).order_by(TaskLog.timestamp.desc()).limit(limit).all()
 
+    def get_agent_logs_page(
+        self,
+        db: Session,
+        agent_id: int,
+        cursor: Optional[str] = None,
+        limit: int = 100,
+        columns: Optional[Sequence[str]] = None
+    ) -> Page:
+        """
+        Get a page of logs for an agent, newest first. The next cursor moves
+        to older logs and the previous cursor back to newer ones. With
+        columns, the page holds rows of just those columns.
+        """
+        entities = [getattr(AgentLog, column) for column in columns] if columns else [AgentLog]
+        query = db.query(*entities).filter(AgentLog.agent_id == agent_id)
+        return paginate(
+            query, sort_column=AgentLog.timestamp, id_column=AgentLog.id,
+            cursor=cursor, limit=limit, descending=True
+        )
+
+    def get_task_logs_page(
+        self,
+        db: Session,
+        task_id: int,
+        cursor: Optional[str] = None,
+        limit: int = 100,
+        columns: Optional[Sequence[str]] = None
+    ) -> Page:
+        """
+        Get a page of logs for a task, newest first. The next cursor moves
+        to older logs and the previous cursor back to newer ones. With
+        columns, the page holds rows of just those columns.
+        """
+        entities = [getattr(TaskLog, column) for column in columns] if columns else [TaskLog]
+        query = db.query(*entities).filter(TaskLog.task_id == task_id)
+        return paginate(
+            query, sort_column=TaskLog.timestamp, id_column=TaskLog.id,
+            cursor=cursor, limit=limit, descending=True
+        )
+
 # Create a singleton instance
 agent_tracker = AgentTracker()
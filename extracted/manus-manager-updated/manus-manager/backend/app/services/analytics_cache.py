@@ -0,0 +1,122 @@
+import asyncio
+import inspect
+import os
+import threading
+from collections import defaultdict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.core.cache import TTLCache
+from app.services.change_versions import change_versions
+
+# Analytics cache settings
+ANALYTICS_CACHE_TTL_SECONDS = float(os.getenv("ANALYTICS_CACHE_TTL_SECONDS", "30"))
+ANALYTICS_CACHE_MAX_ENTRIES = int(os.getenv("ANALYTICS_CACHE_MAX_ENTRIES", "2048"))
+# Writes are remembered for as long as a read replica may lag behind (the
+# same REPLICA_MAX_LAG_SECONDS app.db.session reads; see app.api.deps)
+WRITE_MARKER_TTL_SECONDS = float(os.getenv("REPLICA_MAX_LAG_SECONDS", "5"))
+WRITE_MARKER_MAX_ENTRIES = int(os.getenv("WRITE_MARKER_MAX_ENTRIES", "100000"))
+
+_MISSING = object()
+
+
+class AnalyticsCache:
+    """
+    Per-user cache for analytics responses
+
+    Entries are keyed by user, endpoint, parameters and the user's change
+    version. Services call invalidate_user() after committing a write that
+    affects a user's analytics, which bumps the version so older entries are
+    never matched again (they age out through TTL/LRU eviction). Concurrent
+    requests for the same key share a single computation.
+
+    Versions are process-local: with several workers, a write handled by one
+    worker reaches the others only through the TTL. So are the write markers
+    behind recently_written(), which expire after write_marker_ttl.
+    """
+    def __init__(
+        self,
+        maxsize: int = ANALYTICS_CACHE_MAX_ENTRIES,
+        ttl: float = ANALYTICS_CACHE_TTL_SECONDS,
+        write_marker_ttl: float = WRITE_MARKER_TTL_SECONDS
+    ):
+        self._entries = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._versions: Dict[int, int] = defaultdict(int)
+        self._versions_lock = threading.Lock()
+        self._written = TTLCache(maxsize=WRITE_MARKER_MAX_ENTRIES, ttl=write_marker_ttl)
+        self._inflight: Dict[Tuple, asyncio.Future] = {}
+
+    def version(self, user_id: int) -> int:
+        """
+        Get the current change version for a user
+        """
+        return self._versions[user_id]
+
+    def invalidate_user(self, *user_ids: int, db: Optional[Session] = None) -> None:
+        """
+        Mark every cached entry for these users as stale and, given the
+        session that made the write, bump their change_versions
+        """
+        with self._versions_lock:
+            for user_id in user_ids:
+                if user_id is not None:
+                    self._versions[user_id] += 1
+                    self._written.set(user_id, True)
+        if db is not None:
+            change_versions.bump(db, *user_ids)
+
+    def recently_written(self, user_id: Optional[int]) -> bool:
+        """
+        Whether this worker committed a write for this user in the last
+        write_marker_ttl seconds
+        """
+        return self._written.get(user_id, False)
+
+    async def get_or_compute(
+        self,
+        user_id: int,
+        endpoint: str,
+        params: Hashable,
+        compute: Callable[[], Any]
+    ) -> Any:
+        """
+        Return the cached value for this user/endpoint/params, computing it
+        with compute() (sync or async) on a miss
+        """
+        version = self.version(user_id)
+        key = (user_id, endpoint, params, version)
+
+        value = self._entries.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            return await asyncio.shield(inflight)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = compute()
+            if inspect.isawaitable(value):
+                value = await value
+        except Exception as exc:
+            future.set_exception(exc)
+            # Nobody may be waiting; don't warn about an unretrieved exception
+            future.exception()
+            raise
+        else:
+            # A write may have landed while computing; only cache if still current
+            if self.version(user_id) == version:
+                self._entries.set(key, value)
+            future.set_result(value)
+            return value
+        finally:
+            self._inflight.pop(key, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+# Create a singleton instance
+analytics_cache = AnalyticsCache()
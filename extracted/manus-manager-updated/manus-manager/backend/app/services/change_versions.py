@@ -0,0 +1,51 @@
+from typing import Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from app.models.models import ChangeVersion
+
+
+class ChangeVersions:
+    """
+    Per-user counters of committed changes, behind the API's ETags
+
+    Services call bump() after committing a write that changes what a user
+    can read. AnalyticsCache.invalidate_user(..., db=db) bumps them too,
+    so only writes that leave analytics untouched (such as buffered
+    progress) need to call bump() directly. The counters live in the
+    change_versions table, so every worker sees the same versions, and a
+    restart doesn't take them back to values an older ETag was built from.
+    """
+    def version(self, db: Session, user_id: int) -> int:
+        return db.execute(
+            select(ChangeVersion.version).where(ChangeVersion.user_id == user_id)
+        ).scalar() or 0
+
+    def global_version(self, db: Session) -> int:
+        """
+        Version covering every user: the sum of theirs, which grows with
+        each user's since rows are never deleted
+        """
+        return db.execute(select(func.sum(ChangeVersion.version))).scalar() or 0
+
+    def bump(self, db: Session, *user_ids: Optional[int]) -> None:
+        """
+        Bump each user's version. Like direct log writes, this commits on a
+        connection of its own, leaving the caller's session alone.
+        """
+        user_ids = sorted({user_id for user_id in user_ids if user_id is not None})
+        if not user_ids:
+            return
+        engine = db.get_bind().engine
+        dialect = postgresql if engine.dialect.name == "postgresql" else sqlite
+        stmt = dialect.insert(ChangeVersion).values([{"user_id": user_id, "version": 1} for user_id in user_ids])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["user_id"], set_={"version": ChangeVersion.version + 1}
+        )
+        with engine.begin() as connection:
+            connection.execute(stmt)
+
+# Create a singleton instance
+change_versions = ChangeVersions()
@@ -0,0 +1,191 @@
+import csv
+import io
+import json
+import os
+import queue
+import threading
+from datetime import date, datetime
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.models.models import Agent, AgentLog, Task, TaskLog
+
+# Export settings
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "2000"))
+EXPORT_COPY_QUEUE_SIZE = int(os.getenv("EXPORT_COPY_QUEUE_SIZE", "64"))
+
+# Export name -> (model, exported columns, time-range column)
+EXPORTS: Dict[str, Tuple] = {
+    "agent_logs": (AgentLog, ("id", "agent_id", "timestamp", "level", "message", "details"), "timestamp"),
+    "task_logs": (TaskLog, ("id", "task_id", "timestamp", "level", "message", "details"), "timestamp"),
+    "tasks": (
+        Task,
+        ("id", "title", "description", "status", "priority", "progress", "owner_id", "agent_id",
+         "created_at", "updated_at", "started_at", "completed_at"),
+        "created_at",
+    ),
+}
+
+# Export format -> media type
+EXPORT_FORMATS = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+_DONE = object()
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class _QueueWriter:
+    """
+    File-like sink for copy_expert that hands each chunk to a bounded queue
+    """
+    def __init__(self, chunks: "queue.Queue", cancelled: threading.Event):
+        self._chunks = chunks
+        self._cancelled = cancelled
+
+    def write(self, data) -> None:
+        while not self._cancelled.is_set():
+            try:
+                self._chunks.put(data, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+        # Raising aborts the COPY once the client has gone away
+        raise IOError("Export cancelled")
+
+
+class ExportService:
+    """
+    Service for streaming bulk exports of logs and tasks
+
+    Rows are read through a server-side cursor in batches of
+    EXPORT_BATCH_SIZE and encoded batch by batch, so memory use doesn't grow
+    with the size of the export. CSV exports on Postgres are produced by the
+    database itself with COPY ... TO STDOUT.
+    """
+    def statement(
+        self,
+        name: str,
+        *,
+        owner_id: Optional[int] = None,
+        agent_id: Optional[int] = None,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None
+    ):
+        """
+        Build the SELECT for an export, ordered by id
+        """
+        model, columns, time_column = EXPORTS[name]
+        stmt = select(*[getattr(model, column) for column in columns])
+
+        if model is AgentLog:
+            if agent_id is not None:
+                stmt = stmt.where(AgentLog.agent_id == agent_id)
+            if owner_id is not None:
+                stmt = stmt.where(AgentLog.agent_id.in_(select(Agent.id).where(Agent.owner_id == owner_id)))
+        elif model is TaskLog:
+            if owner_id is not None or agent_id is not None:
+                tasks = select(Task.id)
+                if owner_id is not None:
+                    tasks = tasks.where(Task.owner_id == owner_id)
+                if agent_id is not None:
+                    tasks = tasks.where(Task.agent_id == agent_id)
+                stmt = stmt.where(TaskLog.task_id.in_(tasks))
+        else:
+            if owner_id is not None:
+                stmt = stmt.where(Task.owner_id == owner_id)
+            if agent_id is not None:
+                stmt = stmt.where(Task.agent_id == agent_id)
+
+        if start:
+            stmt = stmt.where(getattr(model, time_column) >= start)
+        if end:
+            stmt = stmt.where(getattr(model, time_column) < end)
+        return stmt.order_by(model.id)
+
+    def stream(self, db: Session, name: str, format: str, **filters) -> Iterator[bytes]:
+        """
+        Stream an export as encoded chunks
+        """
+        stmt = self.statement(name, **filters)
+        columns = EXPORTS[name][1]
+        if format == "csv" and db.get_bind().dialect.name == "postgresql":
+            return self._copy_csv(db, stmt)
+        batches = self._batches(db, stmt)
+        if format == "csv":
+            return self._encode_csv(columns, batches)
+        return self._encode_ndjson(columns, batches)
+
+    def _batches(self, db: Session, stmt) -> Iterator[Sequence[Tuple]]:
+        result = db.execute(stmt.execution_options(stream_results=True, yield_per=EXPORT_BATCH_SIZE))
+        try:
+            for batch in result.partitions():
+                yield batch
+        finally:
+            result.close()
+
+    def _encode_ndjson(self, columns: Sequence[str], batches: Iterator[Sequence[Tuple]]) -> Iterator[bytes]:
+        for batch in batches:
+            lines = [json.dumps(dict(zip(columns, row)), default=_json_default) for row in batch]
+            yield ("\n".join(lines) + "\n").encode()
+
+    def _encode_csv(self, columns: Sequence[str], batches: Iterator[Sequence[Tuple]]) -> Iterator[bytes]:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(columns)
+        for batch in batches:
+            writer.writerows(batch)
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue().encode()
+
+    def _copy_csv(self, db: Session, stmt) -> Iterator[bytes]:
+        """
+        Run COPY (stmt) TO STDOUT on a worker thread, yielding its output as it
+        arrives; the bounded queue stalls COPY while the client catches up
+        """
+        compiled = stmt.compile(dialect=db.get_bind().dialect)
+        cursor = db.connection().connection.cursor()
+        query = cursor.mogrify(str(compiled), compiled.params).decode()
+        chunks: "queue.Queue" = queue.Queue(maxsize=EXPORT_COPY_QUEUE_SIZE)
+        cancelled = threading.Event()
+        errors: List[BaseException] = []
+
+        def copy():
+            try:
+                cursor.copy_expert(f"COPY ({query}) TO STDOUT WITH (FORMAT csv, HEADER)", _QueueWriter(chunks, cancelled))
+            except BaseException as exc:
+                if not cancelled.is_set():
+                    errors.append(exc)
+            finally:
+                while not cancelled.is_set():
+                    try:
+                        chunks.put(_DONE, timeout=0.5)
+                        break
+                    except queue.Full:
+                        continue
+
+        worker = threading.Thread(target=copy, name="export-copy", daemon=True)
+        worker.start()
+        try:
+            while True:
+                chunk = chunks.get()
+                if chunk is _DONE:
+                    break
+                yield chunk if isinstance(chunk, bytes) else chunk.encode()
+            if errors:
+                raise errors[0]
+        finally:
+            cancelled.set()
+            worker.join()
+            cursor.close()
+
+# Create a singleton instance
+export_service = ExportService()
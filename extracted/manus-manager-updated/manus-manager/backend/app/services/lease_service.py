@@ -0,0 +1,181 @@
+import os
+import secrets
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+
+from sqlalchemy import func, or_, select, true, update
+from sqlalchemy.orm import Session
+
+from app.core.batching import BULK_CHUNK_SIZE
+from app.models.models import Agent, Task, TaskRollup
+from app.schemas.schemas import TaskStatus
+from app.services.analytics_cache import analytics_cache
+from app.services.progress_coalescer import progress_coalescer
+from app.services.rollup_service import rollup_service, ROLLUP_SCOPE_AGENT
+
+# Lease settings
+TASK_LEASE_SECONDS = int(os.getenv("TASK_LEASE_SECONDS", "60"))
+TASK_LEASE_MAX_SECONDS = int(os.getenv("TASK_LEASE_MAX_SECONDS", "3600"))
+# Claims retried after losing a race for the same task (SQLite only; Postgres skips locked rows)
+TASK_LEASE_CLAIM_RETRIES = int(os.getenv("TASK_LEASE_CLAIM_RETRIES", "5"))
+
+
+class LeaseService:
+    """
+    Service for agents pulling tasks off the tasks table under a lease
+
+    claim() takes the agent owner's highest-priority, oldest pending task
+    that is unassigned or already assigned to the agent, and moves it to
+    in_progress under a fresh lease token, unless the agent already has
+    max_tasks in progress. On Postgres claims for one agent take turns on
+    the agent's row, and the candidate row is read with FOR UPDATE SKIP
+    LOCKED, so concurrent claims for different agents each get a different
+    task without waiting on one another. SQLite has one writer at a time;
+    there the claiming UPDATE re-checks the task is still pending and the
+    agent has room, and the claim moves on to the next candidate if not.
+
+    The agent renews its lease with renew() while it works. Tasks whose
+    lease runs out are put back to pending by requeue_expired().
+    """
+    def claim(
+        self,
+        db: Session,
+        *,
+        agent: Agent,
+        lease_seconds: int = TASK_LEASE_SECONDS
+    ) -> Optional[Tuple[Task, str]]:
+        """
+        Lease the next task for an agent, returning the task and lease token,
+        or None when nothing is pending or the agent is at max_tasks
+        """
+        pending = TaskStatus.PENDING.value
+        in_progress = TaskStatus.IN_PROGRESS.value
+        candidates = select(Task.id, Task.agent_id, Task.priority).where(
+            Task.owner_id == agent.owner_id,
+            Task.status == pending,
+            or_(Task.agent_id.is_(None), Task.agent_id == agent.id)
+        ).order_by(Task.priority.desc(), Task.created_at, Task.id).limit(1).with_for_update(skip_locked=True)
+        in_flight = select(TaskRollup.in_progress_count).where(
+            TaskRollup.scope == ROLLUP_SCOPE_AGENT, TaskRollup.scope_id == agent.id
+        ).scalar_subquery()
+        has_room = func.coalesce(in_flight, 0) < agent.max_tasks if agent.max_tasks is not None else true()
+
+        for _ in range(TASK_LEASE_CLAIM_RETRIES):
+            # Claims for the same agent queue up on its row (Postgres), so
+            # each sees the in-flight count the one before it left
+            db.execute(select(Agent.id).where(Agent.id == agent.id).with_for_update())
+            if not db.execute(select(has_room)).scalar():
+                db.rollback()
+                return None
+            candidate = db.execute(candidates).first()
+            if candidate is None:
+                db.rollback()
+                return None
+            now = datetime.now()
+            token = secrets.token_urlsafe(24)
+            # SQLite takes no row locks; there the UPDATE checks for room
+            # again, under the database's write lock
+            claimed = db.execute(
+                update(Task)
+                .where(Task.id == candidate.id, Task.status == pending, has_room)
+                .values(
+                    agent_id=agent.id,
+                    status=in_progress,
+                    started_at=now,
+                    lease_token=token,
+                    lease_expires_at=now + timedelta(seconds=lease_seconds),
+                    lease_attempts=Task.lease_attempts + 1,
+                )
+                .returning(Task.id)
+                .execution_options(synchronize_session=False)
+            ).scalar()
+            if claimed is None:
+                db.rollback()
+                continue
+            progress_coalescer.discard(claimed)
+            rollup_service.apply_task_change(
+                db,
+                rollup_service.state(agent.owner_id, candidate.agent_id, pending, candidate.priority),
+                rollup_service.state(agent.owner_id, agent.id, in_progress, candidate.priority, now),
+            )
+            db.commit()
+            analytics_cache.invalidate_user(agent.owner_id, db=db)
+            return db.get(Task, claimed, populate_existing=True), token
+        return None
+
+    def renew(
+        self,
+        db: Session,
+        *,
+        task_id: int,
+        lease_token: str,
+        lease_seconds: int = TASK_LEASE_SECONDS
+    ) -> Optional[datetime]:
+        """
+        Extend a lease that is still held, returning the new expiry, or None
+        if the lease expired or was taken over
+        """
+        now = datetime.now()
+        expires_at = db.execute(
+            update(Task)
+            .where(
+                Task.id == task_id,
+                Task.lease_token == lease_token,
+                Task.status == TaskStatus.IN_PROGRESS.value,
+                Task.lease_expires_at > now
+            )
+            .values(lease_expires_at=now + timedelta(seconds=lease_seconds))
+            .returning(Task.lease_expires_at)
+            .execution_options(synchronize_session=False)
+        ).scalar()
+        db.commit()
+        return expires_at
+
+    def requeue_expired(self, db: Session, *, now: Optional[datetime] = None) -> int:
+        """
+        Put in_progress tasks whose lease has run out back to pending and
+        unassigned, returning how many were requeued
+        """
+        now = now or datetime.now()
+        pending = TaskStatus.PENDING.value
+        in_progress = TaskStatus.IN_PROGRESS.value
+        requeued = 0
+        while True:
+            # The previous agent and start time are the lease holder's, which
+            # the rollups need to undo, so read them before resetting the rows
+            rows = db.execute(
+                select(Task.id, Task.owner_id, Task.agent_id, Task.priority, Task.started_at)
+                .where(Task.status == in_progress, Task.lease_expires_at < now)
+                .limit(BULK_CHUNK_SIZE)
+                .with_for_update(skip_locked=True)
+            ).all()
+            if not rows:
+                db.rollback()
+                return requeued
+            # Leases renewed since the read are left alone
+            reset = set(db.execute(
+                update(Task)
+                .where(
+                    Task.id.in_([row.id for row in rows]),
+                    Task.status == in_progress,
+                    Task.lease_expires_at < now
+                )
+                .values(status=pending, agent_id=None, started_at=None, lease_token=None, lease_expires_at=None)
+                .returning(Task.id)
+                .execution_options(synchronize_session=False)
+            ).scalars())
+            rows = [row for row in rows if row.id in reset]
+            progress_coalescer.discard_many(reset)
+            rollup_service.apply_task_changes(db, [
+                (
+                    rollup_service.state(row.owner_id, row.agent_id, in_progress, row.priority, row.started_at),
+                    rollup_service.state(row.owner_id, None, pending, row.priority),
+                )
+                for row in rows
+            ])
+            db.commit()
+            analytics_cache.invalidate_user(*{row.owner_id for row in rows}, db=db)
+            requeued += len(rows)
+
+# Create a singleton instance
+lease_service = LeaseService()
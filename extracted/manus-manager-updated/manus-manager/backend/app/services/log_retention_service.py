@@ -0,0 +1,178 @@
+import logging
+import os
+from datetime import date, datetime, time, timedelta
+from typing import Dict, List, Optional
+
+from sqlalchemy import delete, func, select, text
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import Session
+
+from app.models.models import AgentLog, TaskLog, LogLevelRollup
+
+logger = logging.getLogger(__name__)
+
+# Log retention settings
+LOG_RETENTION_DAYS = int(os.getenv("LOG_RETENTION_DAYS", "30"))
+LOG_PARTITION_PREMAKE_DAYS = int(os.getenv("LOG_PARTITION_PREMAKE_DAYS", "7"))
+LOG_DELETE_BATCH_SIZE = int(os.getenv("LOG_DELETE_BATCH_SIZE", "5000"))
+
+# Log model -> (rollup source, owning id column)
+LOG_TABLES = {
+    AgentLog: ("agent", AgentLog.agent_id),
+    TaskLog: ("task", TaskLog.task_id),
+}
+
+
+def partition_name(table: str, day: date) -> str:
+    return f"{table}_p{day:%Y%m%d}"
+
+
+class LogRetentionService:
+    """
+    Service for log partition upkeep and retention
+
+    On Postgres agent_logs and task_logs are partitioned by day, so expiring a
+    day is a DROP TABLE of its partition. Anything older than the window that
+    isn't in a daily partition (the default partition, or every row on SQLite)
+    is deleted in batches instead. Either way the day's per-level counts are
+    added to log_level_rollups in the same transaction that removes the rows.
+    """
+    def ensure_partitions(self, db: Session, days_ahead: int = LOG_PARTITION_PREMAKE_DAYS) -> int:
+        """
+        Create the daily partitions from today through days_ahead. Returns the
+        number created; a no-op when the log tables aren't partitioned.
+        """
+        created = 0
+        today = datetime.utcnow().date()
+        for model in LOG_TABLES:
+            table = model.__tablename__
+            if not self._is_partitioned(db, table):
+                continue
+            existing = self._partitions(db, table)
+            for offset in range(days_ahead + 1):
+                day = today + timedelta(days=offset)
+                if day in existing:
+                    continue
+                try:
+                    with db.begin_nested():
+                        db.execute(text(
+                            f"CREATE TABLE IF NOT EXISTS {partition_name(table, day)} "
+                            f"PARTITION OF {table} FOR VALUES FROM ('{day}') TO ('{day + timedelta(days=1)}')"
+                        ))
+                    created += 1
+                except DBAPIError:
+                    # The default partition already holds rows for that day
+                    logger.warning("Could not create partition %s", partition_name(table, day), exc_info=True)
+        db.commit()
+        return created
+
+    def prune(self, db: Session, retention_days: int = LOG_RETENTION_DAYS, now: Optional[datetime] = None) -> Dict[str, int]:
+        """
+        Roll up and remove every log older than retention_days
+        """
+        cutoff = (now or datetime.utcnow()).date() - timedelta(days=retention_days)
+        dropped = deleted = 0
+        for model in LOG_TABLES:
+            table = model.__tablename__
+            if self._is_partitioned(db, table):
+                for day, name in sorted(self._partitions(db, table).items()):
+                    if day >= cutoff:
+                        break
+                    self._rollup_day(db, model, day)
+                    db.execute(text(f"DROP TABLE {name}"))
+                    db.commit()
+                    dropped += 1
+
+            # Whatever is left over is expired a day at a time
+            while True:
+                oldest = db.query(func.min(model.timestamp)).filter(
+                    model.timestamp < datetime.combine(cutoff, time.min)
+                ).scalar()
+                if oldest is None:
+                    break
+                day = oldest.date()
+                self._rollup_day(db, model, day)
+                deleted += self._delete_day(db, model, day)
+                db.commit()
+        return {"partitions_dropped": dropped, "rows_deleted": deleted}
+
+    def get_level_counts(self, db: Session, source: str, source_id: int) -> List[LogLevelRollup]:
+        """
+        Get the per-day level counts kept for pruned logs of an agent or task
+        """
+        return db.query(LogLevelRollup).filter(
+            LogLevelRollup.source == source, LogLevelRollup.source_id == source_id
+        ).order_by(LogLevelRollup.day, LogLevelRollup.level).all()
+
+    def _is_partitioned(self, db: Session, table: str) -> bool:
+        if db.get_bind().dialect.name != "postgresql":
+            return False
+        relkind = db.execute(
+            text("SELECT relkind FROM pg_class WHERE relname = :table AND pg_table_is_visible(oid)"),
+            {"table": table},
+        ).scalar()
+        return relkind == "p"
+
+    def _partitions(self, db: Session, table: str) -> Dict[date, str]:
+        """
+        Map day -> name for the daily partitions of table
+        """
+        names = db.execute(text(
+            "SELECT child.relname FROM pg_inherits "
+            "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+            "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+            "WHERE parent.relname = :table"
+        ), {"table": table}).scalars()
+        partitions = {}
+        prefix = f"{table}_p"
+        for name in names:
+            if name.startswith(prefix):
+                try:
+                    partitions[datetime.strptime(name[len(prefix):], "%Y%m%d").date()] = name
+                except ValueError:
+                    continue
+        return partitions
+
+    def _day_range(self, model, day: date):
+        start = datetime.combine(day, time.min)
+        return model.timestamp >= start, model.timestamp < start + timedelta(days=1)
+
+    def _rollup_day(self, db: Session, model, day: date) -> None:
+        """
+        Add the day's per-source, per-level log counts to log_level_rollups
+        """
+        source, id_column = LOG_TABLES[model]
+        rows = [
+            {"source": source, "source_id": source_id, "day": day, "level": level, "count": count}
+            for source_id, level, count in db.query(id_column, model.level, func.count())
+            .filter(*self._day_range(model, day), id_column.isnot(None))
+            .group_by(id_column, model.level)
+        ]
+        if not rows:
+            return
+        dialect = postgresql if db.get_bind().dialect.name == "postgresql" else sqlite
+        for i in range(0, len(rows), 500):
+            stmt = dialect.insert(LogLevelRollup).values(rows[i:i + 500])
+            stmt = stmt.on_conflict_do_update(
+                index_elements=["source", "source_id", "day", "level"],
+                set_={"count": LogLevelRollup.count + stmt.excluded["count"]},
+            )
+            db.execute(stmt)
+
+    def _delete_day(self, db: Session, model, day: date) -> int:
+        """
+        Delete the day's rows in batches, keeping each statement small
+        """
+        deleted = 0
+        while True:
+            batch = select(model.id).where(*self._day_range(model, day)).limit(LOG_DELETE_BATCH_SIZE)
+            result = db.execute(
+                delete(model).where(model.id.in_(batch.scalar_subquery())).execution_options(synchronize_session=False)
+            )
+            deleted += result.rowcount
+            if result.rowcount < LOG_DELETE_BATCH_SIZE:
+                return deleted
+
+# Create a singleton instance
+log_retention_service = LogRetentionService()
@@ -0,0 +1,140 @@
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import and_, column, func, literal_column, table
+from sqlalchemy.orm import Session
+
+from app.models.models import Agent, AgentLog, Task, TaskLog, LOG_SEARCH_CONFIG
+
+# Searchable log sources
+LOG_SEARCH_SOURCES = {"agent": AgentLog, "task": TaskLog}
+
+# Result orderings
+LOG_SEARCH_ORDERS = ("rank", "newest", "oldest")
+
+SNIPPET_START = "<mark>"
+SNIPPET_STOP = "</mark>"
+HEADLINE_OPTIONS = f"StartSel={SNIPPET_START}, StopSel={SNIPPET_STOP}, MaxWords=24, MinWords=8, MaxFragments=2"
+SNIPPET_TOKENS = 16
+
+
+def fts5_query(text: str) -> str:
+    """
+    Turn free text into an FTS5 query matching every word, so user input
+    never hits the FTS5 query syntax
+    """
+    return " ".join('"{}"'.format(word.replace('"', '""')) for word in text.split())
+
+
+class LogSearchService:
+    """
+    Service for full-text search over agent and task log messages
+
+    Postgres matches against the GIN-indexed search_vector column; SQLite
+    matches against the FTS5 table shadowing each log table. Higher rank is a
+    better match on both.
+    """
+    def search(
+        self,
+        db: Session,
+        *,
+        query: str,
+        source: str = "agent",
+        owner_id: Optional[int] = None,
+        agent_id: Optional[int] = None,
+        task_id: Optional[int] = None,
+        level: Optional[str] = None,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        order: str = "rank",
+        limit: int = 50
+    ) -> List[Dict[str, Any]]:
+        """
+        Search one log source, returning matching logs with a highlighted snippet
+        """
+        model = LOG_SEARCH_SOURCES[source]
+        if db.get_bind().dialect.name == "postgresql":
+            rows = self._search_postgresql(db, model, query, order, limit, owner_id=owner_id, agent_id=agent_id,
+                                           task_id=task_id, level=level, start=start, end=end)
+        else:
+            rows = self._search_sqlite(db, model, query, order, limit, owner_id=owner_id, agent_id=agent_id,
+                                       task_id=task_id, level=level, start=start, end=end)
+
+        return [
+            {
+                "id": log.id,
+                "source": source,
+                "agent_id": getattr(log, "agent_id", None),
+                "task_id": getattr(log, "task_id", None),
+                "timestamp": log.timestamp,
+                "level": log.level,
+                "message": log.message,
+                "snippet": snippet,
+                "rank": rank,
+            }
+            for log, rank, snippet in rows
+        ]
+
+    def _search_postgresql(self, db: Session, model, query: str, order: str, limit: int, **filters):
+        tsquery = func.websearch_to_tsquery(LOG_SEARCH_CONFIG, query)
+        search_vector = literal_column(f"{model.__tablename__}.search_vector")
+        rank = func.ts_rank(search_vector, tsquery).label("rank")
+
+        # Rank and limit first so headlines are only built for the returned rows
+        matches = self._filter(
+            db.query(model.id, model.timestamp, rank).filter(search_vector.op("@@")(tsquery)), model, **filters
+        )
+        matches = self._order(matches, model.timestamp, rank, order).limit(limit).subquery()
+
+        headline = func.ts_headline(LOG_SEARCH_CONFIG, model.message, tsquery, HEADLINE_OPTIONS)
+        rows = db.query(model, matches.c.rank, headline).join(
+            matches, and_(model.id == matches.c.id, model.timestamp == matches.c.timestamp)
+        )
+        return self._order(rows, model.timestamp, matches.c.rank, order).all()
+
+    def _search_sqlite(self, db: Session, model, query: str, order: str, limit: int, **filters):
+        fts_name = f"{model.__tablename__}_fts"
+        fts = table(fts_name, column("rowid"))
+        fts_ref = literal_column(fts_name)
+        # bm25() is lower for better matches
+        rank = (-func.bm25(fts_ref)).label("rank")
+        snippet = func.snippet(fts_ref, 0, SNIPPET_START, SNIPPET_STOP, "…", SNIPPET_TOKENS)
+
+        rows = db.query(model, rank, snippet).select_from(fts).join(model, model.id == fts.c.rowid).filter(
+            fts_ref.op("MATCH")(fts5_query(query))
+        )
+        rows = self._filter(rows, model, **filters)
+        return self._order(rows, model.timestamp, rank, order).limit(limit).all()
+
+    def _filter(self, q, model, *, owner_id, agent_id, task_id, level, start, end):
+        if model is AgentLog:
+            if agent_id is not None:
+                q = q.filter(AgentLog.agent_id == agent_id)
+            if owner_id is not None:
+                q = q.join(Agent, Agent.id == AgentLog.agent_id).filter(Agent.owner_id == owner_id)
+        else:
+            if task_id is not None:
+                q = q.filter(TaskLog.task_id == task_id)
+            if owner_id is not None or agent_id is not None:
+                q = q.join(Task, Task.id == TaskLog.task_id)
+                if owner_id is not None:
+                    q = q.filter(Task.owner_id == owner_id)
+                if agent_id is not None:
+                    q = q.filter(Task.agent_id == agent_id)
+        if level:
+            q = q.filter(func.lower(model.level) == level.lower())
+        if start:
+            q = q.filter(model.timestamp >= start)
+        if end:
+            q = q.filter(model.timestamp < end)
+        return q
+
+    def _order(self, q, timestamp, rank, order: str):
+        if order == "newest":
+            return q.order_by(timestamp.desc())
+        if order == "oldest":
+            return q.order_by(timestamp.asc())
+        return q.order_by(rank.desc(), timestamp.desc())
+
+# Create a singleton instance
+log_search_service = LogSearchService()
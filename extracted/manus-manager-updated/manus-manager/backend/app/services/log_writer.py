@@ -0,0 +1,181 @@
+import logging
+import os
+import queue
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Callable, Dict, List, Optional, Tuple, Type
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from app.db.base_class import Base
+
+logger = logging.getLogger(__name__)
+
+# Log writer settings
+LOG_QUEUE_MAX_SIZE = int(os.getenv("LOG_QUEUE_MAX_SIZE", "10000"))
+LOG_BATCH_SIZE = int(os.getenv("LOG_BATCH_SIZE", "500"))
+LOG_FLUSH_INTERVAL_SECONDS = float(os.getenv("LOG_FLUSH_INTERVAL_SECONDS", "0.2"))
+
+_STOP = object()
+
+# (model, row, on_written) as queued by enqueue()
+QueuedRow = Tuple[Type[Base], Dict[str, Any], Optional[Callable[[int], None]]]
+
+
+class LogWriter:
+    """
+    Background writer for AgentLog and TaskLog rows
+
+    Producers put plain row dicts on a bounded queue. A single thread takes
+    up to LOG_BATCH_SIZE rows at a time (waiting at most
+    LOG_FLUSH_INTERVAL_SECONDS for a batch to fill) and writes them with one
+    multi-row INSERT per table and one commit per batch. Each row's
+    on_written callback, if any, is then called on that thread with the id
+    the row was given.
+
+    enqueue() never waits: producers run on the event loop, so when the
+    queue is full it returns False right away and the caller writes the row
+    itself, which slows a busy producer down instead of growing memory.
+    stop() drains everything still queued before returning.
+    """
+    def __init__(
+        self,
+        max_size: int = LOG_QUEUE_MAX_SIZE,
+        batch_size: int = LOG_BATCH_SIZE,
+        flush_interval: float = LOG_FLUSH_INTERVAL_SECONDS
+    ):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_size)
+        self._session_factory: Optional[Callable[[], Session]] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.written = 0
+        self.failed = 0
+        self.batches = 0
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, session_factory: Callable[[], Session]) -> None:
+        """
+        Start the background thread, writing through sessions from session_factory
+        """
+        with self._lock:
+            if self.running:
+                return
+            self._session_factory = session_factory
+            self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """
+        Flush every queued row and stop the background thread
+        """
+        with self._lock:
+            thread = self._thread
+            if thread is None:
+                return
+            # Blocks while the queue is full, so nothing queued before stop() is lost
+            self._queue.put(_STOP)
+            thread.join(timeout)
+            self._thread = None
+
+    def enqueue(
+        self, model: Type[Base], row: Dict[str, Any], on_written: Optional[Callable[[int], None]] = None
+    ) -> bool:
+        """
+        Queue a row for model, calling on_written with its id once it is
+        committed. Returns False if the writer isn't running or the queue is
+        full, in which case the caller should write it directly.
+        """
+        if not self.running:
+            return False
+        try:
+            self._queue.put_nowait((model, row, on_written))
+        except queue.Full:
+            logger.warning("Log queue full; writing log row synchronously")
+            return False
+        return True
+
+    def flush(self) -> None:
+        """
+        Block until every row queued so far has been written
+        """
+        if self.running:
+            self._queue.join()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "queued": self._queue.qsize(),
+            "written": self.written,
+            "failed": self.failed,
+            "batches": self.batches,
+        }
+
+    def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            batch: List[QueuedRow] = []
+            deadline = time.monotonic() + self.flush_interval
+            while True:
+                if item is _STOP:
+                    stopping = True
+                    self._queue.task_done()
+                else:
+                    batch.append(item)
+                if stopping or len(batch) >= self.batch_size:
+                    break
+                # Keep collecting until the batch is full or the interval elapses
+                try:
+                    item = self._queue.get(timeout=max(0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+            if stopping:
+                # Drain whatever is still queued behind the stop marker
+                while True:
+                    try:
+                        batch.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+            if batch:
+                self._write(batch)
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _write(self, batch: List[QueuedRow]) -> None:
+        items_by_model: Dict[Type[Base], List[QueuedRow]] = defaultdict(list)
+        for item in batch:
+            items_by_model[item[0]].append(item)
+
+        written: List[Tuple[Callable[[int], None], int]] = []
+        db = self._session_factory()
+        try:
+            for model, items in items_by_model.items():
+                ids = db.scalars(
+                    insert(model).returning(model.id, sort_by_parameter_order=True), [row for _, row, _ in items]
+                ).all()
+                written.extend((on_written, id) for (_, _, on_written), id in zip(items, ids) if on_written)
+            db.commit()
+            self.written += len(batch)
+            self.batches += 1
+        except Exception:
+            db.rollback()
+            self.failed += len(batch)
+            logger.exception("Failed to write %d log rows", len(batch))
+            return
+        finally:
+            db.close()
+
+        for on_written, id in written:
+            try:
+                on_written(id)
+            except Exception:
+                logger.exception("Log row callback failed")
+
+# Create a singleton instance
+log_writer = LogWriter()
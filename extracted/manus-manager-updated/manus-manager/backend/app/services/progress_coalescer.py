@@ -0,0 +1,203 @@
+import logging
+import os
+import threading
+from datetime import datetime
+from typing import Callable, Dict, Iterable, Optional, Set
+
+from sqlalchemy import bindparam, insert, select, update
+from sqlalchemy.orm import Session
+
+from app.core.batching import chunked
+from app.models.models import Task, TaskLog
+from app.schemas.schemas import TaskStatus
+from app.services.change_versions import change_versions
+
+logger = logging.getLogger(__name__)
+
+# Progress coalescing settings
+PROGRESS_FLUSH_INTERVAL_SECONDS = float(os.getenv("PROGRESS_FLUSH_INTERVAL_SECONDS", "2.0"))
+
+# Tasks whose progress is final; a late flush never overwrites them
+FINISHED_TASK_STATUSES = (TaskStatus.COMPLETED.value, TaskStatus.FAILED.value, TaskStatus.CANCELLED.value)
+
+
+class ProgressCoalescer:
+    """
+    Latest-value buffer for task progress reports
+
+    record() only replaces the task's entry in an in-memory map; a
+    background thread writes whatever is in the map every
+    PROGRESS_FLUSH_INTERVAL_SECONDS, with one batched UPDATE and one log
+    insert per chunk of tasks reported since the last flush. An agent reporting
+    every second therefore costs one row write per interval instead of a
+    transaction per report.
+
+    Status changes don't go through here: the caller discard()s the
+    buffered value and writes the change itself. A flush skips tasks that
+    have finished or were discarded while it ran, and holds row locks while
+    writing, so it never overwrites a newer status change. stop() writes out
+    anything still buffered.
+    """
+    def __init__(self, flush_interval: float = PROGRESS_FLUSH_INTERVAL_SECONDS):
+        self.flush_interval = flush_interval
+        self._latest: Dict[int, float] = {}
+        # Tasks discarded since the current flush took its values, recorded
+        # only while a flush is writing
+        self._superseded: Set[int] = set()
+        self._flushing = False
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._session_factory: Optional[Callable[[], Session]] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+        self.reported = 0
+        self.written = 0
+        self.failed = 0
+        self.flushes = 0
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, session_factory: Callable[[], Session]) -> None:
+        """
+        Start the background flush thread, writing through sessions from session_factory
+        """
+        if self.running:
+            return
+        self._session_factory = session_factory
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="progress-coalescer", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """
+        Stop the background thread and write out every buffered value
+        """
+        thread = self._thread
+        if thread is None:
+            return
+        self._stopping.set()
+        thread.join(timeout)
+        self._thread = None
+        self.flush()
+
+    def record(self, task_id: int, progress: float) -> bool:
+        """
+        Buffer a task's latest progress. Returns False if the coalescer isn't
+        running, in which case the caller should write it directly.
+        """
+        if not self.running:
+            return False
+        with self._lock:
+            self._latest[task_id] = progress
+            self.reported += 1
+        return True
+
+    def latest(self, task_id: int) -> Optional[float]:
+        """
+        The buffered progress for a task not yet written, if any
+        """
+        return self._latest.get(task_id)
+
+    def discard(self, task_id: int) -> Optional[float]:
+        """
+        Drop a task's buffered progress, returning it
+        """
+        with self._lock:
+            if self._flushing:
+                self._superseded.add(task_id)
+            return self._latest.pop(task_id, None)
+
+    def discard_many(self, task_ids: Iterable[int]) -> None:
+        """
+        Drop the buffered progress of many tasks, as discard() does
+        """
+        with self._lock:
+            for task_id in task_ids:
+                if self._flushing:
+                    self._superseded.add(task_id)
+                self._latest.pop(task_id, None)
+
+    def flush(self) -> int:
+        """
+        Write every buffered value now, returning how many tasks were updated
+        """
+        if self._session_factory is None:
+            return 0
+        with self._flush_lock:
+            with self._lock:
+                latest, self._latest = self._latest, {}
+                if not latest:
+                    return 0
+                self._flushing = True
+            try:
+                return self._write(latest)
+            finally:
+                with self._lock:
+                    self._flushing = False
+                    self._superseded.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "buffered": len(self._latest),
+            "reported": self.reported,
+            "written": self.written,
+            "failed": self.failed,
+            "flushes": self.flushes,
+        }
+
+    def _run(self) -> None:
+        while not self._stopping.wait(self.flush_interval):
+            self.flush()
+
+    def _write(self, latest: Dict[int, float]) -> int:
+        tasks = Task.__table__
+        statement = update(tasks).where(tasks.c.id == bindparam("task_id")).values(progress=bindparam("progress"))
+        now = datetime.utcnow()
+
+        db = self._session_factory()
+        owner_ids: Set[int] = set()
+        try:
+            written = 0
+            for chunk in chunked(list(latest)):
+                # Lock the tasks still running, so none is finished or deleted under the write
+                rows = db.execute(
+                    select(Task.id, Task.owner_id)
+                    .where(Task.id.in_(chunk), Task.status.notin_(FINISHED_TASK_STATUSES))
+                    .with_for_update()
+                ).all()
+                # A status change written since this flush began carries its own progress
+                with self._lock:
+                    rows = [row for row in rows if row.id not in self._superseded]
+                task_ids = [row.id for row in rows]
+                owner_ids.update(row.owner_id for row in rows)
+                if not task_ids:
+                    continue
+                db.execute(statement, [{"task_id": task_id, "progress": latest[task_id]} for task_id in task_ids])
+                db.execute(insert(TaskLog), [
+                    {
+                        "task_id": task_id,
+                        "timestamp": now,
+                        "level": "INFO",
+                        "message": f"Task progress updated to {latest[task_id]}%",
+                    }
+                    for task_id in task_ids
+                ])
+                written += len(task_ids)
+            db.commit()
+            # Progress isn't part of any analytics; only the owners' ETags change
+            change_versions.bump(db, *owner_ids)
+            self.written += written
+            self.flushes += 1
+            return written
+        except Exception:
+            db.rollback()
+            self.failed += len(latest)
+            logger.exception("Failed to write progress for %d tasks", len(latest))
+            return 0
+        finally:
+            db.close()
+
+# Create a singleton instance
+progress_coalescer = ProgressCoalescer()
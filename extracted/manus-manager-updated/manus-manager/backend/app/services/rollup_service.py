@@ -0,0 +1,366 @@
+from collections import defaultdict, namedtuple
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, Optional, Set, Tuple
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.quantiles import DurationSketch
+from app.models.models import Agent, Task, TaskRollup, TaskDurationSketch
+from app.schemas.schemas import TaskStatus
+
+ROLLUP_SCOPE_OWNER = "owner"
+ROLLUP_SCOPE_AGENT = "agent"
+
+# Statuses with a dedicated counter column on TaskRollup
+ROLLUP_STATUSES = [status.value for status in TaskStatus]
+
+COUNTER_COLUMNS = ["total_count", "completion_time_sum", "completion_time_count"] + [
+    f"{status}_count" for status in ROLLUP_STATUSES
+]
+
+# The parts of a task the rollups depend on
+TaskState = namedtuple(
+    "TaskState",
+    ["owner_id", "agent_id", "status", "priority", "completed_on", "completion_seconds"]
+)
+
+
+def _status_value(status) -> Optional[str]:
+    return getattr(status, "value", status)
+
+
+class RollupService:
+    """
+    Service for maintaining per-owner and per-agent task counters
+
+    Every write that creates, deletes or changes the owner, agent or status
+    of a task passes its before/after state to apply_task_change() before
+    committing, so the counters move in the same transaction as the task.
+    Completion times are also kept as per-day, per-priority quantile
+    sketches next to the counters.
+    """
+    def snapshot(self, task: Optional[Task]) -> Optional[TaskState]:
+        """
+        Capture the rollup-relevant state of a task
+        """
+        if task is None:
+            return None
+        return self._state(
+            task.owner_id, task.agent_id, task.status, task.priority, task.started_at, task.completed_at
+        )
+
+    def state(
+        self,
+        owner_id: Optional[int],
+        agent_id: Optional[int],
+        status,
+        priority: Optional[int],
+        started_at: Optional[datetime] = None,
+        completed_at: Optional[datetime] = None
+    ) -> TaskState:
+        """
+        Capture the rollup-relevant state of a task from its column values,
+        for bulk writes that don't load Task objects
+        """
+        return self._state(owner_id, agent_id, status, priority, started_at, completed_at)
+
+    def apply_task_change(
+        self,
+        db: Session,
+        before: Optional[TaskState],
+        after: Optional[TaskState]
+    ) -> None:
+        """
+        Move the counters from a task's previous state to its new state.
+        Pass before=None for a created task and after=None for a deleted one.
+        The caller owns the transaction and is expected to commit.
+        """
+        self.apply_task_changes(db, [(before, after)])
+
+    def apply_task_changes(
+        self,
+        db: Session,
+        changes: Iterable[Tuple[Optional[TaskState], Optional[TaskState]]]
+    ) -> None:
+        """
+        apply_task_change() for many tasks at once. The deltas are summed
+        first, so each affected rollup row is written once per call.
+        """
+        deltas: Dict[Tuple[str, int], Dict[str, float]] = defaultdict(lambda: defaultdict(int))
+        sketch_deltas: Dict[Tuple[str, int, int, date], DurationSketch] = {}
+        for before, after in changes:
+            if before == after:
+                continue
+            if before is not None:
+                self._accumulate(deltas, before, -1)
+            if after is not None:
+                self._accumulate(deltas, after, 1)
+            if self._sketch_entries(before) != self._sketch_entries(after):
+                self._accumulate_sketches(sketch_deltas, before, -1)
+                self._accumulate_sketches(sketch_deltas, after, 1)
+        self._apply_deltas(db, deltas)
+        if sketch_deltas:
+            self._apply_sketch_deltas(db, sketch_deltas)
+
+    def remove_agent(self, db: Session, *, agent_id: int) -> Set[int]:
+        """
+        Drop an agent's counters and subtract its tasks from their owners.
+        Must run before the agent (and its tasks, by cascade) is deleted.
+        Returns the ids of the owners whose counters changed.
+        """
+        rows = self._state_query(db).filter(Task.agent_id == agent_id)
+
+        owner_ids = set()
+        deltas: Dict[Tuple[str, int], Dict[str, float]] = defaultdict(lambda: defaultdict(int))
+        sketch_deltas: Dict[Tuple[str, int, int, date], DurationSketch] = {}
+        for state in self._states_from_rows(rows):
+            if state.owner_id is not None:
+                owner_ids.add(state.owner_id)
+                owner_state = state._replace(agent_id=None)
+                self._accumulate(deltas, owner_state, -1)
+                self._accumulate_sketches(sketch_deltas, owner_state, -1)
+        self._apply_deltas(db, deltas)
+        self._apply_sketch_deltas(db, sketch_deltas)
+
+        for model in (TaskRollup, TaskDurationSketch):
+            db.query(model).filter(
+                model.scope == ROLLUP_SCOPE_AGENT,
+                model.scope_id == agent_id
+            ).delete(synchronize_session=False)
+        return owner_ids
+
+    def remove_owner(self, db: Session, *, owner_id: int, agent_ids: Iterable[int]) -> Set[int]:
+        """
+        Drop all counters belonging to a user and their agents. Must run
+        before the user is deleted, which also deletes (by cascade) every
+        task on their agents and every task they own. Tasks on their agents
+        are subtracted from their owners as in remove_agent(), and their
+        tasks on other users' agents from those agents. Returns the ids of
+        the other users whose counters changed.
+        """
+        agent_ids = list(agent_ids)
+        owner_ids: Set[int] = set()
+        for agent_id in agent_ids:
+            owner_ids |= self.remove_agent(db, agent_id=agent_id)
+
+        rows = self._state_query(db).filter(Task.owner_id == owner_id, Task.agent_id.isnot(None))
+        if agent_ids:
+            rows = rows.filter(Task.agent_id.notin_(agent_ids))
+        deltas: Dict[Tuple[str, int], Dict[str, float]] = defaultdict(lambda: defaultdict(int))
+        sketch_deltas: Dict[Tuple[str, int, int, date], DurationSketch] = {}
+        for state in self._states_from_rows(rows):
+            agent_state = state._replace(owner_id=None)
+            self._accumulate(deltas, agent_state, -1)
+            self._accumulate_sketches(sketch_deltas, agent_state, -1)
+        self._apply_deltas(db, deltas)
+        self._apply_sketch_deltas(db, sketch_deltas)
+        other_agent_ids = [scope_id for _, scope_id in deltas]
+        if other_agent_ids:
+            owner_ids.update(row.owner_id for row in db.query(Agent.owner_id).filter(Agent.id.in_(other_agent_ids)))
+
+        for model in (TaskRollup, TaskDurationSketch):
+            db.query(model).filter(
+                model.scope == ROLLUP_SCOPE_OWNER,
+                model.scope_id == owner_id
+            ).delete(synchronize_session=False)
+        owner_ids.discard(owner_id)
+        return owner_ids
+
+    def get_rollup(self, db: Session, scope: str, scope_id: int) -> Optional[TaskRollup]:
+        """
+        Get the counters for a single owner or agent
+        """
+        return db.query(TaskRollup).filter(
+            TaskRollup.scope == scope,
+            TaskRollup.scope_id == scope_id
+        ).first()
+
+    def get_completion_sketches(
+        self,
+        db: Session,
+        scope: str,
+        scope_ids: Iterable[int],
+        *,
+        since: Optional[date] = None,
+        by_priority: bool = False
+    ) -> Dict[Any, DurationSketch]:
+        """
+        Merge the per-day completion time sketches for one or more owners or
+        agents, keyed by scope_id (or by (scope_id, priority) when by_priority)
+        """
+        query = db.query(TaskDurationSketch).filter(
+            TaskDurationSketch.scope == scope,
+            TaskDurationSketch.scope_id.in_(list(scope_ids))
+        )
+        if since:
+            query = query.filter(TaskDurationSketch.day >= since)
+
+        merged: Dict[Any, DurationSketch] = {}
+        for row in query:
+            key = (row.scope_id, row.priority) if by_priority else row.scope_id
+            if key not in merged:
+                merged[key] = DurationSketch()
+            merged[key].merge(self._load_sketch(row))
+        return merged
+
+    def rebuild(self, db: Session) -> int:
+        """
+        Recompute every rollup and sketch from the tasks table (backfill / repair)
+        """
+        deltas: Dict[Tuple[str, int], Dict[str, float]] = defaultdict(lambda: defaultdict(int))
+        sketch_deltas: Dict[Tuple[str, int, int, date], DurationSketch] = {}
+        for state in self._states_from_rows(self._state_query(db).yield_per(1000)):
+            self._accumulate(deltas, state, 1)
+            self._accumulate_sketches(sketch_deltas, state, 1)
+
+        db.query(TaskRollup).delete(synchronize_session=False)
+        db.query(TaskDurationSketch).delete(synchronize_session=False)
+        now = datetime.utcnow()
+        db.bulk_insert_mappings(TaskRollup, [
+            dict(self._empty_counters(), scope=scope, scope_id=scope_id, updated_at=now, **delta)
+            for (scope, scope_id), delta in deltas.items()
+        ])
+        db.bulk_insert_mappings(TaskDurationSketch, [
+            dict(
+                scope=scope, scope_id=scope_id, priority=priority, day=day,
+                count=sketch.count, sum=sketch.sum, zero_count=sketch.zero_count,
+                bins=sketch.to_json(), updated_at=now
+            )
+            for (scope, scope_id, priority, day), sketch in sketch_deltas.items()
+        ])
+        db.commit()
+        return len(deltas)
+
+    def _state_query(self, db: Session):
+        return db.query(
+            Task.owner_id, Task.agent_id, Task.status, Task.priority, Task.started_at, Task.completed_at
+        )
+
+    def _state(self, owner_id, agent_id, status, priority, started_at, completed_at) -> TaskState:
+        status = _status_value(status)
+        completed_on = None
+        completion_seconds = None
+        if status == TaskStatus.COMPLETED.value and started_at and completed_at:
+            completed_on = completed_at.date()
+            completion_seconds = (completed_at - started_at).total_seconds()
+        return TaskState(owner_id, agent_id, status, priority or 0, completed_on, completion_seconds)
+
+    def _states_from_rows(self, rows) -> Iterable[TaskState]:
+        for row in rows:
+            yield self._state(*row)
+
+    def _accumulate(self, deltas, state: TaskState, sign: int) -> None:
+        if state.owner_id is not None:
+            self._accumulate_scope(deltas[(ROLLUP_SCOPE_OWNER, state.owner_id)], state, sign)
+        if state.agent_id is not None:
+            self._accumulate_scope(deltas[(ROLLUP_SCOPE_AGENT, state.agent_id)], state, sign)
+
+    def _accumulate_scope(self, delta: Dict[str, float], state: TaskState, sign: int) -> None:
+        delta["total_count"] += sign
+        if state.status in ROLLUP_STATUSES:
+            delta[f"{state.status}_count"] += sign
+        if state.completion_seconds is not None:
+            delta["completion_time_sum"] += sign * state.completion_seconds
+            delta["completion_time_count"] += sign
+
+    def _sketch_entries(self, state: Optional[TaskState]):
+        if state is None or state.completion_seconds is None:
+            return []
+        entries = []
+        if state.owner_id is not None:
+            entries.append((ROLLUP_SCOPE_OWNER, state.owner_id))
+        if state.agent_id is not None:
+            entries.append((ROLLUP_SCOPE_AGENT, state.agent_id))
+        return [
+            ((scope, scope_id, state.priority, state.completed_on), state.completion_seconds)
+            for scope, scope_id in entries
+        ]
+
+    def _accumulate_sketches(self, sketch_deltas, state: Optional[TaskState], sign: int) -> None:
+        for key, value in self._sketch_entries(state):
+            if key not in sketch_deltas:
+                sketch_deltas[key] = DurationSketch()
+            sketch_deltas[key].add(value, sign)
+
+    def _apply_sketch_deltas(self, db: Session, sketch_deltas) -> None:
+        for (scope, scope_id, priority, day), delta in sketch_deltas.items():
+            if not (delta.count or delta.bins or delta.zero_count or delta.sum):
+                continue
+            row = self._get_or_create_sketch(db, scope, scope_id, priority, day)
+            sketch = self._load_sketch(row)
+            sketch.merge(delta)
+            row.count = sketch.count
+            row.sum = sketch.sum
+            row.zero_count = sketch.zero_count
+            row.bins = sketch.to_json()
+            row.updated_at = datetime.utcnow()
+            db.add(row)
+        db.flush()
+
+    def _load_sketch(self, row: TaskDurationSketch) -> DurationSketch:
+        sketch = DurationSketch()
+        sketch.load_bins(row.bins)
+        sketch.count = row.count or 0
+        sketch.sum = row.sum or 0.0
+        sketch.zero_count = row.zero_count or 0
+        return sketch
+
+    def _get_or_create_sketch(
+        self, db: Session, scope: str, scope_id: int, priority: int, day: date
+    ) -> TaskDurationSketch:
+        # Lock the row: the bins are merged in Python and written back
+        query = db.query(TaskDurationSketch).filter(
+            TaskDurationSketch.scope == scope,
+            TaskDurationSketch.scope_id == scope_id,
+            TaskDurationSketch.priority == priority,
+            TaskDurationSketch.day == day
+        ).with_for_update()
+        row = query.first()
+        if row:
+            return row
+        row = TaskDurationSketch(
+            scope=scope, scope_id=scope_id, priority=priority, day=day,
+            count=0, sum=0.0, zero_count=0, bins="{}"
+        )
+        try:
+            with db.begin_nested():
+                db.add(row)
+        except IntegrityError:
+            # Another transaction created the row first
+            row = query.first()
+        return row
+
+    def _empty_counters(self) -> Dict[str, float]:
+        return {column: 0 for column in COUNTER_COLUMNS}
+
+    def _apply_deltas(self, db: Session, deltas) -> None:
+        for (scope, scope_id), delta in deltas.items():
+            delta = {column: value for column, value in delta.items() if value}
+            if delta:
+                self._apply(db, scope, scope_id, delta)
+
+    def _apply(self, db: Session, scope: str, scope_id: int, delta: Dict[str, float]) -> None:
+        rollup = self._get_or_create(db, scope, scope_id)
+        # Increment in SQL so concurrent transactions don't lose updates
+        for column, value in delta.items():
+            setattr(rollup, column, getattr(TaskRollup, column) + value)
+        rollup.updated_at = datetime.utcnow()
+        db.add(rollup)
+        db.flush()
+
+    def _get_or_create(self, db: Session, scope: str, scope_id: int) -> TaskRollup:
+        rollup = self.get_rollup(db, scope, scope_id)
+        if rollup:
+            return rollup
+        rollup = TaskRollup(scope=scope, scope_id=scope_id, **self._empty_counters())
+        try:
+            with db.begin_nested():
+                db.add(rollup)
+        except IntegrityError:
+            # Another transaction created the row first
+            rollup = self.get_rollup(db, scope, scope_id)
+        return rollup
+
+# Create a singleton instance
+rollup_service = RollupService()
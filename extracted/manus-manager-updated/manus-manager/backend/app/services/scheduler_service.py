@@ -0,0 +1,333 @@
+import heapq
+import logging
+import os
+import threading
+import time
+from collections import defaultdict, namedtuple
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Set
+
+from sqlalchemy import and_, func, select, update
+from sqlalchemy.orm import Session
+
+from app.core.batching import chunked
+from app.core.quantiles import DurationSketch
+from app.models.models import Agent, Task, TaskRollup
+from app.schemas.schemas import AgentStatus, TaskStatus
+from app.services.analytics_cache import analytics_cache
+from app.services.lease_service import lease_service
+from app.services.progress_coalescer import progress_coalescer
+from app.services.rollup_service import rollup_service, ROLLUP_SCOPE_AGENT
+
+logger = logging.getLogger(__name__)
+
+# Scheduler settings
+SCHEDULER_INTERVAL_SECONDS = float(os.getenv("SCHEDULER_INTERVAL_SECONDS", "1.0"))
+# Waiting this long raises a task's effective priority by one level
+SCHEDULER_AGING_SECONDS = float(os.getenv("SCHEDULER_AGING_SECONDS", "300"))
+# How often the pending queue is rebuilt from the tasks table
+SCHEDULER_RESYNC_SECONDS = float(os.getenv("SCHEDULER_RESYNC_SECONDS", "60"))
+SCHEDULER_MAX_ASSIGNMENTS = int(os.getenv("SCHEDULER_MAX_ASSIGNMENTS", "1000"))
+
+# Postgres advisory lock held by the worker running a pass, so only one
+# process schedules at a time
+SCHEDULER_LOCK_KEY = 7350318
+
+# Agents that can take new tasks
+SCHEDULABLE_AGENT_STATUSES = (AgentStatus.IDLE.value, AgentStatus.RUNNING.value)
+
+_EPOCH = datetime(1970, 1, 1)
+
+QueuedTask = namedtuple("QueuedTask", ["key", "task_id", "owner_id", "priority", "created_at"])
+
+
+def aging_key(priority: Optional[int], created_at: datetime, aging_seconds: float = SCHEDULER_AGING_SECONDS) -> float:
+    """
+    Heap key for a pending task; smaller keys are scheduled first
+
+    A task's effective priority at time t is priority + (t - created_at) /
+    aging_seconds. Ordering tasks by that is the same at every t as ordering
+    by created_at / aging_seconds - priority, which never changes, so queued
+    tasks don't need re-keying as they age.
+    """
+    return (created_at - _EPOCH).total_seconds() / aging_seconds - (priority or 0)
+
+
+class TaskScheduler:
+    """
+    Assigns pending tasks to agents that have room for them
+
+    Pending, unassigned tasks are kept in a priority queue per owner, ordered
+    by aging_key(). Each pass loads the schedulable agents with their
+    in-flight counts (in_progress tasks, from the agent rollups), then hands
+    each owner's best task to that owner's least-utilized agent until the
+    agents are at max_tasks or the queue is empty. In-flight counts are kept
+    in memory between passes for the metrics.
+
+    Each pass first requeues tasks with expired leases (see LeaseService);
+    with assign_tasks off, that is all a pass does. API workers run passes
+    that way. Assignment runs in a process of its own,
+    `python manage.py schedule-tasks`, so a single runner assigns on every
+    backend; deployments whose agents pull work with /tasks/lease don't run
+    it, since pushed tasks carry no lease. On Postgres a pass also runs under
+    an advisory lock, so only one process sweeps or assigns at a time.
+    New tasks are picked up incrementally by id; the queue is rebuilt every
+    SCHEDULER_RESYNC_SECONDS, and after a requeue, to pick up priority
+    changes and tasks that went back to pending.
+    Assignments only apply to tasks that are still pending and unassigned,
+    so tasks assigned by hand in the meantime are skipped.
+    """
+    def __init__(
+        self,
+        aging_seconds: float = SCHEDULER_AGING_SECONDS,
+        interval: float = SCHEDULER_INTERVAL_SECONDS,
+        max_assignments: int = SCHEDULER_MAX_ASSIGNMENTS,
+        assign_tasks: bool = False,
+        timer: Callable[[], float] = time.monotonic
+    ):
+        self.assign_tasks = assign_tasks
+        self.aging_seconds = aging_seconds
+        self.interval = interval
+        self.max_assignments = max_assignments
+        self._timer = timer
+        self._lock = threading.Lock()
+        self._queues: Dict[int, List[QueuedTask]] = defaultdict(list)
+        self._queued: Set[int] = set()
+        self._agents_by_owner: Dict[int, List[int]] = {}
+        self._high_water = 0
+        self._synced_at: Optional[float] = None
+        self._session_factory: Optional[Callable[[], Session]] = None
+        self._thread: Optional[threading.Thread] = None
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._metrics_lock = threading.Lock()
+        self.inflight: Dict[int, int] = {}
+        self.capacity: Dict[int, int] = {}
+        self.assigned = 0
+        self.passes = 0
+        self.last_pass_ms: Optional[float] = None
+        self._latency = DurationSketch()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, session_factory: Callable[[], Session]) -> None:
+        """
+        Start scheduling on a background thread
+        """
+        if self.running:
+            return
+        self._session_factory = session_factory
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="task-scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """
+        Stop the background thread after its current pass
+        """
+        thread = self._thread
+        if thread is None:
+            return
+        self._stopping.set()
+        self._wakeup.set()
+        thread.join(timeout)
+        self._thread = None
+
+    def notify(self) -> None:
+        """
+        Run the next pass now instead of waiting out the interval
+        """
+        self._wakeup.set()
+
+    def resync(self) -> None:
+        """
+        Rebuild the pending queue from the tasks table on the next pass
+        """
+        self._synced_at = None
+
+    def run_once(self, db: Session) -> int:
+        """
+        Make one round of assignments, returning how many tasks were assigned
+        """
+        with self._lock:
+            start = time.perf_counter()
+            try:
+                if not self._try_lock(db):
+                    db.rollback()
+                    return 0
+                # Tasks whose agent stopped renewing its lease go back in the queue
+                if lease_service.requeue_expired(db):
+                    self.resync()
+                # The sweep ends its transactions, and the lock with them
+                if not self.assign_tasks or not self._try_lock(db):
+                    db.rollback()
+                    return 0
+                self._load_pending(db)
+                self._load_agents(db)
+                assigned = self._assign(db, self._plan())
+                db.commit()
+            except Exception:
+                db.rollback()
+                # Planned tasks were already taken off the queue
+                self.resync()
+                raise
+
+            owner_ids = {entry.owner_id for entry, _ in assigned}
+            analytics_cache.invalidate_user(*owner_ids, db=db)
+            now = datetime.utcnow()
+            with self._metrics_lock:
+                for entry, _ in assigned:
+                    self._latency.add(max((now - entry.created_at).total_seconds(), 0.0))
+                self.assigned += len(assigned)
+                self.passes += 1
+                self.last_pass_ms = (time.perf_counter() - start) * 1000
+            return len(assigned)
+
+    def _try_lock(self, db: Session) -> bool:
+        """
+        Take the scheduler's advisory lock for the current transaction,
+        returning False if another worker holds it (always True off Postgres)
+        """
+        if db.get_bind().dialect.name != "postgresql":
+            return True
+        return db.execute(select(func.pg_try_advisory_xact_lock(SCHEDULER_LOCK_KEY))).scalar()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Queue depth, assignment latency (seconds from creation to assignment)
+        and agent utilization as of the last pass
+        """
+        with self._metrics_lock:
+            capacity = sum(self.capacity.values())
+            inflight = sum(self.inflight.values())
+            return {
+                "running": self.running,
+                "assign_tasks": self.assign_tasks,
+                "queued": len(self._queued),
+                "assigned": self.assigned,
+                "passes": self.passes,
+                "last_pass_ms": self.last_pass_ms,
+                "assignment_latency_seconds": {
+                    **self._latency.percentiles(),
+                    "mean": self._latency.mean,
+                },
+                "agents": len(self.capacity),
+                "saturated_agents": sum(
+                    1 for agent_id, slots in self.capacity.items() if self.inflight.get(agent_id, 0) >= slots
+                ),
+                "in_flight": inflight,
+                "capacity": capacity,
+                "utilization": inflight / capacity if capacity else None,
+            }
+
+    def _run(self) -> None:
+        while not self._stopping.is_set():
+            db = self._session_factory()
+            try:
+                self.run_once(db)
+            except Exception:
+                logger.exception("Scheduler pass failed")
+            finally:
+                db.close()
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+
+    def _push(self, task_id: int, owner_id: int, priority: Optional[int], created_at: Optional[datetime]) -> None:
+        created_at = created_at or datetime.utcnow()
+        entry = QueuedTask(aging_key(priority, created_at, self.aging_seconds), task_id, owner_id, priority, created_at)
+        heapq.heappush(self._queues[owner_id], entry)
+        self._queued.add(task_id)
+
+    def _load_pending(self, db: Session) -> None:
+        if self._synced_at is None or self._timer() - self._synced_at >= SCHEDULER_RESYNC_SECONDS:
+            self._queues.clear()
+            self._queued.clear()
+            self._high_water = 0
+            self._synced_at = self._timer()
+
+        rows = db.query(Task.id, Task.owner_id, Task.priority, Task.created_at).filter(
+            Task.status == TaskStatus.PENDING.value,
+            Task.agent_id.is_(None),
+            Task.id > self._high_water
+        ).order_by(Task.id)
+        for task_id, owner_id, priority, created_at in rows.yield_per(1000):
+            self._push(task_id, owner_id, priority, created_at)
+            self._high_water = task_id
+
+    def _load_agents(self, db: Session) -> None:
+        rows = db.query(Agent.id, Agent.max_tasks, TaskRollup.in_progress_count, Agent.owner_id).outerjoin(
+            TaskRollup,
+            and_(TaskRollup.scope == ROLLUP_SCOPE_AGENT, TaskRollup.scope_id == Agent.id)
+        ).filter(Agent.status.in_(SCHEDULABLE_AGENT_STATUSES))
+
+        agents_by_owner: Dict[int, List[int]] = defaultdict(list)
+        capacity, inflight = {}, {}
+        for agent_id, max_tasks, in_progress, owner_id in rows:
+            capacity[agent_id] = max_tasks or 0
+            inflight[agent_id] = in_progress or 0
+            agents_by_owner[owner_id].append(agent_id)
+        self._agents_by_owner = agents_by_owner
+        with self._metrics_lock:
+            self.capacity, self.inflight = capacity, inflight
+
+    def _plan(self) -> Dict[int, List[QueuedTask]]:
+        """
+        Take tasks off the queues and pick an agent for each
+        """
+        plan: Dict[int, List[QueuedTask]] = defaultdict(list)
+        budget = self.max_assignments
+        for owner_id, queue in self._queues.items():
+            if budget <= 0:
+                break
+            agents = [
+                (self.inflight[agent_id] / self.capacity[agent_id], agent_id)
+                for agent_id in self._agents_by_owner.get(owner_id, ())
+                if self.inflight[agent_id] < self.capacity[agent_id]
+            ]
+            heapq.heapify(agents)
+            while queue and agents and budget > 0:
+                entry = heapq.heappop(queue)
+                self._queued.discard(entry.task_id)
+                _, agent_id = heapq.heappop(agents)
+                plan[agent_id].append(entry)
+                budget -= 1
+                with self._metrics_lock:
+                    self.inflight[agent_id] += 1
+                if self.inflight[agent_id] < self.capacity[agent_id]:
+                    heapq.heappush(agents, (self.inflight[agent_id] / self.capacity[agent_id], agent_id))
+        return plan
+
+    def _assign(self, db: Session, plan: Dict[int, List[QueuedTask]]) -> List[tuple]:
+        now = datetime.now()
+        pending = TaskStatus.PENDING.value
+        in_progress = TaskStatus.IN_PROGRESS.value
+        assigned = []
+        for agent_id, entries in plan.items():
+            by_id = {entry.task_id: entry for entry in entries}
+            for chunk in chunked(list(by_id)):
+                # Skips tasks that were assigned, started or deleted since they were queued
+                task_ids = db.execute(
+                    update(Task)
+                    .where(Task.id.in_(chunk), Task.status == pending, Task.agent_id.is_(None))
+                    .values(agent_id=agent_id, status=in_progress, started_at=now)
+                    .returning(Task.id)
+                    .execution_options(synchronize_session=False)
+                ).scalars().all()
+                progress_coalescer.discard_many(task_ids)
+                assigned.extend((by_id[task_id], agent_id) for task_id in task_ids)
+                with self._metrics_lock:
+                    self.inflight[agent_id] -= len(chunk) - len(task_ids)
+
+        rollup_service.apply_task_changes(db, [
+            (
+                rollup_service.state(entry.owner_id, None, pending, entry.priority),
+                rollup_service.state(entry.owner_id, agent_id, in_progress, entry.priority, now),
+            )
+            for entry, agent_id in assigned
+        ])
+        return assigned
+
+# Create a singleton instance, which sweeps leases in the API workers
+task_scheduler = TaskScheduler()
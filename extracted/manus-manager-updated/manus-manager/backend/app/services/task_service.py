@@ -1,11 +1,24 @@
-from typing import Any, Dict, List, Optional, Union
+import os
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Union
 from fastapi.encoders import jsonable_encoder
 from pydantic import BaseModel
+from sqlalchemy import case, insert
 from sqlalchemy.orm import Session
 from datetime import datetime
 
-from app.models.models import Task, TaskStatus
+from app.core.batching import chunked
+from app.core.pagination import Page, paginate
+from app.models.models import Task
+from app.schemas.schemas import TaskStatus
 from app.db.base_class import Base
+from app.db.updates import changed_values, update_returning
+from app.services.analytics_cache import analytics_cache
+from app.services.progress_coalescer import progress_coalescer
+from app.services.rollup_service import rollup_service
+
+# Most tasks accepted by one bulk create or bulk assign request
+TASK_BULK_MAX_ITEMS = int(os.getenv("TASK_BULK_MAX_ITEMS", "50000"))
 
 class TaskService:
     def create_task(self, db: Session, *, obj_in: Any) -> Task:
@@ -15,16 +28,52 @@ class TaskService:
         obj_in_data = jsonable_encoder(obj_in)
         db_obj = Task(**obj_in_data)
         db.add(db_obj)
+        db.flush()
+        rollup_service.apply_task_change(db, None, rollup_service.snapshot(db_obj))
         db.commit()
         db.refresh(db_obj)
+        analytics_cache.invalidate_user(db_obj.owner_id, db=db)
         return db_obj
 
+    def create_tasks(self, db: Session, *, objs_in: List[Any]) -> List[int]:
+        """
+        Create many tasks in one transaction, returning their ids in input order
+
+        The rows go in as a single multi-row INSERT ... RETURNING (batched by
+        the driver) and the rollups are updated once per owner and agent.
+        """
+        if not objs_in:
+            return []
+        now = datetime.utcnow()
+        rows = [
+            dict(obj_in.dict() if isinstance(obj_in, BaseModel) else obj_in, created_at=now)
+            for obj_in in objs_in
+        ]
+        ids = db.execute(insert(Task).returning(Task.id, sort_by_parameter_order=True), rows).scalars().all()
+        rollup_service.apply_task_changes(db, [
+            (None, rollup_service.state(row["owner_id"], row.get("agent_id"), row.get("status", TaskStatus.PENDING),
+                                        row.get("priority", 0)))
+            for row in rows
+        ])
+        db.commit()
+        analytics_cache.invalidate_user(*{row["owner_id"] for row in rows}, db=db)
+        return ids
+
     def get_task(self, db: Session, id: int) -> Optional[Task]:
         """
         Get task by ID
         """
         return db.query(Task).filter(Task.id == id).first()
 
+    def get_task_owners(self, db: Session, task_ids: Iterable[int]) -> Dict[int, int]:
+        """
+        Map task ids to their owner ids; missing tasks are left out
+        """
+        owners = {}
+        for chunk in chunked(list(task_ids)):
+            owners.update(db.query(Task.id, Task.owner_id).filter(Task.id.in_(chunk)).all())
+        return owners
+
     def get_tasks(
         self, 
         db: Session, 
@@ -33,19 +82,51 @@ class TaskService:
         limit: int = 100,
         status: Optional[str] = None,
         agent_id: Optional[int] = None,
-        owner_id: Optional[int] = None
+        owner_id: Optional[int] = None,
+        columns: Optional[Sequence[str]] = None
     ) -> List[Task]:
         """
-        Get multiple tasks with optional filtering
+        Get multiple tasks with optional filtering. With columns, returns
+        rows of just those columns instead of Tasks.
         """
-        query = db.query(Task)
+        query = self._tasks_query(db, status=status, agent_id=agent_id, owner_id=owner_id, columns=columns)
+        return query.offset(skip).limit(limit).all()
+
+    def get_tasks_page(
+        self,
+        db: Session,
+        *,
+        cursor: Optional[str] = None,
+        limit: int = 100,
+        status: Optional[str] = None,
+        agent_id: Optional[int] = None,
+        owner_id: Optional[int] = None,
+        columns: Optional[Sequence[str]] = None
+    ) -> Page:
+        """
+        Get a page of tasks ordered by id using keyset pagination. With
+        columns, the page holds rows of just those columns instead of Tasks.
+        """
+        query = self._tasks_query(db, status=status, agent_id=agent_id, owner_id=owner_id, columns=columns)
+        return paginate(query, sort_column=Task.id, id_column=Task.id, cursor=cursor, limit=limit)
+
+    def _tasks_query(
+        self,
+        db: Session,
+        *,
+        status: Optional[str] = None,
+        agent_id: Optional[int] = None,
+        owner_id: Optional[int] = None,
+        columns: Optional[Sequence[str]] = None
+    ):
+        query = db.query(*[getattr(Task, column) for column in columns]) if columns else db.query(Task)
         if status:
             query = query.filter(Task.status == status)
         if agent_id:
             query = query.filter(Task.agent_id == agent_id)
         if owner_id:
             query = query.filter(Task.owner_id == owner_id)
-        return query.offset(skip).limit(limit).all()
+        return query
 
     def update_task(
         self, 
@@ -57,25 +138,29 @@ class TaskService:
         """
         Update task
         """
-        obj_data = jsonable_encoder(db_obj)
+        before = rollup_service.snapshot(db_obj)
         if isinstance(obj_in, dict):
             update_data = obj_in
         else:
             update_data = obj_in.dict(exclude_unset=True)
-        for field in obj_data:
-            if field in update_data:
-                setattr(db_obj, field, update_data[field])
+        values = changed_values(db_obj, update_data)
         
         # Update timestamps based on status changes
-        if 'status' in update_data:
-            if update_data['status'] == TaskStatus.IN_PROGRESS and not db_obj.started_at:
-                db_obj.started_at = datetime.now()
-            elif update_data['status'] in [TaskStatus.COMPLETED, TaskStatus.FAILED] and not db_obj.completed_at:
-                db_obj.completed_at = datetime.now()
+        if 'status' in values:
+            if values['status'] == TaskStatus.IN_PROGRESS and not db_obj.started_at:
+                values['started_at'] = datetime.now()
+            elif values['status'] in [TaskStatus.COMPLETED, TaskStatus.FAILED] and not db_obj.completed_at:
+                values['completed_at'] = datetime.now()
+        if not values:
+            return db_obj
+        # Buffered progress older than this write mustn't overwrite it
+        if 'progress' in values or 'status' in values:
+            progress_coalescer.discard(db_obj.id)
         
-        db.add(db_obj)
+        db_obj = update_returning(db, db_obj, values)
+        rollup_service.apply_task_change(db, before, rollup_service.snapshot(db_obj))
         db.commit()
-        db.refresh(db_obj)
+        analytics_cache.invalidate_user(before.owner_id, db_obj.owner_id, db=db)
         return db_obj
 
     def delete_task(self, db: Session, *, id: int) -> Task:
@@ -83,31 +168,83 @@ class TaskService:
         Delete task
         """
         obj = db.query(Task).get(id)
+        before = rollup_service.snapshot(obj)
         db.delete(obj)
+        rollup_service.apply_task_change(db, before, None)
         db.commit()
+        analytics_cache.invalidate_user(before.owner_id, db=db)
         return obj
 
     def assign_task_to_agent(self, db: Session, *, task_id: int, agent_id: int) -> Task:
         """
         Assign task to agent
         """
-        task = db.query(Task).get(task_id)
+        task = db.get(Task, task_id)
         if not task:
             return None
+        before = rollup_service.snapshot(task)
         
         # Update task with agent_id
-        task.agent_id = agent_id
+        values = {"agent_id": agent_id}
         
         # If task was pending, set to in_progress
         if task.status == TaskStatus.PENDING:
-            task.status = TaskStatus.IN_PROGRESS
-            task.started_at = datetime.now()
+            values["status"] = TaskStatus.IN_PROGRESS.value
+            values["started_at"] = datetime.now()
+            progress_coalescer.discard(task_id)
         
-        db.add(task)
+        task = update_returning(db, task, values)
+        rollup_service.apply_task_change(db, before, rollup_service.snapshot(task))
         db.commit()
-        db.refresh(task)
+        analytics_cache.invalidate_user(task.owner_id, db=db)
         return task
 
+    def assign_tasks_to_agents(self, db: Session, *, assignments: Dict[int, int]) -> List[int]:
+        """
+        Assign many tasks (task id -> agent id) in one transaction, moving
+        pending tasks to in_progress as assign_task_to_agent() does. Returns
+        the ids of the tasks that were found, in input order.
+
+        Tasks are updated with one UPDATE per agent and id chunk rather than
+        one per task.
+        """
+        now = datetime.now()
+        pending = TaskStatus.PENDING.value
+        changes = []
+        task_ids_by_agent: Dict[int, List[int]] = defaultdict(list)
+        owner_ids = set()
+        found = set()
+        for chunk in chunked(list(assignments)):
+            # Lock the rows so the rollup deltas match what gets written
+            rows = db.query(
+                Task.id, Task.owner_id, Task.agent_id, Task.status, Task.priority, Task.started_at, Task.completed_at
+            ).filter(Task.id.in_(chunk)).with_for_update()
+            for task_id, owner_id, agent_id, status, priority, started_at, completed_at in rows:
+                before = rollup_service.state(owner_id, agent_id, status, priority, started_at, completed_at)
+                if status == pending:
+                    status, started_at = TaskStatus.IN_PROGRESS.value, now
+                    progress_coalescer.discard(task_id)
+                agent_id = assignments[task_id]
+                changes.append((
+                    before, rollup_service.state(owner_id, agent_id, status, priority, started_at, completed_at)
+                ))
+                task_ids_by_agent[agent_id].append(task_id)
+                owner_ids.add(owner_id)
+                found.add(task_id)
+
+        for agent_id, task_ids in task_ids_by_agent.items():
+            for chunk in chunked(task_ids):
+                # Both CASEs read the pre-update status
+                db.query(Task).filter(Task.id.in_(chunk)).update({
+                    Task.agent_id: agent_id,
+                    Task.started_at: case((Task.status == pending, now), else_=Task.started_at),
+                    Task.status: case((Task.status == pending, TaskStatus.IN_PROGRESS.value), else_=Task.status),
+                }, synchronize_session=False)
+        rollup_service.apply_task_changes(db, changes)
+        db.commit()
+        analytics_cache.invalidate_user(*owner_ids, db=db)
+        return [task_id for task_id in assignments if task_id in found]
+
 # Create a singleton instance
 task_service = TaskService()
 
@@ -115,9 +252,15 @@ task_service = TaskService()
 def create_task(db: Session, *, obj_in: Any) -> Task:
     return task_service.create_task(db=db, obj_in=obj_in)
 
+def create_tasks(db: Session, *, objs_in: List[Any]) -> List[int]:
+    return task_service.create_tasks(db=db, objs_in=objs_in)
+
 def get_task(db: Session, id: int) -> Optional[Task]:
     return task_service.get_task(db=db, id=id)
 
+def get_task_owners(db: Session, task_ids: Iterable[int]) -> Dict[int, int]:
+    return task_service.get_task_owners(db=db, task_ids=task_ids)
+
 def get_tasks(
     db: Session, 
     *, 
@@ -125,11 +268,27 @@ def get_tasks(
     limit: int = 100,
     status: Optional[str] = None,
     agent_id: Optional[int] = None,
-    owner_id: Optional[int] = None
+    owner_id: Optional[int] = None,
+    columns: Optional[Sequence[str]] = None
 ) -> List[Task]:
     return task_service.get_tasks(
         db=db, skip=skip, limit=limit, status=status, 
-        agent_id=agent_id, owner_id=owner_id
+        agent_id=agent_id, owner_id=owner_id, columns=columns
+    )
+
+def get_tasks_page(
+    db: Session, 
+    *, 
+    cursor: Optional[str] = None, 
+    limit: int = 100,
+    status: Optional[str] = None,
+    agent_id: Optional[int] = None,
+    owner_id: Optional[int] = None,
+    columns: Optional[Sequence[str]] = None
+) -> Page:
+    return task_service.get_tasks_page(
+        db=db, cursor=cursor, limit=limit, status=status, 
+        agent_id=agent_id, owner_id=owner_id, columns=columns
     )
 
 def update_task(
@@ -145,3 +304,6 @@ def delete_task(db: Session, *, id: int) -> Task:
 
 def assign_task_to_agent(db: Session, *, task_id: int, agent_id: int) -> Task:
     return task_service.assign_task_to_agent(db=db, task_id=task_id, agent_id=agent_id)
+
+def assign_tasks_to_agents(db: Session, *, assignments: Dict[int, int]) -> List[int]:
+    return task_service.assign_tasks_to_agents(db=db, assignments=assignments)
@@ -0,0 +1,97 @@
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import Integer, cast, func
+from sqlalchemy.orm import Session
+
+from app.models.models import Agent, AgentLog, Task
+from app.schemas.schemas import AgentStatus, TaskStatus
+
+# Metric name -> (timestamp column, extra filters)
+TIMESERIES_METRICS: Dict[str, Tuple] = {
+    "tasks_started": (Task.started_at, ()),
+    "tasks_completed": (Task.completed_at, (Task.status == TaskStatus.COMPLETED.value,)),
+    "tasks_failed": (Task.completed_at, (Task.status == TaskStatus.FAILED.value,)),
+    "agent_logs": (AgentLog.timestamp, ()),
+    # Agent status changes are logged with the new status
+    "agent_starts": (AgentLog.timestamp, (AgentLog.status == AgentStatus.RUNNING.value,)),
+}
+
+# Clock each table's timestamps are written with: task start and completion
+# times are local time (datetime.now()), log timestamps are UTC
+METRIC_CLOCKS: Dict[type, Callable[[], datetime]] = {
+    Task: datetime.now,
+    AgentLog: datetime.utcnow,
+}
+
+# Upper bound on buckets per request
+MAX_BUCKETS = 10000
+
+# Buckets are counted from here, in the same naive clock as the timestamps
+EPOCH = datetime(1970, 1, 1)
+
+
+class TimeseriesService:
+    """
+    Service for bucketed event counts over a time range
+    """
+    def now(self, metric: str) -> datetime:
+        """
+        The current time on the clock metric's timestamps are written with
+        """
+        column, _ = TIMESERIES_METRICS[metric]
+        return METRIC_CLOCKS[column.class_]()
+
+    def bucket_end(self, metric: str, bucket_seconds: int) -> datetime:
+        """
+        End of the bucket the current time falls in, on the metric's clock
+        """
+        elapsed = (self.now(metric) - EPOCH).total_seconds()
+        return EPOCH + timedelta(seconds=(elapsed // bucket_seconds + 1) * bucket_seconds)
+
+    def bucket_counts(
+        self,
+        db: Session,
+        *,
+        metric: str,
+        bucket_seconds: int,
+        start: datetime,
+        end: datetime,
+        owner_id: Optional[int] = None,
+        agent_id: Optional[int] = None
+    ) -> Tuple[List[int], List[int]]:
+        """
+        Count events per bucket in [start, end). Returns parallel lists of
+        bucket start times (epoch seconds) and counts, skipping empty buckets.
+        """
+        column, filters = TIMESERIES_METRICS[metric]
+        bucket = self._bucket_expression(db, column, bucket_seconds).label("bucket")
+
+        query = db.query(bucket, func.count().label("count")).filter(
+            column >= start, column < end, *filters
+        )
+        if column.class_ is Task:
+            if owner_id is not None:
+                query = query.filter(Task.owner_id == owner_id)
+            if agent_id is not None:
+                query = query.filter(Task.agent_id == agent_id)
+        else:
+            if agent_id is not None:
+                query = query.filter(AgentLog.agent_id == agent_id)
+            elif owner_id is not None:
+                owned_agents = db.query(Agent.id).filter(Agent.owner_id == owner_id)
+                query = query.filter(AgentLog.agent_id.in_(owned_agents.scalar_subquery()))
+
+        rows = query.group_by(bucket).order_by(bucket).all()
+        timestamps = [int(row.bucket) * bucket_seconds for row in rows]
+        counts = [row.count for row in rows]
+        return timestamps, counts
+
+    def _bucket_expression(self, db: Session, column, bucket_seconds: int):
+        if db.get_bind().dialect.name == "postgresql":
+            return func.floor(func.extract("epoch", column) / bucket_seconds)
+        # SQLite: integer division of the unix timestamp
+        return cast(func.strftime("%s", column), Integer) // bucket_seconds
+
+# Create a singleton instance
+timeseries_service = TimeseriesService()
@@ -0,0 +1,60 @@
+import os
+from typing import Dict, Optional
+
+from sqlalchemy import inspect
+from sqlalchemy.orm import make_transient_to_detached
+
+from app.core.cache import TTLCache
+from app.models.models import User
+
+# User cache settings
+USER_CACHE_TTL_SECONDS = float(os.getenv("USER_CACHE_TTL_SECONDS", "30"))
+USER_CACHE_MAX_ENTRIES = int(os.getenv("USER_CACHE_MAX_ENTRIES", "10000"))
+
+
+class UserCache:
+    """
+    Process-local cache of authenticated users, keyed by user id
+
+    Entries are detached copies of the user's columns, shared by every
+    request that authenticates as the user until they expire or are evicted.
+    Services call invalidate() after committing a change to a user. With
+    several workers a change made through one worker reaches the others
+    through the TTL, or sooner when the change bumps the user's
+    token_version: tokens carry the version they were issued at, and a token
+    newer than the cached copy forces a reload.
+    """
+    def __init__(self, maxsize: int = USER_CACHE_MAX_ENTRIES, ttl: float = USER_CACHE_TTL_SECONDS):
+        self._entries = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id: int) -> Optional[User]:
+        user = self._entries.get(user_id)
+        if user is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return user
+
+    def set(self, user: User) -> User:
+        """
+        Cache a copy of user's column values, returning the copy
+        """
+        copy = User(**{column: getattr(user, column) for column in inspect(User).columns.keys()})
+        make_transient_to_detached(copy)
+        self._entries.set(copy.id, copy)
+        return copy
+
+    def invalidate(self, *user_ids: int) -> None:
+        for user_id in user_ids:
+            self._entries.pop(user_id)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+# Create a singleton instance
+user_cache = UserCache()
@@ -3,16 +3,25 @@ from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
 from pydantic import ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from datetime import datetime
 
+from app.core.pagination import Page, paginate
 from app.core.security import verify_password, get_password_hash, SECRET_KEY, ALGORITHM
-from app.db.session import get_db
+from app.db.session import get_async_db
+from app.db.updates import changed_values, update_returning
 from app.models.models import User
 from app.schemas.schemas import TokenPayload, UserCreate, UserUpdate
+from app.services.analytics_cache import analytics_cache
+from app.services.rollup_service import rollup_service
+from app.services.user_cache import user_cache
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
+# Changes that revoke the tokens issued before them
+TOKEN_REVOKING_FIELDS = ("hashed_password", "is_active", "is_superuser")
+
 class UserService:
     def get_user(self, db: Session, *, id: Optional[int] = None, email: Optional[str] = None) -> Optional[User]:
         """
@@ -30,16 +39,26 @@ class UserService:
         """
         return db.query(User).offset(skip).limit(limit).all()
 
-    def create_user(self, db: Session, *, obj_in: UserCreate) -> User:
+    def get_users_page(self, db: Session, *, cursor: Optional[str] = None, limit: int = 100) -> Page:
+        """
+        Get a page of users ordered by id using keyset pagination
+        """
+        return paginate(db.query(User), sort_column=User.id, id_column=User.id, cursor=cursor, limit=limit)
+
+    def create_user(self, db: Session, *, obj_in: UserCreate, hashed_password: Optional[str] = None) -> User:
         """
-        Create new user
+        Create new user. Async callers pass hashed_password, hashed with
+        password_hasher, so bcrypt doesn't run on the event loop.
         """
         db_obj = User(
             email=obj_in.email,
             username=obj_in.username,
-            hashed_password=get_password_hash(obj_in.password),
+            hashed_password=hashed_password or get_password_hash(obj_in.password),
             is_active=obj_in.is_active,
             is_superuser=obj_in.is_superuser,
+            full_name=obj_in.full_name,
+            profile_picture=obj_in.profile_picture,
+            google_id=obj_in.google_id,
         )
         db.add(db_obj)
         db.commit()
@@ -48,7 +67,8 @@ class UserService:
 
     def update_user(self, db: Session, *, db_obj: User, obj_in: Union[UserUpdate, Dict[str, Any]]) -> User:
         """
-        Update user
+        Update user. A new password may be given already hashed, as
+        hashed_password.
         """
         if isinstance(obj_in, dict):
             update_data = obj_in
@@ -60,13 +80,14 @@ class UserService:
             del update_data["password"]
             update_data["hashed_password"] = hashed_password
         
-        for field in update_data:
-            if field in update_data:
-                setattr(db_obj, field, update_data[field])
-        
-        db.add(db_obj)
+        values = changed_values(db_obj, update_data)
+        if not values:
+            return db_obj
+        if any(field in values for field in TOKEN_REVOKING_FIELDS):
+            values["token_version"] = User.token_version + 1
+        db_obj = update_returning(db, db_obj, values)
         db.commit()
-        db.refresh(db_obj)
+        user_cache.invalidate(db_obj.id)
         return db_obj
 
     def delete_user(self, db: Session, *, id: int) -> User:
@@ -74,8 +95,11 @@ class UserService:
         Delete user
         """
         user = db.query(User).get(id)
+        other_owner_ids = rollup_service.remove_owner(db, owner_id=id, agent_ids=[agent.id for agent in user.agents])
         db.delete(user)
         db.commit()
+        user_cache.invalidate(id)
+        analytics_cache.invalidate_user(id, *other_owner_ids, db=db)
         return user
 
     def authenticate_user(self, db: Session, *, username: str, password: str) -> Optional[User]:
@@ -89,25 +113,41 @@ class UserService:
             return None
         return user
 
-    async def get_current_user(self, db: Session = Depends(get_db), token: str = Depends(oauth2_scheme)) -> User:
+    async def get_current_user(self, db: AsyncSession = Depends(get_async_db), token: str = Depends(oauth2_scheme)) -> User:
         """
         Get current user from JWT token
+
+        Users are served from user_cache when possible, so most requests
+        authenticate without a query. A token issued before the user's
+        token_version was bumped is rejected.
         """
         try:
             payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
             token_data = TokenPayload(**payload)
-        except (JWTError, ValidationError):
+            user_id = int(token_data.sub)
+        except (JWTError, ValidationError, TypeError, ValueError):
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="Could not validate credentials",
             )
         
-        user = self.get_user(db, id=token_data.sub)
+        user = user_cache.get(user_id)
+        # A token newer than the cached copy means the user changed in another worker
+        if user is None or user.token_version < token_data.ver:
+            user = await db.run_sync(self.get_user, id=user_id)
+            if user:
+                user_cache.set(user)
         if not user:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="User not found",
             )
+        if token_data.ver != user.token_version:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Token has been revoked",
+                headers={"WWW-Authenticate": "Bearer"},
+            )
         return user
 
     async def get_current_active_user(self, current_user: User = Depends(get_current_user)) -> User:
@@ -139,11 +179,17 @@ user_service = UserService()
 def get_user(db: Session, *, id: Optional[int] = None, email: Optional[str] = None) -> Optional[User]:
     return user_service.get_user(db=db, id=id, email=email)
 
+def get_user_by_email(db: Session, *, email: str) -> Optional[User]:
+    return user_service.get_user(db=db, email=email)
+
 def get_users(db: Session, *, skip: int = 0, limit: int = 100) -> List[User]:
     return user_service.get_users(db=db, skip=skip, limit=limit)
 
-def create_user(db: Session, *, obj_in: UserCreate) -> User:
-    return user_service.create_user(db=db, obj_in=obj_in)
+def get_users_page(db: Session, *, cursor: Optional[str] = None, limit: int = 100) -> Page:
+    return user_service.get_users_page(db=db, cursor=cursor, limit=limit)
+
+def create_user(db: Session, *, obj_in: UserCreate, hashed_password: Optional[str] = None) -> User:
+    return user_service.create_user(db=db, obj_in=obj_in, hashed_password=hashed_password)
 
 def update_user(db: Session, *, db_obj: User, obj_in: Union[UserUpdate, Dict[str, Any]]) -> User:
     return user_service.update_user(db=db, db_obj=db_obj, obj_in=obj_in)
@@ -154,7 +200,13 @@ def delete_user(db: Session, *, id: int) -> User:
 def authenticate_user(db: Session, username: str, password: str) -> Optional[User]:
     return user_service.authenticate_user(db=db, username=username, password=password)
 
-# Export dependency functions
+# Export dependency functions. The checks below depend on this
+# get_current_user, not on the unbound method the class body refers to,
+# which FastAPI would resolve with `self` as a required query parameter.
 get_current_user = user_service.get_current_user
-get_current_active_user = user_service.get_current_active_user
-get_current_active_superuser = user_service.get_current_active_superuser
+
+async def get_current_active_user(current_user: User = Depends(get_current_user)) -> User:
+    return await user_service.get_current_active_user(current_user=current_user)
+
+async def get_current_active_superuser(current_user: User = Depends(get_current_user)) -> User:
+    return await user_service.get_current_active_superuser(current_user=current_user)
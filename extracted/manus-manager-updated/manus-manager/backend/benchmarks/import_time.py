@@ -0,0 +1,101 @@
+"""
+Cold-start import time per module
+
+Imports each module in a fresh interpreter with `python -X importtime` and
+reports the median cumulative import time over several runs, plus its
+heaviest direct imports. Run from the backend directory:
+
+    python benchmarks/import_time.py
+    python benchmarks/import_time.py app.core.security --repeat 10 --top 5
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_MODULES = [
+    "app.core.security",
+    "app.core.google_certs",
+    "app.db.session",
+    "app.services.user_service",
+    "app.services.task_service",
+    "app.api.endpoints.metrics",
+    "app.main",
+]
+
+
+def import_times(module: str) -> Dict[str, int]:
+    """
+    Cumulative import time in microseconds of module and of each of its
+    direct imports, from one cold interpreter
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND_DIR,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    # Lines come out as each import finishes, so the module's own imports are
+    # the nested lines right before it
+    entries = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if cumulative.strip().isdigit():
+            depth = (len(name) - len(name.lstrip()) - 1) // 2
+            entries.append((depth, name.strip(), int(cumulative)))
+    times = {}
+    for depth, name, cumulative in reversed(entries):
+        if depth == 0:
+            if times:
+                break
+            if name == module:
+                times[name] = cumulative
+        elif times and depth == 1:
+            times[name] = cumulative
+    return times
+
+
+def measure(module: str, repeat: int) -> Tuple[float, List[Tuple[str, float]]]:
+    """
+    Median import time of module in milliseconds, and the median time of
+    each module it imports directly
+    """
+    runs: Dict[str, List[int]] = defaultdict(list)
+    for _ in range(repeat):
+        for name, cumulative in import_times(module).items():
+            runs[name].append(cumulative)
+    medians = {name: statistics.median(values) / 1000 for name, values in runs.items()}
+    total = medians.pop(module)
+    return total, sorted(medians.items(), key=lambda item: item[1], reverse=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("modules", nargs="*", default=DEFAULT_MODULES)
+    parser.add_argument("--repeat", type=int, default=5, help="Cold imports per module (default: 5)")
+    parser.add_argument("--top", type=int, default=3, help="Heaviest direct imports to list per module (default: 3)")
+    args = parser.parse_args()
+
+    print(f"{'module':<32} {'import ms':>10}")
+    for module in args.modules:
+        try:
+            total, heaviest = measure(module, args.repeat)
+        except RuntimeError as exc:
+            print(f"{module:<32} {'failed':>10}  {exc}")
+            continue
+        print(f"{module:<32} {total:>10.1f}")
+        for name, millis in heaviest[:args.top]:
+            print(f"  {name:<30} {millis:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+List page serialization: response_model path vs the fast JSON path
+
+Times one page of tasks end to end (query plus encoding to bytes) both ways
+against an in-memory SQLite database:
+
+- response_model: ORM Task objects, validated into TaskResponse by FastAPI
+  and encoded with jsonable_encoder and json.dumps
+- fast: rows of the TaskResponse columns, encoded with app.core.fast_json
+
+Run from the backend directory:
+
+    python benchmarks/serialization.py
+    python benchmarks/serialization.py --rows 1000 --repeat 50
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import Callable, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.core import fast_json
+from app.core.fast_json import dumps_rows, response_columns
+from app.models.models import Base, Task, User
+from app.schemas.schemas import TaskResponse
+from app.services.task_service import get_tasks_page
+
+TASK_COLUMNS = response_columns(TaskResponse)
+TASK_LIST_FIELD = create_response_field(name="tasks", type_=List[TaskResponse])
+
+
+def setup(rows: int) -> sessionmaker:
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    db = SessionLocal()
+    user = User(username="bench", email="bench@example.com")
+    db.add(user)
+    db.commit()
+    start = datetime(2026, 1, 1)
+    db.execute(insert(Task), [
+        {
+            "title": f"Task {i}",
+            "description": "Benchmark task " * 8,
+            "status": "pending",
+            "priority": i % 5,
+            "progress": (i % 100) / 3,
+            "owner_id": user.id,
+            "created_at": start + timedelta(seconds=i),
+            "updated_at": start + timedelta(seconds=i, microseconds=123),
+        }
+        for i in range(rows)
+    ])
+    db.commit()
+    db.close()
+    return SessionLocal
+
+
+def response_model_page(SessionLocal: sessionmaker, rows: int) -> bytes:
+    db = SessionLocal()
+    try:
+        page = get_tasks_page(db, limit=rows)
+        content = asyncio.run(serialize_response(field=TASK_LIST_FIELD, response_content=page.items))
+        return JSONResponse(content).body
+    finally:
+        db.close()
+
+
+def fast_page(SessionLocal: sessionmaker, rows: int) -> bytes:
+    db = SessionLocal()
+    try:
+        page = get_tasks_page(db, limit=rows, columns=TASK_COLUMNS)
+        return dumps_rows(TASK_COLUMNS, page.items)
+    finally:
+        db.close()
+
+
+def time_ms(fn: Callable[[], bytes], repeat: int) -> float:
+    fn()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1000, help="Tasks per page (default: 1000)")
+    parser.add_argument("--repeat", type=int, default=20, help="Timed runs per path (default: 20)")
+    args = parser.parse_args()
+
+    SessionLocal = setup(args.rows)
+    slow = time_ms(lambda: response_model_page(SessionLocal, args.rows), args.repeat)
+    fast = time_ms(lambda: fast_page(SessionLocal, args.rows), args.repeat)
+    encoder = "orjson" if fast_json.orjson is not None else "json"
+    print(f"{args.rows} tasks per page, median of {args.repeat} runs")
+    print(f"  response_model     {slow:8.2f} ms")
+    print(f"  fast ({encoder:<6})      {fast:8.2f} ms  ({slow / fast:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
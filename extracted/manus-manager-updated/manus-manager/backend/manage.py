@@ -0,0 +1,176 @@
+"""
+Management commands for the Manus Manager backend
+
+Usage:
+    python manage.py init-db
+    python manage.py rebuild-rollups
+    python manage.py prune-logs [--retention-days N]
+    python manage.py requeue-leases
+    python manage.py schedule-tasks
+"""
+import argparse
+import os
+import signal
+import sys
+import time
+
+from app.db.session import SessionLocal
+
+
+def init_db(args):
+    """
+    Create or upgrade the database schema by running the migrations
+
+    A database whose tables were created with Base.metadata.create_all
+    (before migrations, or with DB_CREATE_ALL_ON_STARTUP) has no
+    alembic_version; it is stamped at the revision its schema matches first.
+    Then the upcoming log partitions are created; prune-logs keeps them
+    coming after that.
+    """
+    from alembic import command
+    from alembic.config import Config
+    from alembic.migration import MigrationContext
+    from alembic.script import ScriptDirectory
+
+    from app.db.schema import UnrecognizedSchemaError, unversioned_revision
+    from app.db.session import engine
+    from app.services.log_retention_service import log_retention_service
+
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    config = Config(os.path.join(base_dir, "alembic.ini"))
+    config.set_main_option("script_location", os.path.join(base_dir, "alembic"))
+
+    with engine.connect() as connection:
+        revision = None
+        if MigrationContext.configure(connection).get_current_revision() is None:
+            head = ScriptDirectory.from_config(config).get_current_head()
+            try:
+                revision = unversioned_revision(connection, head)
+            except UnrecognizedSchemaError as e:
+                sys.exit(str(e))
+    if revision is not None:
+        command.stamp(config, revision)
+        print(f"Stamped the existing schema at revision {revision}")
+    command.upgrade(config, "head")
+    print("Database schema is up to date")
+
+    db = SessionLocal()
+    try:
+        created = log_retention_service.ensure_partitions(db)
+    finally:
+        db.close()
+    print(f"Created {created} log partitions")
+
+
+def rebuild_rollups(args):
+    """
+    Recompute the per-owner and per-agent task rollups and sketches from the tasks table
+    """
+    from app.services.rollup_service import rollup_service
+
+    db = SessionLocal()
+    try:
+        count = rollup_service.rebuild(db)
+    finally:
+        db.close()
+    print(f"Rebuilt {count} task rollups")
+
+
+def prune_logs(args):
+    """
+    Create upcoming log partitions, then roll up and remove logs past the retention window
+    """
+    from app.services.log_retention_service import log_retention_service
+
+    db = SessionLocal()
+    try:
+        created = log_retention_service.ensure_partitions(db)
+        result = log_retention_service.prune(db, retention_days=args.retention_days)
+    finally:
+        db.close()
+    print(
+        f"Created {created} log partitions, dropped {result['partitions_dropped']} "
+        f"and deleted {result['rows_deleted']} expired log rows"
+    )
+
+
+def requeue_leases(args):
+    """
+    Put tasks whose lease has expired back to pending
+    """
+    from app.services.lease_service import lease_service
+
+    db = SessionLocal()
+    try:
+        count = lease_service.requeue_expired(db)
+    finally:
+        db.close()
+    print(f"Requeued {count} tasks with expired leases")
+
+
+def schedule_tasks(args):
+    """
+    Assign pending tasks to agents until interrupted
+
+    Run a single instance. On Postgres an advisory lock also keeps a second
+    one from assigning; on SQLite nothing does.
+    """
+    from app.services.scheduler_service import TaskScheduler
+
+    scheduler = TaskScheduler(assign_tasks=True)
+    # Stop after the current pass on `docker stop` as on Ctrl+C
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    scheduler.start(SessionLocal)
+    print("Scheduling pending tasks; press Ctrl+C to stop")
+    try:
+        while scheduler.running:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        scheduler.stop()
+    print(f"Assigned {scheduler.assigned} tasks")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manus Manager management commands")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    init_parser = subparsers.add_parser(
+        "init-db", help="Create or upgrade the database schema (run before starting the API)"
+    )
+    init_parser.set_defaults(func=init_db)
+
+    rebuild_parser = subparsers.add_parser(
+        "rebuild-rollups", help="Backfill task rollup counters and completion time sketches from existing tasks"
+    )
+    rebuild_parser.set_defaults(func=rebuild_rollups)
+
+    from app.services.log_retention_service import LOG_RETENTION_DAYS
+
+    prune_parser = subparsers.add_parser(
+        "prune-logs", help="Maintain daily log partitions and expire logs older than the retention window (run daily)"
+    )
+    prune_parser.add_argument(
+        "--retention-days", type=int, default=LOG_RETENTION_DAYS,
+        help=f"Days of logs to keep (default: LOG_RETENTION_DAYS, {LOG_RETENTION_DAYS})"
+    )
+    prune_parser.set_defaults(func=prune_logs)
+
+    requeue_parser = subparsers.add_parser(
+        "requeue-leases", help="Requeue tasks with expired leases (the scheduler also does this on every pass)"
+    )
+    requeue_parser.set_defaults(func=requeue_leases)
+
+    schedule_parser = subparsers.add_parser(
+        "schedule-tasks",
+        help="Assign pending tasks to agents continuously (run one instance; not for agents using /tasks/lease)"
+    )
+    schedule_parser.set_defaults(func=schedule_tasks)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
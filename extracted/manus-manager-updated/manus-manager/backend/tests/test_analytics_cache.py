@@ -0,0 +1,67 @@
+import asyncio
+
+from app.core.cache import TTLCache
+from app.services.analytics_cache import AnalyticsCache
+
+# Test LRU eviction and TTL expiry
+def test_ttl_cache_evicts_and_expires():
+    now = [0.0]
+    cache = TTLCache(maxsize=2, ttl=10, timer=lambda: now[0])
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+
+    now[0] = 11
+    assert cache.get("a") is None
+    assert len(cache) == 1
+
+# Test a user's entries are recomputed after invalidation
+def test_invalidate_user_bumps_version():
+    cache = AnalyticsCache(maxsize=16, ttl=60)
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return len(calls)
+
+    async def scenario():
+        first = await cache.get_or_compute(1, "dashboard", (), compute)
+        cached = await cache.get_or_compute(1, "dashboard", (), compute)
+        other_user = await cache.get_or_compute(2, "dashboard", (), compute)
+        cache.invalidate_user(1)
+        fresh = await cache.get_or_compute(1, "dashboard", (), compute)
+        return first, cached, other_user, fresh
+
+    assert asyncio.run(scenario()) == (1, 1, 2, 3)
+
+# Test concurrent identical requests share one computation
+def test_concurrent_requests_share_computation():
+    cache = AnalyticsCache(maxsize=16, ttl=60)
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "stats"
+
+    async def scenario():
+        return await asyncio.gather(*[
+            cache.get_or_compute(1, "tasks/stats", (None,), compute) for _ in range(5)
+        ])
+
+    assert asyncio.run(scenario()) == ["stats"] * 5
+    assert len(calls) == 1
+
+# Test writes pin a user to the primary only until their marker expires
+def test_write_markers_expire():
+    cache = AnalyticsCache(maxsize=16, ttl=60, write_marker_ttl=60)
+    cache.invalidate_user(1)
+    assert cache.recently_written(1)
+    assert not cache.recently_written(2)
+
+    expired = AnalyticsCache(maxsize=16, ttl=60, write_marker_ttl=0)
+    expired.invalidate_user(1)
+    assert not expired.recently_written(1)
@@ -1,11 +1,12 @@
 import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import StaticPool
 
 from app.main import app
-from app.db.session import get_db
+from app.db.session import get_db, get_async_db
 from app.models.models import Base
 from app.core.security import create_access_token
 from app.schemas.schemas import UserCreate, User
@@ -32,6 +33,16 @@ def override_get_db():
 
 app.dependency_overrides[get_db] = override_get_db
 
+# Override get_async_db dependency with the same database
+async_engine = create_async_engine("sqlite+aiosqlite:///./test.db")
+TestingAsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+async def override_get_async_db():
+    async with TestingAsyncSessionLocal() as db:
+        yield db
+
+app.dependency_overrides[get_async_db] = override_get_async_db
+
 # Create test client
 client = TestClient(app)
 
@@ -0,0 +1,41 @@
+import asyncio
+
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.db.session import to_async_url
+from app.models.models import Base, User, Agent
+from app.services import agent_service, task_service
+from app.services.rollup_service import rollup_service, ROLLUP_SCOPE_OWNER
+
+# Test database URLs map to their asyncio drivers
+def test_to_async_url():
+    assert to_async_url("postgresql://u:p@db/manus") == "postgresql+asyncpg://u:p@db/manus"
+    assert to_async_url("postgresql+psycopg2://u:p@db/manus") == "postgresql+asyncpg://u:p@db/manus"
+    assert to_async_url("sqlite:///./app.db") == "sqlite+aiosqlite:///./app.db"
+
+# Test sync services run on an async session and results stay usable after commit
+def test_services_run_on_async_session(tmp_path):
+    async def scenario():
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/async.db")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        AsyncTestingSessionLocal = async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
+
+        async with AsyncTestingSessionLocal() as db:
+            user = User(username="async", email="async@example.com")
+            db.add(user)
+            await db.commit()
+            agent = await db.run_sync(agent_service.create_agent, obj_in={"name": "Agent", "owner_id": user.id})
+            task = await db.run_sync(
+                task_service.create_task,
+                obj_in={"title": "Task", "owner_id": user.id, "agent_id": agent.id, "status": "pending"}
+            )
+
+            # Attributes are read outside the sync context, after the commit
+            assert task.title == "Task" and task.agent_id == agent.id
+            assert (await db.get(Agent, agent.id)).name == "Agent"
+            rollup = await db.run_sync(rollup_service.get_rollup, ROLLUP_SCOPE_OWNER, user.id)
+            assert rollup.pending_count == 1
+        await engine.dispose()
+
+    asyncio.run(scenario())
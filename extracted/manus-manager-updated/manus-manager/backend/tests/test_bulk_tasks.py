@@ -0,0 +1,64 @@
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.models.models import Base, User, Agent, Task, TaskRollup
+from app.services import task_service
+from app.services.rollup_service import rollup_service, ROLLUP_SCOPE_OWNER, ROLLUP_SCOPE_AGENT
+
+# Create test database
+engine = create_engine(
+    "sqlite://",
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool,
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+# Setup test database
+Base.metadata.create_all(bind=engine)
+
+def rollup_rows(db):
+    return sorted(
+        (row.scope, row.scope_id, row.total_count, row.pending_count, row.in_progress_count, row.completed_count)
+        for row in db.query(TaskRollup)
+    )
+
+# Test bulk create and bulk assign keep ids in order and rollups exact
+def test_bulk_create_and_assign():
+    db = TestingSessionLocal()
+    user = User(username="bulk", email="bulk@example.com")
+    db.add(user)
+    db.commit()
+    agents = [Agent(name=f"bulk agent {i}", owner_id=user.id) for i in range(2)]
+    db.add_all(agents)
+    db.commit()
+
+    tasks_in = [
+        {"title": f"Task {i}", "owner_id": user.id, "status": "completed" if i % 5 == 0 else "pending",
+         "priority": i % 4, "agent_id": agents[0].id if i % 3 == 0 else None}
+        for i in range(2500)
+    ]
+    ids = task_service.create_tasks(db, objs_in=tasks_in)
+    assert len(ids) == 2500
+    titles = dict(db.query(Task.id, Task.title).filter(Task.id.in_(ids[:3] + ids[-3:])))
+    assert [titles[task_id] for task_id in ids[:3] + ids[-3:]] == [
+        "Task 0", "Task 1", "Task 2", "Task 2497", "Task 2498", "Task 2499"
+    ]
+    owner = rollup_service.get_rollup(db, ROLLUP_SCOPE_OWNER, user.id)
+    assert (owner.total_count, owner.completed_count, owner.pending_count) == (2500, 500, 2000)
+
+    assignments = {task_id: agents[1].id for task_id in ids[:1200]}
+    assignments[-1] = agents[1].id
+    assigned = task_service.assign_tasks_to_agents(db, assignments=assignments)
+    assert assigned == ids[:1200]
+    db.expire_all()
+    assert db.query(Task).filter(Task.agent_id == agents[1].id, Task.status == "in_progress").count() == 960
+    assert db.query(Task).filter(Task.agent_id == agents[1].id, Task.started_at.isnot(None)).count() == 960
+    agent_rollup = rollup_service.get_rollup(db, ROLLUP_SCOPE_AGENT, agents[1].id)
+    assert (agent_rollup.total_count, agent_rollup.in_progress_count) == (1200, 960)
+
+    # The incremental counters match a rebuild from the tasks table
+    incremental = rollup_rows(db)
+    rollup_service.rebuild(db)
+    assert rollup_rows(db) == incremental
+    db.close()
@@ -0,0 +1,104 @@
+import os
+import tempfile
+
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+
+from app.api.etags import conditional_get, etag_matches
+from app.db.session import get_async_db
+from app.models.models import Base, User
+from app.services.analytics_cache import analytics_cache
+from app.services.change_versions import change_versions
+from app.services.user_service import get_current_user
+
+# Create test database, shared by the sync and async engines
+DATABASE_PATH = os.path.join(tempfile.mkdtemp(), "etags.db")
+engine = create_engine(f"sqlite:///{DATABASE_PATH}", connect_args={"check_same_thread": False})
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+async_engine = create_async_engine(f"sqlite+aiosqlite:///{DATABASE_PATH}", poolclass=NullPool)
+TestingAsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+# Setup test database
+Base.metadata.create_all(bind=engine)
+db = TestingSessionLocal()
+
+async def override_get_async_db():
+    async with TestingAsyncSessionLocal() as session:
+        yield session
+
+# App with one conditional endpoint that counts how often its body runs
+app = FastAPI()
+calls = []
+current = {"user": User(id=9001, username="etags", email="etags@example.com", is_superuser=False)}
+
+@app.get("/things", dependencies=[Depends(conditional_get)])
+async def read_things(kind: str = "all"):
+    calls.append(kind)
+    return {"kind": kind, "version": analytics_cache.version(9001)}
+
+app.dependency_overrides[get_current_user] = lambda: current["user"]
+app.dependency_overrides[get_async_db] = override_get_async_db
+client = TestClient(app)
+
+# Test weak comparison of If-None-Match lists
+def test_etag_matches():
+    assert etag_matches('"a", W/"b"', 'W/"b"')
+    assert etag_matches('W/"b"', '"b"')
+    assert etag_matches("*", 'W/"b"')
+    assert not etag_matches('W/"c"', 'W/"b"')
+
+# Test a matching If-None-Match answers 304 without running the endpoint, until the user's data changes
+def test_conditional_get():
+    calls.clear()
+    first = client.get("/things")
+    etag = first.headers["ETag"]
+    assert first.status_code == 200 and etag.startswith('W/"')
+
+    cached = client.get("/things", headers={"If-None-Match": etag})
+    assert cached.status_code == 304 and cached.content == b""
+    assert cached.headers["ETag"] == etag
+    assert calls == ["all"]
+
+    # Other query parameters are a different resource
+    assert client.get("/things?kind=some", headers={"If-None-Match": etag}).status_code == 200
+
+    # Writes to another user don't change this user's ETag; their own do
+    analytics_cache.invalidate_user(9002, db=db)
+    assert client.get("/things", headers={"If-None-Match": etag}).status_code == 304
+    analytics_cache.invalidate_user(9001, db=db)
+    changed = client.get("/things", headers={"If-None-Match": etag})
+    assert changed.status_code == 200 and changed.headers["ETag"] != etag
+
+    # Superusers see everyone's data, so any user's write changes their ETag
+    current["user"] = User(id=9003, username="etags-admin", email="admin@example.com", is_superuser=True)
+    try:
+        etag = client.get("/things").headers["ETag"]
+        analytics_cache.invalidate_user(9002, db=db)
+        assert client.get("/things", headers={"If-None-Match": etag}).status_code == 200
+    finally:
+        current["user"] = User(id=9001, username="etags", email="etags@example.com", is_superuser=False)
+
+# Test changes outside analytics (such as flushed progress) still change the ETag
+def test_change_version_bump_changes_etag():
+    etag = client.get("/things").headers["ETag"]
+    version = analytics_cache.version(9001)
+    change_versions.bump(db, 9001)
+    assert client.get("/things", headers={"If-None-Match": etag}).status_code == 200
+    assert analytics_cache.version(9001) == version
+
+# Test ETags come from the stored versions alone, so another worker (or this
+# one after a restart, with its in-memory state gone) issues the same tag
+def test_etag_is_shared_across_workers(monkeypatch):
+    etag = client.get("/things").headers["ETag"]
+    monkeypatch.setattr(analytics_cache, "_versions", {})
+    assert client.get("/things", headers={"If-None-Match": etag}).status_code == 304
+
+    # The version covering every user keeps growing as users' versions do
+    before = change_versions.global_version(db)
+    change_versions.bump(db, 9001, 9002, None)
+    assert change_versions.global_version(db) == before + 2
+    assert change_versions.version(db, 9002) >= 1
@@ -0,0 +1,69 @@
+import csv
+import io
+import json
+from datetime import datetime
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.models.models import Base, User, Agent, AgentLog, Task
+from app.services import export_service as export_module
+from app.services.export_service import export_service
+
+# Create test database
+engine = create_engine(
+    "sqlite://",
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool,
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+# Setup test database
+Base.metadata.create_all(bind=engine)
+
+def create_owner_and_agent(db, name):
+    user = User(username=name, email=f"{name}@example.com")
+    db.add(user)
+    db.commit()
+    agent = Agent(name=f"{name} agent", owner_id=user.id)
+    db.add(agent)
+    db.commit()
+    return user, agent
+
+# Test NDJSON exports stream in batches and honour owner and time filters
+def test_export_agent_logs_ndjson(monkeypatch):
+    monkeypatch.setattr(export_module, "EXPORT_BATCH_SIZE", 2)
+    db = TestingSessionLocal()
+    user, agent = create_owner_and_agent(db, "export")
+    _, other_agent = create_owner_and_agent(db, "export-other")
+    for day in range(1, 6):
+        db.add(AgentLog(agent_id=agent.id, timestamp=datetime(2026, 1, day), level="INFO", message=f"day {day}"))
+    db.add(AgentLog(agent_id=other_agent.id, timestamp=datetime(2026, 1, 2), level="INFO", message="other"))
+    db.commit()
+
+    chunks = list(export_service.stream(
+        db, "agent_logs", "ndjson", owner_id=user.id, start=datetime(2026, 1, 2), end=datetime(2026, 1, 5)
+    ))
+    assert len(chunks) == 2
+    rows = [json.loads(line) for line in b"".join(chunks).decode().splitlines()]
+    assert [row["message"] for row in rows] == ["day 2", "day 3", "day 4"]
+    assert rows[0]["timestamp"] == "2026-01-02T00:00:00"
+    assert set(rows[0]) == {"id", "agent_id", "timestamp", "level", "message", "details"}
+    db.close()
+
+# Test CSV exports start with a header row and quote embedded commas
+def test_export_tasks_csv():
+    db = TestingSessionLocal()
+    user, agent = create_owner_and_agent(db, "export-csv")
+    db.add_all([
+        Task(title="Plain", owner_id=user.id, agent_id=agent.id),
+        Task(title="Comma, quoted", owner_id=user.id, agent_id=agent.id),
+    ])
+    db.commit()
+
+    data = b"".join(export_service.stream(db, "tasks", "csv", owner_id=user.id)).decode()
+    rows = list(csv.reader(io.StringIO(data)))
+    assert rows[0][:2] == ["id", "title"]
+    assert [row[1] for row in rows[1:]] == ["Plain", "Comma, quoted"]
+    db.close()
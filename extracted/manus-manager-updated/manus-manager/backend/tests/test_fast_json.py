@@ -0,0 +1,114 @@
+import json
+from datetime import datetime
+
+import pytest
+from fastapi import HTTPException, Response
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.core import fast_json
+from app.core.fast_json import dumps_rows, page_response, response_columns, select_fields
+from app.models.models import Base, User, Agent, AgentLog, Task
+from app.schemas.schemas import AgentLogResponse, TaskResponse
+from app.services.agent_tracker import agent_tracker
+from app.services.task_service import get_tasks_page
+
+# Create test database
+engine = create_engine(
+    "sqlite://",
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool,
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+# Setup test database
+Base.metadata.create_all(bind=engine)
+
+def slow_path(schema, items):
+    return json.loads(json.dumps(jsonable_encoder([schema.from_orm(item) for item in items])))
+
+# Test the fast path encodes column rows the same as the response_model path
+def test_fast_path_matches_response_model(monkeypatch):
+    db = TestingSessionLocal()
+    user = User(username="fastjson", email="fastjson@example.com")
+    db.add(user)
+    db.commit()
+    agent = Agent(name="fast agent", owner_id=user.id, status="idle")
+    db.add(agent)
+    db.commit()
+    db.add_all([
+        Task(
+            title=f"Task {i}", description="ü \"quoted\"" if i % 2 else None, status="pending",
+            priority=i, progress=i / 3, owner_id=user.id, agent_id=agent.id,
+            created_at=datetime(2026, 1, 2, 3, 4, 5, 6789 * i)
+        )
+        for i in range(5)
+    ])
+    db.add_all([AgentLog(agent_id=agent.id, level="info", message=f"log {i}") for i in range(3)])
+    db.commit()
+
+    columns = response_columns(TaskResponse)
+    rows = get_tasks_page(db, limit=10, owner_id=user.id, columns=columns)
+    tasks = get_tasks_page(db, limit=10, owner_id=user.id)
+    assert json.loads(dumps_rows(columns, rows.items)) == slow_path(TaskResponse, tasks.items)
+
+    columns = response_columns(AgentLogResponse)
+    page = agent_tracker.get_agent_logs_page(db, agent.id, limit=2, columns=columns)
+    logs = agent_tracker.get_agent_logs_page(db, agent.id, limit=2)
+    assert json.loads(dumps_rows(columns, page.items)) == slow_path(AgentLogResponse, logs.items)
+    assert page.next_cursor == logs.next_cursor
+
+    # By default pages go through the response_model; the cursors are set either way
+    response = Response()
+    assert page_response(response, page, columns) is page.items
+    assert response.headers["X-Next-Cursor"] == page.next_cursor
+
+    # With FAST_JSON_RESPONSES pages come back as a ready response, cursors included
+    monkeypatch.setattr(fast_json, "FAST_JSON_RESPONSES", True)
+    response = page_response(Response(), page, columns)
+    assert response.media_type == "application/json"
+    assert response.headers["X-Next-Cursor"] == page.next_cursor
+    db.close()
+
+# Test encoding without orjson falls back to the standard library
+def test_dumps_without_orjson(monkeypatch):
+    row = (1, datetime(2026, 1, 2, 3, 4, 5, 123), 0.5, None)
+    with_orjson = fast_json.dumps_rows(("id", "at", "progress", "note"), [row])
+    monkeypatch.setattr(fast_json, "orjson", None)
+    assert fast_json.dumps_rows(("id", "at", "progress", "note"), [row]) == with_orjson
+
+# Test sparse fieldsets select only the requested columns, always with id
+def test_sparse_fields():
+    columns = response_columns(TaskResponse)
+    assert select_fields(None, columns) == columns
+    assert select_fields("status, title", columns) == ("title", "status", "id")
+    with pytest.raises(HTTPException) as exc:
+        select_fields("title,secret", columns)
+    assert exc.value.status_code == 400 and "secret" in exc.value.detail
+
+    db = TestingSessionLocal()
+    user = User(username="sparse", email="sparse@example.com")
+    db.add(user)
+    db.commit()
+    db.add_all([Task(title=f"Sparse {i}", description="x" * 1000, owner_id=user.id) for i in range(3)])
+    db.commit()
+
+    fields = select_fields("status", columns)
+    owner_id = user.id
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(engine, "before_cursor_execute", listener)
+    try:
+        page = get_tasks_page(db, limit=2, owner_id=owner_id, columns=fields)
+    finally:
+        event.remove(engine, "before_cursor_execute", listener)
+    assert len(statements) == 1
+    selected = statements[0].split("FROM")[0]
+    assert "tasks.status" in selected and "tasks.id" in selected and "description" not in selected
+
+    response = page_response(Response(), page, fields, sparse=True)
+    assert [set(item) for item in json.loads(response.body)] == [{"status", "id"}] * 2
+    assert response.headers["X-Next-Cursor"] == page.next_cursor
+    db.close()
@@ -0,0 +1,143 @@
+import datetime
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.x509.oid import NameOID
+from google.auth import crypt, jwt
+
+from app.core.google_certs import GoogleCertCache, cache_lifetime
+
+
+class FakeTimer:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_key(key_id):
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, key_id)])
+    now = datetime.datetime.utcnow()
+    cert = (
+        x509.CertificateBuilder().subject_name(name).issuer_name(name).public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - datetime.timedelta(days=1)).not_valid_after(now + datetime.timedelta(days=1))
+        .sign(key, hashes.SHA256())
+    )
+    private_pem = key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+    )
+    signer = crypt.RSASigner.from_string(private_pem, key_id=key_id)
+    return signer, cert.public_bytes(serialization.Encoding.PEM).decode()
+
+
+def make_token(signer, audience="client-id"):
+    now = int(time.time())
+    return jwt.encode(signer, {
+        "iss": "https://accounts.google.com", "aud": audience, "sub": "42",
+        "email": "g@example.com", "iat": now, "exp": now + 300,
+    }).decode()
+
+
+@pytest.fixture
+def key_server():
+    """
+    Local stand-in for Google's certificate endpoint
+    """
+    state = {"certs": {}, "requests": 0, "cache_control": "public, max-age=600"}
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            state["requests"] += 1
+            body = json.dumps(state["certs"]).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("Cache-Control", state["cache_control"])
+            self.send_header("Age", "100")
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    state["url"] = f"http://127.0.0.1:{server.server_port}/certs"
+    yield state
+    server.shutdown()
+    server.server_close()
+
+# Test cache lifetimes follow Cache-Control and Age
+def test_cache_lifetime():
+    assert cache_lifetime({"Cache-Control": "public, max-age=600", "Age": "100"}) == 500
+    assert cache_lifetime({"Cache-Control": "no-cache"}) == 0
+    assert cache_lifetime({}, default=60) == 60
+
+# Test tokens verify locally against certificates fetched once per cache lifetime
+def test_verify_uses_cached_certs(key_server):
+    signer, cert = make_key("k1")
+    key_server["certs"] = {"k1": cert}
+    timer = FakeTimer()
+    cache = GoogleCertCache(url=key_server["url"], refresh_margin=60, min_refetch=10, timer=timer)
+
+    claims = cache.verify(make_token(signer), audience="client-id")
+    assert claims["sub"] == "42"
+    cache.verify(make_token(signer), audience="client-id")
+    assert key_server["requests"] == 1
+    with pytest.raises(ValueError):
+        cache.verify(make_token(signer, audience="someone-else"), audience="client-id")
+
+    # Close to expiry (max-age 600 less Age 100), a background refresh runs
+    # while callers keep the current keys
+    timer.now = 450
+    cache.verify(make_token(signer), audience="client-id")
+    cache._refresh_thread.join(5)
+    assert key_server["requests"] == 2 and cache.fetches == 2
+
+    # A token from a rotated-in key refetches, at most once per min_refetch
+    rotated, rotated_cert = make_key("k2")
+    key_server["certs"] = {"k1": cert, "k2": rotated_cert}
+    timer.now = 455
+    with pytest.raises(ValueError):
+        cache.verify(make_token(rotated), audience="client-id")
+    assert key_server["requests"] == 2
+    timer.now = 461
+    assert cache.verify(make_token(rotated), audience="client-id")["sub"] == "42"
+    assert key_server["requests"] == 3
+    cache.close()
+
+# Test a failed refresh keeps the current certificates
+def test_failed_refresh_keeps_certs(key_server):
+    signer, cert = make_key("k1")
+    key_server["certs"] = {"k1": cert}
+    timer = FakeTimer()
+    cache = GoogleCertCache(url=key_server["url"], refresh_margin=0, min_refetch=10, timer=timer)
+    cache.certs()
+
+    cache.url = "http://127.0.0.1:9/certs"
+    timer.now = 1000
+    assert cache.verify(make_token(signer), audience="client-id")["sub"] == "42"
+    assert cache.failures == 1
+    cache.close()
+
+# Test google.auth and requests aren't loaded until a Google token is verified
+def test_google_libraries_load_lazily():
+    code = (
+        "import sys, app.core.security; "
+        "print(any(name in sys.modules for name in ('google.auth', 'requests')))"
+    )
+    backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    result = subprocess.run([sys.executable, "-c", code], cwd=backend_dir, capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == "False"
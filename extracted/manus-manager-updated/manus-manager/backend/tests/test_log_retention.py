@@ -0,0 +1,91 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.db.session import enable_sqlite_foreign_keys
+from app.models.models import Base, User, Agent, AgentLog, Task, TaskLog
+from app.services import agent_service, task_service
+from app.services.log_retention_service import log_retention_service
+
+# Create test database
+engine = create_engine(
+    "sqlite://",
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool,
+)
+enable_sqlite_foreign_keys(engine)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+# Setup test database
+Base.metadata.create_all(bind=engine)
+
+NOW = datetime(2026, 3, 31, 12, 0)
+
+def add_logs(db, agent_id, days_ago, levels):
+    for level in levels:
+        db.add(AgentLog(agent_id=agent_id, timestamp=NOW - timedelta(days=days_ago), level=level, message=level))
+    db.commit()
+
+def level_counts(db, agent_id):
+    return {
+        (rollup.day, rollup.level): rollup.count
+        for rollup in log_retention_service.get_level_counts(db, "agent", agent_id)
+    }
+
+# Test expired logs are rolled up per day and level, and recent logs are kept
+def test_prune_rolls_up_and_deletes_expired_logs():
+    db = TestingSessionLocal()
+    user = User(username="retention", email="retention@example.com")
+    db.add(user)
+    db.commit()
+    agent = Agent(name="retention agent", owner_id=user.id)
+    db.add(agent)
+    db.commit()
+
+    add_logs(db, agent.id, 40, ["INFO", "INFO", "ERROR"])
+    add_logs(db, agent.id, 35, ["WARNING"])
+    add_logs(db, agent.id, 1, ["INFO"])
+
+    result = log_retention_service.prune(db, retention_days=30, now=NOW)
+    assert result == {"partitions_dropped": 0, "rows_deleted": 4}
+    assert db.query(AgentLog).filter(AgentLog.agent_id == agent.id).count() == 1
+
+    day_40 = (NOW - timedelta(days=40)).date()
+    day_35 = (NOW - timedelta(days=35)).date()
+    assert level_counts(db, agent.id) == {
+        (day_40, "ERROR"): 1,
+        (day_40, "INFO"): 2,
+        (day_35, "WARNING"): 1,
+    }
+
+    # Late rows for an already pruned day add to its counts
+    add_logs(db, agent.id, 40, ["INFO"])
+    log_retention_service.prune(db, retention_days=30, now=NOW)
+    assert level_counts(db, agent.id)[(day_40, "INFO")] == 3
+    db.close()
+
+# Test deleting an agent or task removes its logs, so a reused id starts with none
+def test_delete_removes_logs():
+    db = TestingSessionLocal()
+    user = User(username="cascade", email="cascade@example.com")
+    db.add(user)
+    db.commit()
+    agent = agent_service.create_agent(db, obj_in={"name": "cascade agent", "owner_id": user.id})
+    kept = agent_service.create_agent(db, obj_in={"name": "kept agent", "owner_id": user.id})
+    task = task_service.create_task(db, obj_in={"title": "cascade task", "owner_id": user.id, "agent_id": kept.id})
+    agent_id, kept_id, task_id = agent.id, kept.id, task.id
+    add_logs(db, agent_id, 1, ["INFO", "ERROR"])
+    add_logs(db, kept_id, 1, ["INFO"])
+    db.add(TaskLog(task_id=task_id, timestamp=NOW, level="INFO", message="task log"))
+    db.commit()
+
+    agent_service.delete_agent(db, id=agent_id)
+    task_service.delete_task(db, id=task_id)
+
+    assert db.query(AgentLog).filter(AgentLog.agent_id == agent_id).count() == 0
+    assert db.query(TaskLog).filter(TaskLog.task_id == task_id).count() == 0
+    assert db.query(AgentLog).filter(AgentLog.agent_id == kept_id).count() == 1
+    assert db.query(Task).filter(Task.id == task_id).count() == 0
+    db.close()
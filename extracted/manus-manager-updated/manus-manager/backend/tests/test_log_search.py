@@ -0,0 +1,73 @@
+from datetime import datetime
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.models.models import Base, User, Agent, Task, AgentLog, TaskLog
+from app.services.log_search_service import log_search_service
+
+# Create test database
+engine = create_engine(
+    "sqlite://",
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool,
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+# Setup test database
+Base.metadata.create_all(bind=engine)
+
+def create_owner_and_agent(db, name):
+    user = User(username=name, email=f"{name}@example.com")
+    db.add(user)
+    db.commit()
+    agent = Agent(name=f"{name} agent", owner_id=user.id)
+    db.add(agent)
+    db.commit()
+    return user, agent
+
+# Test matches are ranked, highlighted, filtered and scoped to the owner
+def test_search_agent_logs():
+    db = TestingSessionLocal()
+    user, agent = create_owner_and_agent(db, "search")
+    _, other_agent = create_owner_and_agent(db, "search-other")
+    db.add_all([
+        AgentLog(agent_id=agent.id, timestamp=datetime(2026, 1, 1), level="INFO", message="retrying upstream request"),
+        AgentLog(agent_id=agent.id, timestamp=datetime(2026, 1, 2), level="ERROR", message="upstream timeout, upstream unreachable"),
+        AgentLog(agent_id=agent.id, timestamp=datetime(2026, 1, 3), level="INFO", message="task finished"),
+        AgentLog(agent_id=other_agent.id, timestamp=datetime(2026, 1, 2), level="ERROR", message="upstream timeout"),
+    ])
+    db.commit()
+
+    results = log_search_service.search(db, query="upstream", owner_id=user.id)
+    assert [r["message"] for r in results] == ["upstream timeout, upstream unreachable", "retrying upstream request"]
+    assert "<mark>upstream</mark>" in results[0]["snippet"]
+
+    results = log_search_service.search(db, query="upstream", owner_id=user.id, level="error")
+    assert [r["timestamp"] for r in results] == [datetime(2026, 1, 2)]
+
+    results = log_search_service.search(db, query="upstream", owner_id=user.id, order="oldest", start=datetime(2026, 1, 1, 12))
+    assert [r["timestamp"] for r in results] == [datetime(2026, 1, 2)]
+
+    # Query syntax characters are searched as plain words
+    assert log_search_service.search(db, query='"upstream AND (', owner_id=user.id) == []
+    db.close()
+
+# Test task logs can be narrowed to the agent running the task
+def test_search_task_logs_by_agent():
+    db = TestingSessionLocal()
+    user, agent = create_owner_and_agent(db, "task-search")
+    task = Task(title="Task", owner_id=user.id, agent_id=agent.id)
+    other_task = Task(title="Other", owner_id=user.id)
+    db.add_all([task, other_task])
+    db.commit()
+    db.add_all([
+        TaskLog(task_id=task.id, level="INFO", message="disk quota exceeded"),
+        TaskLog(task_id=other_task.id, level="INFO", message="disk quota exceeded"),
+    ])
+    db.commit()
+
+    results = log_search_service.search(db, query="quota", source="task", owner_id=user.id, agent_id=agent.id)
+    assert [r["task_id"] for r in results] == [task.id]
+    db.close()
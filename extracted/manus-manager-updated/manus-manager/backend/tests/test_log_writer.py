@@ -0,0 +1,133 @@
+import asyncio
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.models.models import Base, User, Agent, AgentLog
+from app.services.agent_tracker import agent_tracker
+from app.services.log_writer import LogWriter
+
+# Create test database
+engine = create_engine(
+    "sqlite://",
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool,
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+# Setup test database
+Base.metadata.create_all(bind=engine)
+
+def create_agent(db, name):
+    user = User(username=name, email=f"{name}@example.com")
+    db.add(user)
+    db.commit()
+    agent = Agent(name=f"{name} agent", owner_id=user.id)
+    db.add(agent)
+    db.commit()
+    return agent
+
+def log_row(agent_id, i):
+    return {
+        "agent_id": agent_id,
+        "timestamp": datetime.utcnow(),
+        "level": "INFO",
+        "message": f"line {i}",
+        "details": None,
+    }
+
+# Test queued rows are written in batches and everything is flushed on stop
+def test_log_writer_batches_and_flushes_on_stop():
+    db = TestingSessionLocal()
+    agent = create_agent(db, "batched")
+
+    writer = LogWriter(max_size=100, batch_size=10, flush_interval=5)
+    writer.start(TestingSessionLocal)
+    for i in range(25):
+        assert writer.enqueue(AgentLog, log_row(agent.id, i))
+    writer.stop()
+
+    assert db.query(AgentLog).filter(AgentLog.agent_id == agent.id).count() == 25
+    assert writer.written == 25
+    assert writer.batches < 25
+    db.close()
+
+# Test enqueue refuses rows when the writer isn't running
+def test_log_writer_rejects_when_stopped():
+    writer = LogWriter(max_size=1)
+    assert not writer.enqueue(AgentLog, log_row(1, 0))
+
+# Test on_written gets the id each row was written with
+def test_log_writer_reports_ids():
+    db = TestingSessionLocal()
+    agent = create_agent(db, "ids")
+
+    ids = {}
+    writer = LogWriter(max_size=100, batch_size=10, flush_interval=5)
+    writer.start(TestingSessionLocal)
+    for i in range(15):
+        assert writer.enqueue(AgentLog, log_row(agent.id, i), lambda log_id, i=i: ids.__setitem__(i, log_id))
+    writer.stop()
+
+    messages = dict(db.query(AgentLog.id, AgentLog.message).filter(AgentLog.agent_id == agent.id))
+    assert {messages[log_id] for log_id in ids.values()} == {f"line {i}" for i in range(15)}
+    assert all(messages[ids[i]] == f"line {i}" for i in ids)
+    db.close()
+
+# Test a full queue turns rows away at once instead of blocking the caller
+def test_log_writer_does_not_wait_when_full():
+    released = threading.Event()
+
+    def blocked_session():
+        released.wait(5)
+        return TestingSessionLocal()
+
+    writer = LogWriter(max_size=1, batch_size=1, flush_interval=0)
+    writer.start(blocked_session)
+    assert writer.enqueue(AgentLog, log_row(1, 0))
+    # The writer takes the first row and waits; the second fills the queue
+    while writer.stats()["queued"]:
+        time.sleep(0.01)
+    assert writer.enqueue(AgentLog, log_row(1, 1))
+
+    started = time.monotonic()
+    assert not writer.enqueue(AgentLog, log_row(1, 2))
+    assert time.monotonic() - started < 0.1
+    released.set()
+    writer.stop()
+
+# Test a direct write neither commits the caller's pending changes nor drops the id
+def test_direct_log_write_uses_own_connection(tmp_path):
+    file_engine = create_engine(f"sqlite:///{tmp_path}/logs.db")
+    Base.metadata.create_all(bind=file_engine)
+    FileSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=file_engine)
+    db = FileSessionLocal()
+    agent = create_agent(db, "direct")
+
+    sent = []
+
+    async def record_broadcast(user_id, log_data):
+        sent.append(log_data)
+
+    async def scenario():
+        agent_tracker.broadcast_log_update = record_broadcast
+        try:
+            db.add(User(username="pending", email="pending@example.com"))
+            log = agent_tracker.log_agent_activity(db, agent.id, "direct write", owner_id=agent.owner_id)
+            await asyncio.sleep(0.05)
+            return log
+        finally:
+            del agent_tracker.broadcast_log_update
+
+    log = asyncio.run(scenario())
+    db.rollback()
+
+    assert log.id is not None
+    assert sent == [{**sent[0], "id": log.id, "agent_id": agent.id, "message": "direct write"}]
+    assert db.query(User).filter(User.username == "pending").count() == 0
+    assert db.query(AgentLog).filter(AgentLog.id == log.id).count() == 1
+    db.close()
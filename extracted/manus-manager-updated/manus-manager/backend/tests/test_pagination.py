@@ -0,0 +1,102 @@
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.core.pagination import decode_cursor, encode_cursor
+from app.models.models import Base, User, Agent, AgentLog
+from app.services.agent_service import get_agents_page
+from app.services.agent_tracker import agent_tracker
+
+# Create test database
+engine = create_engine(
+    "sqlite://",
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool,
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+# Setup test database
+Base.metadata.create_all(bind=engine)
+
+# Helper function to walk every page in one direction
+def walk(fetch, cursor=None, direction="next"):
+    pages = []
+    while True:
+        page = fetch(cursor)
+        pages.append([item.id for item in page.items])
+        cursor = page.next_cursor if direction == "next" else page.prev_cursor
+        if not cursor:
+            return pages, page
+
+# Test cursors round-trip and reject garbage
+def test_cursor_round_trip():
+    when = datetime(2026, 1, 2, 3, 4, 5)
+    assert decode_cursor(encode_cursor(when, 7, "prev")) == (when, 7, "prev")
+    assert decode_cursor(encode_cursor(42, 42)) == (42, 42, "next")
+    with pytest.raises(ValueError):
+        decode_cursor("not-a-cursor")
+
+# Test paging agents forward and back by id
+def test_agents_keyset_pages():
+    db = TestingSessionLocal()
+    user = User(username="pager", email="pager@example.com")
+    db.add(user)
+    db.commit()
+    for index in range(7):
+        db.add(Agent(name=f"Agent {index}", owner_id=user.id))
+    db.commit()
+
+    fetch = lambda cursor: get_agents_page(db, cursor=cursor, limit=3, owner_id=user.id)
+    pages, last_page = walk(fetch)
+    all_ids = [agent_id for page in pages for agent_id in page]
+    assert [len(page) for page in pages] == [3, 3, 1]
+    assert all_ids == sorted(all_ids)
+
+    back_pages, _ = walk(fetch, last_page.prev_cursor, direction="prev")
+    assert back_pages == pages[-2::-1]
+    db.close()
+
+# Test paging logs newest first, including rows with identical timestamps
+def test_agent_logs_keyset_pages():
+    db = TestingSessionLocal()
+    user = User(username="logger", email="logger@example.com")
+    db.add(user)
+    db.commit()
+    agent = Agent(name="Logger", owner_id=user.id)
+    db.add(agent)
+    db.commit()
+    start = datetime(2026, 1, 1)
+    for index in range(10):
+        # Pairs of log lines share a timestamp
+        db.add(AgentLog(agent_id=agent.id, message=f"line {index}", timestamp=start + timedelta(seconds=index // 2)))
+    db.commit()
+
+    fetch = lambda cursor: agent_tracker.get_agent_logs_page(db, agent.id, cursor=cursor, limit=4)
+    pages, last_page = walk(fetch)
+    logs = [log for page in pages for log in page]
+    expected = [
+        log.id for log in db.query(AgentLog).filter(AgentLog.agent_id == agent.id)
+        .order_by(AgentLog.timestamp.desc(), AgentLog.id.desc())
+    ]
+    assert logs == expected
+
+    back_pages, first_page = walk(fetch, last_page.prev_cursor, direction="prev")
+    assert back_pages == pages[-2::-1]
+    assert first_page.prev_cursor is None
+    db.close()
+
+# Test a cursor whose sort value doesn't fit the list's sort key is a 400, not a database error
+def test_cursor_for_another_sort_key():
+    db = TestingSessionLocal()
+    for cursor in (encode_cursor(5, 5), encode_cursor("5", 5), encode_cursor(True, 5)):
+        with pytest.raises(HTTPException) as error:
+            agent_tracker.get_agent_logs_page(db, 1, cursor=cursor)
+        assert error.value.status_code == 400
+    with pytest.raises(HTTPException):
+        get_agents_page(db, cursor=encode_cursor(datetime(2026, 1, 1), 5))
+    assert get_agents_page(db, cursor=encode_cursor(5, 5)).items is not None
+    db.close()
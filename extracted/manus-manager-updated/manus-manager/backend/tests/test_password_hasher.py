@@ -0,0 +1,55 @@
+import asyncio
+import hashlib
+import time
+
+import pytest
+from fastapi import HTTPException
+
+from app.core.password_hasher import PasswordHasher
+
+# Test work runs in worker processes while the event loop keeps serving. Uses
+# a stdlib KDF in place of bcrypt, which only has to be picklable the same way.
+def test_runs_off_loop():
+    hasher = PasswordHasher(workers=1, max_queued=4)
+
+    async def scenario():
+        ticks = 0
+        async def tick():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.005)
+                ticks += 1
+        ticker = asyncio.create_task(tick())
+        await hasher._run(hashlib.pbkdf2_hmac, "sha256", b"warm-up", b"salt", 1)
+        ticks_before = ticks
+        results = await asyncio.gather(*(
+            hasher._run(hashlib.pbkdf2_hmac, "sha256", password, b"salt", 200000)
+            for password in (b"s3cret", b"s3cret")
+        ))
+        assert ticks > ticks_before
+        ticker.cancel()
+        return results
+
+    try:
+        first, second = asyncio.run(scenario())
+        assert first == second == hashlib.pbkdf2_hmac("sha256", b"s3cret", b"salt", 200000)
+        assert hasher.stats()["completed"] == 3
+        assert hasher.stats()["max_queued_seen"] == 1
+    finally:
+        hasher.shutdown()
+
+# Test calls past the queue limit are turned away with a 503
+def test_rejects_when_queue_full():
+    hasher = PasswordHasher(workers=0, max_queued=1)
+
+    async def scenario():
+        running = [asyncio.create_task(hasher._run(time.sleep, 0.1)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        with pytest.raises(HTTPException) as exc:
+            await hasher.hash("s3cret")
+        await asyncio.gather(*running)
+        return exc.value
+
+    error = asyncio.run(scenario())
+    assert error.status_code == 503 and error.headers["Retry-After"] == "1"
+    assert hasher.stats()["rejected"] == 1 and hasher.stats()["queued"] == 0
@@ -0,0 +1,40 @@
+import logging
+
+import pytest
+from sqlalchemy import create_engine, exc, text
+
+from app.db import pool as pool_module
+from app.db.pool import InstrumentedQueuePool, pool_stats
+
+# Test checkouts, pool timeouts and slow waits are counted and logged
+def test_pool_metrics_track_exhaustion(tmp_path, monkeypatch, caplog):
+    monkeypatch.setattr(pool_module, "DB_POOL_SLOW_CHECKOUT_SECONDS", 0.05)
+    engine = create_engine(
+        f"sqlite:///{tmp_path}/pool.db",
+        poolclass=InstrumentedQueuePool,
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=0.1,
+    )
+    engine.pool.instrument("test_pool")
+
+    with engine.connect() as held:
+        held.execute(text("SELECT 1"))
+        with caplog.at_level(logging.WARNING, logger="app.db.pool"):
+            with pytest.raises(exc.TimeoutError):
+                engine.connect()
+        stats = pool_stats()["test_pool"]
+        assert stats["checked_out"] == 1
+        assert stats["timeouts"] == 1
+        assert stats["slow_checkouts"] == 1
+    assert "timed out" in caplog.text
+
+    # Metrics survive engine.dispose() swapping in a new pool
+    engine.dispose()
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+    stats = pool_stats()["test_pool"]
+    assert stats["checkouts"] == 2
+    assert stats["connections_created"] == 2
+    assert stats["checkout_ms"]["p50"] is not None
+    pool_module.instrumented_pools.pop("test_pool")
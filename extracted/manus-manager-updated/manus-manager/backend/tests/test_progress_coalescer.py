@@ -0,0 +1,164 @@
+import asyncio
+from datetime import timedelta
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.models.models import Base, User, Agent, Task, TaskLog
+from app.schemas.schemas import TaskStatus
+from app.services import agent_tracker as agent_tracker_module
+from app.services.agent_tracker import AgentTracker
+from app.services.analytics_cache import analytics_cache
+from app.services.change_versions import change_versions
+from app.services.lease_service import lease_service
+from app.services.progress_coalescer import ProgressCoalescer, progress_coalescer
+from app.services.scheduler_service import TaskScheduler
+from app.services.task_service import task_service
+
+# Create test database
+engine = create_engine(
+    "sqlite://",
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool,
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+# Setup test database
+Base.metadata.create_all(bind=engine)
+
+def create_tasks(db, name, count):
+    user = User(username=name, email=f"{name}@example.com")
+    db.add(user)
+    db.commit()
+    tasks = [Task(title=f"{name} {i}", owner_id=user.id, status="in_progress") for i in range(count)]
+    db.add_all(tasks)
+    db.commit()
+    return tasks
+
+# Test only the latest value per task is written, and finished tasks are left alone
+def test_coalescer_writes_latest_value():
+    db = TestingSessionLocal()
+    running, finished = create_tasks(db, "coalesced", 2)
+    finished.status = "completed"
+    finished.progress = 100
+    db.commit()
+
+    coalescer = ProgressCoalescer(flush_interval=60)
+    coalescer.start(TestingSessionLocal)
+    for progress in range(1, 51):
+        assert coalescer.record(running.id, progress)
+    coalescer.record(finished.id, 10)
+    analytics_version, change_version = analytics_cache.version(running.owner_id), change_versions.version(db, running.owner_id)
+    assert coalescer.flush() == 1
+    # The flush changes the owner's ETags but keeps their cached analytics
+    assert analytics_cache.version(running.owner_id) == analytics_version
+    assert change_versions.version(db, running.owner_id) > change_version
+
+    db.expire_all()
+    assert (running.progress, finished.progress) == (50, 100)
+    assert db.query(TaskLog).filter(TaskLog.task_id == running.id).count() == 1
+    assert coalescer.stats()["reported"] == 51
+
+    # Discarded values are never written
+    coalescer.record(running.id, 60)
+    assert coalescer.discard(running.id) == 60
+    coalescer.stop()
+    db.expire_all()
+    assert running.progress == 50
+    db.close()
+
+# Test a status change during a flush wins, and discards outside a flush aren't remembered
+def test_discard_supersedes_only_running_flush():
+    db = TestingSessionLocal()
+    (task,) = create_tasks(db, "superseded", 1)
+
+    idle = ProgressCoalescer()
+    for _ in range(3):
+        idle.discard(task.id)
+    assert not idle._superseded
+
+    coalescer = ProgressCoalescer(flush_interval=60)
+
+    def session_factory():
+        # The status change lands after the flush took the buffered value
+        coalescer.discard(task.id)
+        return TestingSessionLocal()
+
+    coalescer.start(session_factory)
+    coalescer.record(task.id, 40)
+    assert coalescer.flush() == 0
+    assert not coalescer._superseded
+    coalescer.stop()
+    db.expire_all()
+    assert task.progress != 40
+    db.close()
+
+# Test progress reports are buffered and broadcast at most once per interval
+def test_tracker_throttles_progress_broadcasts(monkeypatch):
+    db = TestingSessionLocal()
+    (task,) = create_tasks(db, "throttled", 1)
+    coalescer = ProgressCoalescer(flush_interval=60)
+    coalescer.start(TestingSessionLocal)
+    monkeypatch.setattr(agent_tracker_module, "progress_coalescer", coalescer)
+    monkeypatch.setattr(agent_tracker_module, "PROGRESS_BROADCAST_INTERVAL_SECONDS", 0.05)
+
+    tracker = AgentTracker()
+    sent = []
+    async def broadcast_task_update(user_id, task_data):
+        sent.append(task_data["progress"])
+    tracker.broadcast_task_update = broadcast_task_update
+
+    async def report():
+        for progress in (10, 20, 30):
+            tracker.update_task_progress(db, task.id, progress)
+        await asyncio.sleep(0.1)
+        tracker.update_task_progress(db, task.id, 100, TaskStatus.COMPLETED)
+        await asyncio.sleep(0)
+
+    asyncio.run(report())
+    # The first report, one trailing update with the latest value, then the status change
+    assert sent == [10, 30, 100]
+    assert coalescer.latest(task.id) is None
+    coalescer.stop()
+    db.expire_all()
+    assert (task.status, task.progress) == ("completed", 100)
+    db.close()
+
+# Test every service write that sets a task's status or progress drops its buffered progress
+def test_status_writes_discard_buffered_progress():
+    db = TestingSessionLocal()
+    updated, assigned, bulk_assigned, claimed, scheduled = create_tasks(db, "discarded", 5)
+    agent = Agent(name="discarded agent", owner_id=updated.owner_id, status="running", max_tasks=10)
+    db.add(agent)
+    for task in (assigned, bulk_assigned, claimed, scheduled):
+        task.status = "pending"
+    db.commit()
+
+    progress_coalescer.start(TestingSessionLocal)
+    try:
+        def buffered(*tasks):
+            for task in tasks:
+                progress_coalescer.record(task.id, 30)
+
+        buffered(updated, assigned, bulk_assigned)
+        task_service.update_task(db, db_obj=updated, obj_in={"status": "completed"})
+        task_service.assign_task_to_agent(db, task_id=assigned.id, agent_id=agent.id)
+        task_service.assign_tasks_to_agents(db, assignments={bulk_assigned.id: agent.id})
+        assert [progress_coalescer.latest(task.id) for task in (updated, assigned, bulk_assigned)] == [None] * 3
+
+        buffered(claimed, scheduled)
+        # Claimed ahead of the other pending task, which the scheduler then takes
+        claimed.priority = 1
+        db.commit()
+        assert lease_service.claim(db, agent=agent)[0].id == claimed.id
+        assert TaskScheduler(assign_tasks=True).run_once(db) == 1
+        assert [progress_coalescer.latest(task.id) for task in (claimed, scheduled)] == [None] * 2
+
+        db.refresh(claimed)
+        buffered(claimed)
+        lease_service.requeue_expired(db, now=claimed.lease_expires_at + timedelta(seconds=1))
+        assert progress_coalescer.latest(claimed.id) is None
+    finally:
+        progress_coalescer.stop()
+    db.close()
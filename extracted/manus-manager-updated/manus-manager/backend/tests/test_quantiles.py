@@ -0,0 +1,58 @@
+import random
+
+from app.core.quantiles import DurationSketch, DEFAULT_RELATIVE_ACCURACY
+
+# Helper function to get the exact quantile of a list of values
+def exact_quantile(values, q):
+    ordered = sorted(values)
+    return ordered[int(q * (len(ordered) - 1))]
+
+# Test quantiles stay within the relative accuracy
+def test_quantiles_within_relative_accuracy():
+    rng = random.Random(42)
+    values = [rng.lognormvariate(4, 1.5) for _ in range(10000)]
+    sketch = DurationSketch()
+    for value in values:
+        sketch.add(value)
+
+    for q in (0.5, 0.9, 0.99):
+        expected = exact_quantile(values, q)
+        assert abs(sketch.quantile(q) - expected) <= expected * DEFAULT_RELATIVE_ACCURACY * 1.01
+
+# Test merging sketches matches a single sketch over all values
+def test_merge_matches_single_sketch():
+    rng = random.Random(7)
+    days = [[rng.expovariate(1 / 60) for _ in range(500)] for _ in range(7)]
+    merged = DurationSketch()
+    combined = DurationSketch()
+    for day in days:
+        daily = DurationSketch()
+        for value in day:
+            daily.add(value)
+            combined.add(value)
+        merged.merge(daily)
+
+    assert merged.count == combined.count
+    assert merged.percentiles() == combined.percentiles()
+
+# Test values can be removed again
+def test_negative_weight_removes_value():
+    sketch = DurationSketch()
+    sketch.add(10)
+    sketch.add(1000)
+    sketch.add(1000, -1)
+    assert sketch.count == 1
+    assert abs(sketch.quantile(0.99) - 10) <= 10 * DEFAULT_RELATIVE_ACCURACY
+    sketch.add(10, -1)
+    assert sketch.quantile(0.5) is None
+    assert sketch.bins == {}
+
+# Test sketches survive a JSON round trip
+def test_json_round_trip():
+    sketch = DurationSketch()
+    for value in (0, 1.5, 30, 3600):
+        sketch.add(value)
+    restored = DurationSketch()
+    restored.load_bins(sketch.to_json())
+    restored.count, restored.sum, restored.zero_count = sketch.count, sketch.sum, sketch.zero_count
+    assert restored.percentiles() == sketch.percentiles()
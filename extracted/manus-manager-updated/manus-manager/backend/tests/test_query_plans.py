@@ -0,0 +1,146 @@
+"""
+Query plan checks for the hot query shapes
+
+Each test runs the real service call, captures the SQL it emits and asks
+the database for the plan. A test fails when a statement falls back to a
+sequential scan of the table (or, for the newest-first log reads, sorts
+instead of walking the index).
+
+SQLite always runs; set TEST_POSTGRES_URL to also check Postgres plans.
+"""
+import os
+import re
+from contextlib import contextmanager
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.core.pagination import encode_cursor
+from app.models.models import Base
+from app.services.agent_service import get_agents
+from app.services.agent_tracker import agent_tracker
+from app.services.log_search_service import log_search_service
+from app.services.task_service import get_tasks
+
+POSTGRES_URL = os.getenv("TEST_POSTGRES_URL")
+
+
+def make_sqlite_engine():
+    return create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+
+
+@pytest.fixture(scope="module", params=["sqlite", "postgresql"])
+def engine(request):
+    if request.param == "sqlite":
+        engine = make_sqlite_engine()
+    elif POSTGRES_URL:
+        engine = create_engine(POSTGRES_URL)
+    else:
+        pytest.skip("TEST_POSTGRES_URL is not set")
+    Base.metadata.create_all(bind=engine)
+    yield engine
+    Base.metadata.drop_all(bind=engine)
+    engine.dispose()
+
+
+@contextmanager
+def captured_statements(engine):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+def query_plans(engine, call):
+    """
+    Run call(db) and return the plan text for every SELECT it issued
+    """
+    db = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    try:
+        with captured_statements(engine) as statements:
+            call(db)
+    finally:
+        db.close()
+
+    plans = []
+    with engine.connect() as conn:
+        if engine.dialect.name == "postgresql":
+            # Empty tables always favour a seq scan; ask whether an index path exists at all
+            conn.exec_driver_sql("SET enable_seqscan = off")
+        for statement, parameters in statements:
+            if not statement.lstrip().upper().startswith("SELECT"):
+                continue
+            explain = "EXPLAIN QUERY PLAN " if engine.dialect.name == "sqlite" else "EXPLAIN "
+            rows = conn.exec_driver_sql(explain + statement, parameters).fetchall()
+            plans.append("\n".join(str(row[-1]) for row in rows))
+    assert plans, "No SELECT statements were captured"
+    return plans
+
+
+def assert_no_sequential_scan(engine, plans, table):
+    for plan in plans:
+        if engine.dialect.name == "sqlite":
+            assert not re.search(rf"^SCAN {table}$", plan, re.MULTILINE), plan
+        else:
+            assert f"Seq Scan on {table}" not in plan, plan
+
+
+def assert_no_sort(engine, plans):
+    for plan in plans:
+        if engine.dialect.name == "sqlite":
+            assert "USE TEMP B-TREE" not in plan, plan
+        else:
+            assert not re.search(r"^\s*(->\s*)?Sort\b", plan, re.MULTILINE), plan
+
+
+# Test tasks filtered by owner and status use an index
+def test_tasks_by_owner_and_status(engine):
+    plans = query_plans(engine, lambda db: get_tasks(db, owner_id=1, status="pending"))
+    assert_no_sequential_scan(engine, plans, "tasks")
+
+# Test tasks filtered by agent and status use an index
+def test_tasks_by_agent_and_status(engine):
+    plans = query_plans(engine, lambda db: get_tasks(db, agent_id=1, status="in_progress"))
+    assert_no_sequential_scan(engine, plans, "tasks")
+
+# Test agents filtered by owner and status use an index
+def test_agents_by_owner_and_status(engine):
+    plans = query_plans(engine, lambda db: get_agents(db, owner_id=1, status="running"))
+    assert_no_sequential_scan(engine, plans, "agents")
+
+# Test newest-first agent logs walk the (agent_id, timestamp) index
+def test_agent_logs_newest_first(engine):
+    plans = query_plans(engine, lambda db: agent_tracker.get_agent_logs(db, 1, limit=100))
+    assert_no_sequential_scan(engine, plans, "agent_logs")
+    assert_no_sort(engine, plans)
+
+# Test newest-first task logs walk the (task_id, timestamp) index
+def test_task_logs_newest_first(engine):
+    plans = query_plans(engine, lambda db: agent_tracker.get_task_logs(db, 1, limit=100))
+    assert_no_sequential_scan(engine, plans, "task_logs")
+    assert_no_sort(engine, plans)
+
+# Test a deep cursor page of agent logs is still an index range scan
+def test_agent_logs_cursor_page(engine):
+    cursor = encode_cursor(datetime(2026, 1, 1), 12345)
+    plans = query_plans(engine, lambda db: agent_tracker.get_agent_logs_page(db, 1, cursor=cursor, limit=100))
+    assert_no_sequential_scan(engine, plans, "agent_logs")
+    assert_no_sort(engine, plans)
+
+# Test log search goes through the full-text index rather than scanning logs
+def test_log_search_uses_full_text_index(engine):
+    plans = query_plans(engine, lambda db: log_search_service.search(db, query="connection refused", owner_id=1))
+    assert_no_sequential_scan(engine, plans, "agent_logs")
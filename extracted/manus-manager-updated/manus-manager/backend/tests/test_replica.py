@@ -0,0 +1,46 @@
+from sqlalchemy import create_engine
+
+from app.db.replica import ReplicaMonitor
+
+
+class FakeTimer:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+# Test lag checks are cached for check_interval and gate replica reads
+def test_replica_monitor_routes_on_lag(tmp_path):
+    timer = FakeTimer()
+    monitor = ReplicaMonitor(create_engine(f"sqlite:///{tmp_path}/replica.db"), 5, 10, timer=timer)
+
+    lags = [0.0, 30.0]
+    calls = []
+    def measure_lag():
+        calls.append(timer.now)
+        return lags[len(calls) - 1]
+    monitor.measure_lag = measure_lag
+
+    assert monitor.usable()
+    timer.now = 5
+    assert monitor.usable()
+    assert calls == [0]
+
+    # Lagging past max_lag falls back to the primary
+    timer.now = 10
+    assert not monitor.usable()
+    assert monitor.stats() == {"lag": 30.0, "max_lag": 5, "usable": False}
+
+
+# Test an unreachable replica is reported unusable
+def test_replica_monitor_unusable_on_error(tmp_path):
+    monitor = ReplicaMonitor(create_engine(f"sqlite:///{tmp_path}/replica.db"), 5, 10)
+    assert monitor.measure_lag() == 0.0
+
+    def measure_lag():
+        raise ConnectionError("replica down")
+    monitor.measure_lag = measure_lag
+    assert not monitor.usable()
+    assert monitor.stats()["lag"] is None
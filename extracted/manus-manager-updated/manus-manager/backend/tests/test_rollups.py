@@ -0,0 +1,148 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.models.models import Base, User, Agent, TaskRollup
+from app.services import task_service, user_service
+from app.services.analytics_cache import analytics_cache
+from app.services.rollup_service import rollup_service, ROLLUP_SCOPE_OWNER, ROLLUP_SCOPE_AGENT
+
+# Create test database
+engine = create_engine(
+    "sqlite://",
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool,
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+# Setup test database
+Base.metadata.create_all(bind=engine)
+
+# Helper function to create a user with one agent
+def create_owner_and_agent(db, name):
+    user = User(username=name, email=f"{name}@example.com")
+    db.add(user)
+    db.commit()
+    agent = Agent(name=f"{name} agent", owner_id=user.id)
+    db.add(agent)
+    db.commit()
+    return user, agent
+
+def rollup_counts(db, scope, scope_id):
+    rollup = rollup_service.get_rollup(db, scope, scope_id)
+    return {
+        "total": rollup.total_count,
+        "pending": rollup.pending_count,
+        "in_progress": rollup.in_progress_count,
+        "completed": rollup.completed_count,
+        "completion_time_count": rollup.completion_time_count,
+    }
+
+# Test counters follow a task through its lifecycle
+def test_rollups_track_task_lifecycle():
+    db = TestingSessionLocal()
+    user, agent = create_owner_and_agent(db, "lifecycle")
+
+    task = task_service.create_task(db, obj_in={"title": "Task", "owner_id": user.id, "status": "pending"})
+    assert rollup_counts(db, ROLLUP_SCOPE_OWNER, user.id)["pending"] == 1
+    assert rollup_service.get_rollup(db, ROLLUP_SCOPE_AGENT, agent.id) is None
+
+    task = task_service.assign_task_to_agent(db, task_id=task.id, agent_id=agent.id)
+    assert rollup_counts(db, ROLLUP_SCOPE_OWNER, user.id)["in_progress"] == 1
+    assert rollup_counts(db, ROLLUP_SCOPE_AGENT, agent.id)["in_progress"] == 1
+
+    task.started_at = datetime.now() - timedelta(seconds=30)
+    db.commit()
+    task_service.update_task(db, db_obj=task, obj_in={"status": "completed"})
+    owner_counts = rollup_counts(db, ROLLUP_SCOPE_OWNER, user.id)
+    assert owner_counts["completed"] == 1
+    assert owner_counts["in_progress"] == 0
+    assert owner_counts["completion_time_count"] == 1
+
+    task_service.delete_task(db, id=task.id)
+    assert rollup_counts(db, ROLLUP_SCOPE_OWNER, user.id) == {
+        "total": 0, "pending": 0, "in_progress": 0, "completed": 0, "completion_time_count": 0
+    }
+    db.close()
+
+# Test rebuild reproduces the incrementally maintained counters
+def test_rebuild_matches_incremental_rollups():
+    db = TestingSessionLocal()
+    user, agent = create_owner_and_agent(db, "rebuild")
+    for index in range(3):
+        task = task_service.create_task(db, obj_in={"title": f"Task {index}", "owner_id": user.id, "status": "pending"})
+        if index:
+            task_service.assign_task_to_agent(db, task_id=task.id, agent_id=agent.id)
+
+    incremental = rollup_counts(db, ROLLUP_SCOPE_OWNER, user.id)
+    db.query(TaskRollup).delete()
+    db.commit()
+
+    rollup_service.rebuild(db)
+    assert rollup_counts(db, ROLLUP_SCOPE_OWNER, user.id) == incremental
+    assert rollup_counts(db, ROLLUP_SCOPE_AGENT, agent.id)["in_progress"] == 2
+    db.close()
+
+# Test completion times land in the per-priority sketches
+def test_completion_sketches_by_priority():
+    db = TestingSessionLocal()
+    user, agent = create_owner_and_agent(db, "sketches")
+    for priority, seconds in ((0, 10), (0, 20), (2, 600)):
+        task = task_service.create_task(
+            db, obj_in={"title": "Task", "owner_id": user.id, "status": "pending", "priority": priority}
+        )
+        task = task_service.assign_task_to_agent(db, task_id=task.id, agent_id=agent.id)
+        task.started_at = datetime.now() - timedelta(seconds=seconds)
+        db.commit()
+        task_service.update_task(db, db_obj=task, obj_in={"status": "completed"})
+
+    by_priority = rollup_service.get_completion_sketches(
+        db, ROLLUP_SCOPE_OWNER, [user.id], by_priority=True
+    )
+    assert by_priority[(user.id, 0)].count == 2
+    assert by_priority[(user.id, 2)].count == 1
+    assert 590 < by_priority[(user.id, 2)].quantile(0.5) < 610
+
+    agent_sketch = rollup_service.get_completion_sketches(db, ROLLUP_SCOPE_AGENT, [agent.id])[agent.id]
+    assert agent_sketch.count == 3
+
+    # Reopening a completed task takes it back out of the sketch
+    task_service.update_task(db, db_obj=task, obj_in={"status": "in_progress"})
+    agent_sketch = rollup_service.get_completion_sketches(db, ROLLUP_SCOPE_AGENT, [agent.id])[agent.id]
+    assert agent_sketch.count == 2
+    db.close()
+
+# Test deleting a user takes the cascaded tasks out of other users' counters
+def test_delete_user_updates_other_owners():
+    db = TestingSessionLocal()
+    deleted, deleted_agent = create_owner_and_agent(db, "deleted")
+    other, other_agent = create_owner_and_agent(db, "other")
+    deleted_id, other_id, other_agent_id = deleted.id, other.id, other_agent.id
+
+    # The other user's task on the deleted user's agent, completed so it is in the sketches
+    task = task_service.create_task(db, obj_in={"title": "Assigned", "owner_id": other_id, "status": "pending"})
+    task = task_service.assign_task_to_agent(db, task_id=task.id, agent_id=deleted_agent.id)
+    task.started_at = datetime.now() - timedelta(seconds=60)
+    db.commit()
+    task_service.update_task(db, db_obj=task, obj_in={"status": "completed"})
+    # The deleted user's task on the other user's agent
+    task = task_service.create_task(db, obj_in={"title": "Borrowed", "owner_id": deleted_id, "status": "pending"})
+    task_service.assign_task_to_agent(db, task_id=task.id, agent_id=other_agent_id)
+    # A task that survives
+    task_service.create_task(db, obj_in={"title": "Kept", "owner_id": other_id, "status": "pending"})
+
+    version = analytics_cache.version(other_id)
+    user_service.delete_user(db, id=deleted_id)
+    assert analytics_cache.version(other_id) > version
+
+    empty = {"total": 0, "pending": 0, "in_progress": 0, "completed": 0, "completion_time_count": 0}
+    assert rollup_counts(db, ROLLUP_SCOPE_OWNER, other_id) == {**empty, "total": 1, "pending": 1}
+    assert rollup_counts(db, ROLLUP_SCOPE_AGENT, other_agent_id) == empty
+    assert rollup_service.get_completion_sketches(db, ROLLUP_SCOPE_OWNER, [other_id])[other_id].count == 0
+
+    incremental = rollup_counts(db, ROLLUP_SCOPE_OWNER, other_id)
+    rollup_service.rebuild(db)
+    assert rollup_counts(db, ROLLUP_SCOPE_OWNER, other_id) == incremental
+    db.close()
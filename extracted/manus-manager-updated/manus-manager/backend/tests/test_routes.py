@@ -0,0 +1,292 @@
+import csv
+import io
+import os
+import tempfile
+from datetime import datetime, timedelta
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+
+from app.main import app
+from app.api.endpoints import metrics
+from app.api.deps import get_async_read_db, get_read_db
+from app.core.password_hasher import password_hasher
+from app.core.security import create_access_token
+from app.db.session import enable_sqlite_foreign_keys, get_async_db, get_db
+from app.models.models import Base, User, AgentLog, TaskLog
+from app.services.agent_tracker import agent_tracker
+
+# Create test database, shared by the sync and async engines. Each request
+# runs on its own event loop, so async connections aren't pooled.
+DATABASE_PATH = os.path.join(tempfile.mkdtemp(), "routes.db")
+engine = create_engine(f"sqlite:///{DATABASE_PATH}", connect_args={"check_same_thread": False})
+enable_sqlite_foreign_keys(engine)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
+async_engine = create_async_engine(f"sqlite+aiosqlite:///{DATABASE_PATH}", poolclass=NullPool)
+enable_sqlite_foreign_keys(async_engine)
+TestingAsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+# Setup test database
+Base.metadata.create_all(bind=engine)
+
+def override_get_db():
+    db = TestingSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+async def override_get_async_db():
+    async with TestingAsyncSessionLocal() as db:
+        yield db
+
+app.dependency_overrides[get_db] = override_get_db
+app.dependency_overrides[get_read_db] = override_get_db
+app.dependency_overrides[get_async_db] = override_get_async_db
+app.dependency_overrides[get_async_read_db] = override_get_async_db
+
+# Startup hooks aren't run, so logs are written directly and nothing is scheduled
+client = TestClient(app)
+
+def create_user(name, is_superuser=False, hashed_password=""):
+    db = TestingSessionLocal()
+    user = User(
+        username=name, email=f"{name}@example.com", hashed_password=hashed_password, is_superuser=is_superuser
+    )
+    db.add(user)
+    db.commit()
+    db.close()
+    return user
+
+def auth_headers(user):
+    return {"Authorization": f"Bearer {create_access_token({'sub': str(user.id), 'ver': user.token_version})}"}
+
+def create_agent(headers, user, name="Agent", status="idle"):
+    response = client.post("/agents/", json={"name": name, "owner_id": user.id, "status": status}, headers=headers)
+    assert response.status_code == 200
+    return response.json()
+
+def create_task(headers, user, **values):
+    response = client.post("/tasks/", json={"title": "Task", "owner_id": user.id, **values}, headers=headers)
+    assert response.status_code == 200
+    return response.json()
+
+# Test logging in by email issues a token for /auth/me. A plain comparison
+# stands in for bcrypt, as in test_password_hasher.
+def test_login(monkeypatch):
+    async def verify(plain_password, hashed_password):
+        return hashed_password == f"plain:{plain_password}"
+    monkeypatch.setattr(password_hasher, "verify", verify)
+    create_user("login", hashed_password="plain:secret")
+    response = client.post("/auth/login", data={"username": "login@example.com", "password": "secret"})
+    assert response.status_code == 200
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+    assert client.get("/auth/me", headers=headers).json()["username"] == "login"
+
+    wrong = client.post("/auth/login", data={"username": "login@example.com", "password": "wrong"})
+    assert wrong.status_code == 401
+
+# Test agent and task CRUD through the async session, including the status actions
+def test_agent_and_task_crud():
+    user = create_user("crud")
+    headers = auth_headers(user)
+
+    agent = create_agent(headers, user)
+    assert client.get(f"/agents/{agent['id']}", headers=headers).json()["name"] == "Agent"
+    assert client.put(f"/agents/{agent['id']}", json={"name": "Renamed"}, headers=headers).json()["name"] == "Renamed"
+    assert client.post(f"/agents/{agent['id']}/start", headers=headers).json()["status"] == "running"
+    assert client.post(f"/agents/{agent['id']}/pause", headers=headers).json()["status"] == "paused"
+    assert client.post(f"/agents/{agent['id']}/stop", headers=headers).json()["status"] == "idle"
+    db = TestingSessionLocal()
+    logged = db.query(AgentLog.status).filter(AgentLog.agent_id == agent["id"]).order_by(AgentLog.id).all()
+    db.close()
+    assert [row.status for row in logged] == ["running", "paused", "idle"]
+
+    task = create_task(headers, user)
+    assert client.put(f"/tasks/{task['id']}", json={"priority": 3}, headers=headers).json()["priority"] == 3
+    assigned = client.post(f"/tasks/{task['id']}/assign/{agent['id']}", headers=headers).json()
+    assert assigned["agent_id"] == agent["id"]
+    progress = client.post(f"/tracking/tasks/{task['id']}/progress/50?task_status=in_progress", headers=headers)
+    assert progress.status_code == 200
+
+    # Another user can't read them
+    other_headers = auth_headers(create_user("crud-other"))
+    assert client.get(f"/agents/{agent['id']}", headers=other_headers).status_code == 403
+    assert client.get(f"/tasks/{task['id']}", headers=other_headers).status_code == 403
+
+    assert client.delete(f"/tasks/{task['id']}", headers=headers).status_code == 200
+    assert client.get(f"/tasks/{task['id']}", headers=headers).status_code == 404
+    assert client.delete(f"/agents/{agent['id']}", headers=headers).status_code == 200
+    assert client.get(f"/agents/{agent['id']}", headers=headers).status_code == 404
+
+# Test list pages follow their cursors and return only the requested fields
+def test_list_cursors_and_fields():
+    user = create_user("lists")
+    headers = auth_headers(user)
+    ids = [create_agent(headers, user, name=f"Agent {i}")["id"] for i in range(3)]
+
+    first = client.get("/agents/?limit=2", headers=headers)
+    assert [agent["id"] for agent in first.json()] == ids[:2]
+    second = client.get(f"/agents/?limit=2&cursor={first.headers['X-Next-Cursor']}", headers=headers)
+    assert [agent["id"] for agent in second.json()] == ids[2:]
+    assert client.get("/agents/?cursor=not-a-cursor", headers=headers).status_code == 400
+
+    sparse = client.get("/agents/?fields=name", headers=headers).json()
+    assert sparse[0] == {"id": ids[0], "name": "Agent 0"}
+    assert client.get("/tasks/?fields=nope", headers=headers).status_code == 400
+
+# Test list and detail reads answer 304 until the user writes again
+def test_conditional_reads():
+    user = create_user("etag-routes")
+    headers = auth_headers(user)
+    task = create_task(headers, user)
+
+    agent = create_agent(headers, user)
+
+    paths = (
+        "/tasks/", f"/tasks/{task['id']}", "/analytics/dashboard", f"/analytics/agents/{agent['id']}/performance",
+        "/analytics/timeseries?metric=tasks_completed", "/analytics/timeseries?metric=agent_logs",
+    )
+    for path in paths:
+        etag = client.get(path, headers=headers).headers["ETag"]
+        assert client.get(path, headers={**headers, "If-None-Match": etag}).status_code == 304
+    etag = client.get("/tasks/", headers=headers).headers["ETag"]
+    create_task(headers, user)
+    assert client.get("/tasks/", headers={**headers, "If-None-Match": etag}).status_code == 200
+
+    # Log writes change what the performance and log metrics show
+    etags = {path: client.get(path, headers=headers).headers["ETag"] for path in paths[3:]}
+    db = TestingSessionLocal()
+    agent_tracker.log_agent_activity(db, agent["id"], "working", owner_id=user.id)
+    db.close()
+    assert client.get(paths[3], headers={**headers, "If-None-Match": etags[paths[3]]}).status_code == 200
+    assert client.get(paths[4], headers={**headers, "If-None-Match": etags[paths[4]]}).status_code == 304
+    assert client.get(paths[5], headers={**headers, "If-None-Match": etags[paths[5]]}).status_code == 200
+
+# Test bulk creation and assignment, and that another user's agent is refused
+def test_bulk_create_and_assign():
+    user = create_user("bulk-routes")
+    headers = auth_headers(user)
+    agent = create_agent(headers, user)
+    other = create_user("bulk-routes-other")
+    other_agent = create_agent(auth_headers(other), other)
+
+    created = client.post("/tasks/bulk", json={"tasks": [
+        {"title": f"Bulk {i}", "owner_id": user.id} for i in range(3)
+    ]}, headers=headers).json()
+    assert created["count"] == 3
+
+    assignments = [{"task_id": task_id, "agent_id": agent["id"]} for task_id in created["ids"]]
+    assigned = client.post("/tasks/bulk-assign", json={"assignments": assignments}, headers=headers).json()
+    assert assigned == {"ids": created["ids"], "count": 3}
+    assert client.get(f"/tasks/?agent_id={agent['id']}", headers=headers).json()[0]["agent_id"] == agent["id"]
+
+    refused = client.post("/tasks/bulk-assign", json={"assignments": [
+        {"task_id": created["ids"][0], "agent_id": other_agent["id"]}
+    ]}, headers=headers)
+    assert refused.status_code == 403
+    duplicate = client.post("/tasks/bulk-assign", json={"assignments": assignments[:1] * 2}, headers=headers)
+    assert duplicate.status_code == 400
+
+# Test an agent leases the highest-priority task, renews the lease, and gets 204 when nothing is left
+def test_lease_and_heartbeat():
+    user = create_user("lease-routes")
+    headers = auth_headers(user)
+    agent = create_agent(headers, user)
+    create_task(headers, user, priority=1)
+    urgent = create_task(headers, user, priority=5)
+
+    leased = client.post("/tasks/lease", json={"agent_id": agent["id"]}, headers=headers)
+    assert leased.status_code == 200
+    lease = leased.json()
+    assert lease["task"]["id"] == urgent["id"] and lease["task"]["status"] == "in_progress"
+
+    heartbeat = client.post(
+        f"/tasks/{urgent['id']}/lease/heartbeat", json={"lease_token": lease["lease_token"]}, headers=headers
+    )
+    assert heartbeat.status_code == 200
+    stale = client.post(f"/tasks/{urgent['id']}/lease/heartbeat", json={"lease_token": "stale"}, headers=headers)
+    assert stale.status_code == 409
+
+    assert client.post("/tasks/lease", json={"agent_id": agent["id"]}, headers=headers).status_code == 200
+    assert client.post("/tasks/lease", json={"agent_id": agent["id"]}, headers=headers).status_code == 204
+    too_long = client.post("/tasks/lease", json={"agent_id": agent["id"], "lease_seconds": 0}, headers=headers)
+    assert too_long.status_code == 400
+
+# Test exports stream the user's rows as CSV
+def test_export_tasks_csv():
+    user = create_user("export-routes")
+    headers = auth_headers(user)
+    create_task(headers, user, title="Exported")
+    other = create_user("export-routes-other")
+    create_task(auth_headers(other), other, title="Hidden")
+
+    response = client.get("/exports/tasks?format=csv", headers=headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert [row["title"] for row in rows] == ["Exported"]
+
+    assert client.get("/exports/nope", headers=headers).status_code == 404
+    assert client.get("/exports/tasks?format=xml", headers=headers).status_code == 400
+
+# Test log pages and log search are scoped to the user's agents and tasks
+def test_log_pages_and_search():
+    user = create_user("log-routes")
+    headers = auth_headers(user)
+    agent = create_agent(headers, user)
+    task = create_task(headers, user)
+    db = TestingSessionLocal()
+    now = datetime.utcnow()
+    db.add_all([
+        AgentLog(agent_id=agent["id"], timestamp=now - timedelta(minutes=i), level="INFO", message=f"upstream call {i}")
+        for i in range(3)
+    ])
+    db.add(TaskLog(task_id=task["id"], timestamp=now, level="ERROR", message="upstream timeout"))
+    db.commit()
+    db.close()
+
+    first = client.get(f"/tracking/agents/{agent['id']}/logs?limit=2", headers=headers)
+    assert [log["message"] for log in first.json()] == ["upstream call 0", "upstream call 1"]
+    older = client.get(
+        f"/tracking/agents/{agent['id']}/logs?limit=2&cursor={first.headers['X-Next-Cursor']}", headers=headers
+    )
+    assert [log["message"] for log in older.json()] == ["upstream call 2"]
+    assert client.get(f"/tracking/tasks/{task['id']}/logs", headers=headers).json()[0]["level"] == "ERROR"
+
+    results = client.get("/tracking/logs/search?q=timeout&source=task", headers=headers).json()
+    assert [result["task_id"] for result in results] == [task["id"]]
+    other_headers = auth_headers(create_user("log-routes-other"))
+    assert client.get("/tracking/logs/search?q=timeout&source=task", headers=other_headers).json() == []
+    assert client.get("/tracking/logs/search?q=timeout&source=nope", headers=headers).status_code == 400
+
+# Test the timeseries endpoint buckets the user's completed tasks
+def test_timeseries():
+    user = create_user("timeseries-routes")
+    headers = auth_headers(user)
+    start = datetime.now().replace(minute=0, second=0, microsecond=0) - timedelta(hours=2)
+    for status in ("completed", "completed", "failed"):
+        task = create_task(headers, user)
+        client.put(f"/tasks/{task['id']}", json={"status": status}, headers=headers)
+
+    params = {"metric": "tasks_completed", "start": start.isoformat(), "end": (start + timedelta(hours=4)).isoformat()}
+    body = client.get("/analytics/timeseries", params=params, headers=headers).json()
+    assert body["metric"] == "tasks_completed" and sum(body["counts"]) == 2
+
+    assert client.get("/analytics/timeseries?metric=nope", headers=headers).status_code == 400
+    too_many = client.get("/analytics/timeseries", params={**params, "bucket_seconds": 1}, headers=headers)
+    assert too_many.status_code == 400
+
+# Test /metrics is for superusers, or a scraper holding METRICS_TOKEN
+def test_metrics_access(monkeypatch):
+    assert client.get("/metrics/").status_code == 401
+    assert client.get("/metrics/", headers=auth_headers(create_user("metrics-user"))).status_code == 403
+    response = client.get("/metrics/", headers=auth_headers(create_user("metrics-admin", is_superuser=True)))
+    assert response.status_code == 200 and "db_pools" in response.json()
+
+    monkeypatch.setattr(metrics, "METRICS_TOKEN", "scrape-me")
+    assert client.get("/metrics/", headers={"Authorization": "Bearer scrape-me"}).status_code == 200
+    assert client.get("/metrics/", headers={"Authorization": "Bearer scrape-you"}).status_code == 403
@@ -0,0 +1,116 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.models.models import Base, User, Agent, Task
+from app.services import scheduler_service, task_service
+from app.services.lease_service import lease_service
+from app.services.rollup_service import rollup_service, ROLLUP_SCOPE_AGENT
+from app.services.scheduler_service import TaskScheduler, aging_key
+
+# Create test database
+engine = create_engine(
+    "sqlite://",
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool,
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+# Setup test database
+Base.metadata.create_all(bind=engine)
+
+# Test aging lets a long-waiting low-priority task overtake newer urgent ones
+def test_aging_key_orders_by_effective_priority():
+    now = datetime(2024, 1, 1, 12)
+    fresh_high = aging_key(3, now, aging_seconds=60)
+    fresh_low = aging_key(0, now, aging_seconds=60)
+    old_low = aging_key(0, now - timedelta(minutes=5), aging_seconds=60)
+    assert fresh_high < fresh_low
+    assert old_low < fresh_high
+
+# Test the scheduler fills agents up to max_tasks in priority order
+def test_scheduler_respects_capacity_and_priority():
+    db = TestingSessionLocal()
+    user = User(username="scheduler", email="scheduler@example.com")
+    db.add(user)
+    db.commit()
+    agents = [
+        Agent(name="busy", owner_id=user.id, status="running", max_tasks=2),
+        Agent(name="idle", owner_id=user.id, status="idle", max_tasks=3),
+        Agent(name="paused", owner_id=user.id, status="paused", max_tasks=10),
+    ]
+    db.add_all(agents)
+    db.commit()
+    busy, idle, paused = agents
+
+    # One slot on the busy agent is already taken
+    task_service.create_tasks(db, objs_in=[
+        {"title": "Running", "owner_id": user.id, "status": "in_progress", "agent_id": busy.id}
+    ])
+    ids = task_service.create_tasks(db, objs_in=[
+        {"title": f"Task {i}", "owner_id": user.id, "priority": i % 4} for i in range(8)
+    ])
+
+    scheduler = TaskScheduler(aging_seconds=3600, assign_tasks=True)
+    assert scheduler.run_once(db) == 4
+    db.expire_all()
+    assigned = db.query(Task).filter(Task.id.in_(ids), Task.agent_id.isnot(None)).all()
+    assert sorted(task.priority for task in assigned) == [2, 2, 3, 3]
+    assert all(task.status == "in_progress" and task.started_at for task in assigned)
+    assert rollup_service.get_rollup(db, ROLLUP_SCOPE_AGENT, busy.id).in_progress_count == 2
+    assert rollup_service.get_rollup(db, ROLLUP_SCOPE_AGENT, idle.id).in_progress_count == 3
+    assert rollup_service.get_rollup(db, ROLLUP_SCOPE_AGENT, paused.id) is None
+
+    stats = scheduler.stats()
+    assert stats["queued"] == 4
+    assert stats["saturated_agents"] == 2
+    assert stats["utilization"] == 1.0
+    assert stats["assignment_latency_seconds"]["p50"] is not None
+
+    # Finishing a task frees a slot for the next pass
+    task_service.update_task(db, db_obj=assigned[0], obj_in={"status": "completed"})
+    assert scheduler.run_once(db) == 1
+    assert scheduler.stats()["queued"] == 3
+    db.close()
+
+# Test a pass without assignments, as in the API workers, still requeues expired leases
+def test_scheduler_sweeps_leases_without_assigning():
+    db = TestingSessionLocal()
+    user = User(username="sweeper", email="sweeper@example.com")
+    db.add(user)
+    db.commit()
+    agent = Agent(name="sweeper agent", owner_id=user.id, status="running", max_tasks=5)
+    db.add(agent)
+    db.commit()
+    leased, waiting = task_service.create_tasks(db, objs_in=[
+        {"title": "Leased", "owner_id": user.id, "priority": 1},
+        {"title": "Waiting", "owner_id": user.id},
+    ])
+    lease_service.claim(db, agent=agent, lease_seconds=0)
+
+    scheduler = TaskScheduler()
+    assert scheduler.run_once(db) == 0
+    db.expire_all()
+    assert [(task.status, task.agent_id) for task in db.query(Task).filter(Task.id.in_([leased, waiting]))] == [
+        ("pending", None), ("pending", None)
+    ]
+    db.close()
+
+# Test a failed lease sweep rolls back and rebuilds the queue like a failed assignment
+def test_scheduler_recovers_from_sweep_errors(monkeypatch):
+    db = TestingSessionLocal()
+    scheduler = TaskScheduler(assign_tasks=True)
+    scheduler._synced_at = 0.0
+
+    def requeue_expired(db):
+        raise RuntimeError("sweep failed")
+    monkeypatch.setattr(scheduler_service.lease_service, "requeue_expired", requeue_expired)
+
+    with pytest.raises(RuntimeError):
+        scheduler.run_once(db)
+    assert scheduler._synced_at is None
+    assert not db.in_transaction()
+    db.close()
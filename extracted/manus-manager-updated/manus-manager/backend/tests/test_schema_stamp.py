@@ -0,0 +1,53 @@
+import pytest
+from sqlalchemy import MetaData, Table, create_engine, text
+
+from app.db.schema import (
+    BASELINE_REVISION, BASELINE_TABLES, POST_BASELINE_COLUMNS, UnrecognizedSchemaError, unversioned_revision
+)
+from app.models.models import Base
+
+HEAD = "head-revision"
+
+
+def baseline_metadata():
+    """
+    The tables the API created at import time before there were migrations
+    """
+    metadata = MetaData()
+    for name in BASELINE_TABLES:
+        table = Base.metadata.tables[name]
+        columns = [column._copy() for column in table.columns if column.name not in POST_BASELINE_COLUMNS.get(name, ())]
+        Table(name, metadata, *columns)
+    return metadata
+
+
+def revision_for(create):
+    engine = create_engine("sqlite://")
+    with engine.begin() as connection:
+        create(connection)
+        return unversioned_revision(connection, HEAD)
+
+
+# Test an empty database is left for the migrations to create
+def test_empty_database_is_not_stamped():
+    assert revision_for(lambda connection: None) is None
+
+
+# Test a schema created from the current models is stamped at head
+def test_create_all_schema_is_stamped_at_head():
+    assert revision_for(Base.metadata.create_all) == HEAD
+
+
+# Test the original import-time schema is stamped at the first revision
+def test_original_schema_is_stamped_at_baseline():
+    assert revision_for(baseline_metadata().create_all) == BASELINE_REVISION
+
+
+# Test a schema matching no revision is refused instead of guessed at
+def test_unrecognized_schema_is_refused():
+    def create(connection):
+        Base.metadata.create_all(connection)
+        connection.execute(text("DROP TABLE task_rollups"))
+
+    with pytest.raises(UnrecognizedSchemaError, match="alembic stamp"):
+        revision_for(create)
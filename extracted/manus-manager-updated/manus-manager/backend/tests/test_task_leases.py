@@ -0,0 +1,99 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.models.models import Base, User, Agent, Task
+from app.services import task_service
+from app.services.lease_service import lease_service
+from app.services.rollup_service import rollup_service, ROLLUP_SCOPE_OWNER, ROLLUP_SCOPE_AGENT
+
+# Create test database
+engine = create_engine(
+    "sqlite://",
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool,
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+# Setup test database
+Base.metadata.create_all(bind=engine)
+
+# Test agents lease tasks by priority, renew them, and lose them on expiry
+def test_lease_claim_renew_and_requeue():
+    db = TestingSessionLocal()
+    user = User(username="lease", email="lease@example.com")
+    db.add(user)
+    db.commit()
+    agent = Agent(name="lease agent", owner_id=user.id, status="running", max_tasks=2)
+    db.add(agent)
+    db.commit()
+    low, high, urgent = task_service.create_tasks(db, objs_in=[
+        {"title": "Low", "owner_id": user.id, "priority": 0},
+        {"title": "High", "owner_id": user.id, "priority": 2},
+        {"title": "Urgent", "owner_id": user.id, "priority": 3},
+    ])
+
+    task, token = lease_service.claim(db, agent=agent, lease_seconds=30)
+    assert task.id == urgent
+    assert (task.status, task.agent_id, task.lease_token, task.lease_attempts) == ("in_progress", agent.id, token, 1)
+    second, _ = lease_service.claim(db, agent=agent)
+    assert second.id == high
+    # At max_tasks
+    assert lease_service.claim(db, agent=agent) is None
+    assert rollup_service.get_rollup(db, ROLLUP_SCOPE_AGENT, agent.id).in_progress_count == 2
+
+    assert lease_service.renew(db, task_id=urgent, lease_token=token, lease_seconds=60) is not None
+    assert lease_service.renew(db, task_id=urgent, lease_token="stale") is None
+
+    # Nothing has expired yet; five minutes on, both leases have
+    assert lease_service.requeue_expired(db) == 0
+    assert lease_service.requeue_expired(db, now=datetime.now() + timedelta(minutes=5)) == 2
+    db.expire_all()
+    requeued = db.get(Task, urgent)
+    assert (requeued.status, requeued.agent_id, requeued.lease_token, requeued.started_at) == (
+        "pending", None, None, None
+    )
+    assert rollup_service.get_rollup(db, ROLLUP_SCOPE_AGENT, agent.id).in_progress_count == 0
+    assert rollup_service.get_rollup(db, ROLLUP_SCOPE_OWNER, user.id).pending_count == 3
+
+    # A requeued task is leased again, counting the attempt
+    task, _ = lease_service.claim(db, agent=agent)
+    assert (task.id, task.lease_attempts) == (urgent, 2)
+    db.close()
+
+# Test a claim that loses the agent's last slot between its check and its UPDATE claims nothing
+def test_claim_rechecks_capacity():
+    db = TestingSessionLocal()
+    user = User(username="lease-race", email="lease-race@example.com")
+    db.add(user)
+    db.commit()
+    agent = Agent(name="lease race agent", owner_id=user.id, status="running", max_tasks=2)
+    db.add(agent)
+    db.commit()
+    first, second = task_service.create_tasks(db, objs_in=[
+        {"title": "First", "owner_id": user.id, "priority": 1},
+        {"title": "Second", "owner_id": user.id},
+    ])
+    assert lease_service.claim(db, agent=agent)[0].id == first
+
+    # Another claim takes the last slot right after this one picks its
+    # candidate, on every attempt (each retry rolls the previous one back)
+    def claim_elsewhere(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().startswith("UPDATE tasks"):
+            raced.append(True)
+            cursor.execute(
+                "UPDATE task_rollups SET in_progress_count = in_progress_count + 1 WHERE scope = ? AND scope_id = ?",
+                (ROLLUP_SCOPE_AGENT, agent.id)
+            )
+    raced = []
+    event.listen(engine, "before_cursor_execute", claim_elsewhere)
+    try:
+        assert lease_service.claim(db, agent=agent) is None
+    finally:
+        event.remove(engine, "before_cursor_execute", claim_elsewhere)
+    assert raced
+    db.expire_all()
+    assert db.get(Task, second).status == "pending"
+    db.close()
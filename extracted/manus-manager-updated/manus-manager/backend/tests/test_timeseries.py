@@ -0,0 +1,139 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.models.models import Base, User, Agent, AgentLog, Task
+from app.schemas.schemas import AgentStatus
+from app.services.agent_tracker import agent_tracker
+from app.services.timeseries_service import TIMESERIES_METRICS, timeseries_service
+
+# Create test database
+engine = create_engine(
+    "sqlite://",
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool,
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+# Setup test database
+Base.metadata.create_all(bind=engine)
+
+HOUR = 3600
+START = datetime(2026, 3, 1)
+END = START + timedelta(hours=4)
+EPOCH = int((START - datetime(1970, 1, 1)).total_seconds())
+
+# Event offsets from START: the first bucket's two edges, the next bucket's
+# start, one event after an empty bucket, then the range's two excluded edges
+OFFSETS = [timedelta(0), timedelta(minutes=59, seconds=59), timedelta(hours=1), timedelta(hours=3, minutes=30)]
+OUTSIDE = [timedelta(seconds=-1), timedelta(hours=4)]
+EXPECTED = ([EPOCH, EPOCH + HOUR, EPOCH + 3 * HOUR], [2, 1, 1])
+
+
+@pytest.fixture()
+def db():
+    db = TestingSessionLocal()
+    yield db
+    db.close()
+    with engine.begin() as connection:
+        for table in reversed(Base.metadata.sorted_tables):
+            connection.execute(table.delete())
+
+
+def create_agent(db, name):
+    user = User(username=name, email=f"{name}@example.com")
+    db.add(user)
+    db.commit()
+    agent = Agent(name=f"{name} agent", owner_id=user.id)
+    db.add(agent)
+    db.commit()
+    return agent
+
+
+def add_tasks(db, agent, status, column):
+    for offset in OFFSETS + OUTSIDE:
+        db.add(Task(title=status, owner_id=agent.owner_id, agent_id=agent.id, status=status, **{column: START + offset}))
+    db.commit()
+
+
+def add_logs(db, agent, **values):
+    for offset in OFFSETS + OUTSIDE:
+        db.add(AgentLog(agent_id=agent.id, timestamp=START + offset, level="INFO", message="log", **values))
+    db.commit()
+
+
+def counts(db, metric, **scope):
+    return timeseries_service.bucket_counts(db, metric=metric, bucket_seconds=HOUR, start=START, end=END, **scope)
+
+
+# Test each metric buckets its events by [start, end), skipping empty buckets
+@pytest.mark.parametrize("metric, status, column", [
+    ("tasks_started", "in_progress", "started_at"),
+    ("tasks_completed", "completed", "completed_at"),
+    ("tasks_failed", "failed", "completed_at"),
+])
+def test_task_metrics(db, metric, status, column):
+    agent = create_agent(db, metric)
+    other = create_agent(db, f"{metric}-other")
+    add_tasks(db, agent, status, column)
+    add_tasks(db, other, status, column)
+    # Tasks in another status at the same times don't count towards completed/failed
+    add_tasks(db, agent, "cancelled", column)
+
+    if metric == "tasks_started":
+        expected = ([EPOCH, EPOCH + HOUR, EPOCH + 3 * HOUR], [4, 2, 2])
+    else:
+        expected = EXPECTED
+    assert counts(db, metric, owner_id=agent.owner_id) == expected
+    assert counts(db, metric, agent_id=other.id) == EXPECTED
+
+
+# Test agent_logs counts every log row of the user's agents
+def test_agent_logs(db):
+    agent = create_agent(db, "logs")
+    other = create_agent(db, "logs-other")
+    add_logs(db, agent)
+    add_logs(db, other)
+
+    assert counts(db, "agent_logs", owner_id=agent.owner_id) == EXPECTED
+    assert counts(db, "agent_logs", agent_id=other.id) == EXPECTED
+
+
+# Test agent_starts counts rows recording a change to running, whatever the message says
+def test_agent_starts(db):
+    agent = create_agent(db, "starts")
+    add_logs(db, agent, status=AgentStatus.RUNNING.value)
+    add_logs(db, agent, status=AgentStatus.PAUSED.value)
+    db.add(AgentLog(agent_id=agent.id, timestamp=START, message="Agent status changed to running"))
+    db.commit()
+
+    assert counts(db, "agent_starts", owner_id=agent.owner_id) == EXPECTED
+
+
+# Test update_agent_status records the new status on its log row
+def test_status_change_is_counted_as_start(db):
+    agent = create_agent(db, "tracked")
+
+    async def scenario():
+        agent_tracker.update_agent_status(db, agent.id, AgentStatus.RUNNING)
+        agent_tracker.update_agent_status(db, agent.id, AgentStatus.IDLE)
+
+    asyncio.run(scenario())
+    now = timeseries_service.now("agent_starts")
+    timestamps, starts = timeseries_service.bucket_counts(
+        db, metric="agent_starts", bucket_seconds=HOUR, start=now - timedelta(hours=1), end=now + timedelta(hours=1),
+        agent_id=agent.id
+    )
+    assert sum(starts) == 1
+
+
+# Test default ranges end at the current time on the metric's own clock
+def test_metric_clocks():
+    for metric in TIMESERIES_METRICS:
+        column, _ = TIMESERIES_METRICS[metric]
+        expected = datetime.now() if column.class_ is Task else datetime.utcnow()
+        assert abs(timeseries_service.now(metric) - expected) < timedelta(seconds=5)
@@ -0,0 +1,65 @@
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.models.models import Base, User, Agent
+from app.services import agent_service, user_service
+
+# Create test database
+engine = create_engine(
+    "sqlite://",
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool,
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
+
+# Setup test database
+Base.metadata.create_all(bind=engine)
+
+class StatementLog:
+    def __init__(self):
+        self.statements = []
+
+    def __enter__(self):
+        event.listen(engine, "before_cursor_execute", self._record)
+        return self.statements
+
+    def __exit__(self, *exc):
+        event.remove(engine, "before_cursor_execute", self._record)
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+# Test updates write only changed columns in one UPDATE ... RETURNING, without
+# a refresh. Agent writes then bump the owner's change version, and status
+# changes also write their status log row.
+def test_updates_take_one_statement():
+    db = TestingSessionLocal()
+    user = User(username="updates", email="updates@example.com")
+    db.add(user)
+    db.commit()
+    agent = Agent(name="updates agent", owner_id=user.id, status="idle")
+    db.add(agent)
+    db.commit()
+
+    with StatementLog() as statements:
+        agent = agent_service.start_agent(db, agent=agent)
+    assert agent.status == "running"
+    assert len(statements) == 3 and statements[0].startswith("UPDATE agents SET status=")
+    assert "RETURNING" in statements[0]
+    assert statements[1].startswith("INSERT INTO change_versions")
+    assert statements[2].startswith("INSERT INTO agent_logs")
+
+    # Unchanged fields are left out; no-op updates don't touch the database
+    with StatementLog() as statements:
+        agent = agent_service.update_agent(db, db_obj=agent, obj_in={"name": "renamed", "status": "running"})
+        agent_service.start_agent(db, agent=agent)
+    assert agent.name == "renamed"
+    assert len(statements) == 2 and statements[0].startswith("UPDATE agents SET name=")
+    assert statements[1].startswith("INSERT INTO change_versions")
+
+    with StatementLog() as statements:
+        user = user_service.update_user(db, db_obj=user, obj_in={"full_name": "Update Paths"})
+    assert user.full_name == "Update Paths"
+    assert len(statements) == 1
+    db.close()
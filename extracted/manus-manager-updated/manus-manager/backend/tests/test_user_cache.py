@@ -0,0 +1,67 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.core.security import create_access_token
+from app.models.models import Base, User
+from app.services import user_service
+from app.services.user_cache import user_cache
+
+# Test repeat authentications are served from the cache and writes invalidate it
+def test_current_user_cached(tmp_path):
+    async def scenario():
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/users.db")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        AsyncTestingSessionLocal = async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
+        statements = []
+        event.listen(engine.sync_engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+        user_cache.clear()
+
+        async with AsyncTestingSessionLocal() as db:
+            user = User(username="cached", email="cached@example.com", hashed_password="x")
+            db.add(user)
+            await db.commit()
+            user_id = user.id
+        token = create_access_token({"sub": str(user_id), "ver": user.token_version})
+
+        async def authenticate(token):
+            async with AsyncTestingSessionLocal() as db:
+                return await user_service.get_current_user(db=db, token=token)
+
+        assert (await authenticate(token)).id == user_id
+        statements.clear()
+        cached = await authenticate(token)
+        assert cached.username == "cached" and statements == []
+
+        # Profile changes invalidate the cache but keep tokens valid
+        async with AsyncTestingSessionLocal() as db:
+            user = await db.get(User, user_id)
+            await db.run_sync(user_service.update_user, db_obj=user, obj_in={"full_name": "Cached User"})
+        assert (await authenticate(token)).full_name == "Cached User"
+
+        # Deactivating a user revokes the tokens issued before it
+        async with AsyncTestingSessionLocal() as db:
+            user = await db.get(User, user_id)
+            user = await db.run_sync(user_service.update_user, db_obj=user, obj_in={"is_active": False})
+        assert user.token_version == 1
+        with pytest.raises(HTTPException) as exc:
+            await authenticate(token)
+        assert exc.value.status_code == 401
+
+        # A token newer than the cached copy reloads the user
+        user_cache.set(User(**{**{c: getattr(user, c) for c in ("id", "username", "email")}, "token_version": 0}))
+        fresh = create_access_token({"sub": str(user_id), "ver": 1})
+        assert (await authenticate(fresh)).is_active is False
+
+        async with AsyncTestingSessionLocal() as db:
+            await db.run_sync(user_service.delete_user, id=user_id)
+        with pytest.raises(HTTPException) as exc:
+            await authenticate(fresh)
+        assert exc.value.status_code == 404
+        await engine.dispose()
+
+    asyncio.run(scenario())